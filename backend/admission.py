@@ -0,0 +1,308 @@
+"""
+Admission control for the expensive endpoints.
+- Per-client token buckets (configured API key, else client IP), charged by the estimated
+  cost of each request: session minutes, text length, caption batches, videos
+- A global in-flight budget per endpoint
+- Fast 429 responses with Retry-After when either budget is exhausted
+
+State lives behind AdmissionStore. The in-process store suits a single worker;
+with ADMISSION_STORE_PATH set, all workers on the host share one SQLite file
+instead — the local stand-in for a networked store such as Redis.
+"""
+
+import os
+import json
+import math
+import time
+import asyncio
+import sqlite3
+import threading
+from abc import ABC, abstractmethod
+
+from config import (
+    ADMISSION_TOKENS_PER_MINUTE, ADMISSION_BURST, ADMISSION_MAX_IN_FLIGHT,
+    ADMISSION_BUSY_RETRY_AFTER, ADMISSION_API_KEYS, ADMISSION_PROXY_HOPS, ADMISSION_STORE_PATH,
+)
+
+# Above this many buckets, full (idle) ones are dropped
+_MAX_BUCKETS = 10000
+
+
+# ── cost estimates (in tokens) ───────────────────────────────────
+
+def _session_cost(body: dict) -> int:
+    return int(body.get("duration_minutes") or 1)
+
+
+def _text_cost(field: str):
+    def cost(body: dict) -> int:
+        return 1 + len(body.get(field) or "") // 1000
+    return cost
+
+
+def _captions_cost(body: dict) -> int:
+    # One Gemini call per batch of 20 caption lines
+    return 1 + len(body.get("segments") or []) // 20
+
+
+ENDPOINT_COSTS = {
+    "/api/session": _session_cost,
+    "/api/session/rerender": _text_cost("script"),
+    "/api/translate": _text_cost("text"),
+    "/api/youtube/captions": lambda body: 1,
+    "/api/youtube/translate-captions": _captions_cost,
+    # A fetch plus at least one Gemini call per video
+    "/api/youtube/bulk-captions": lambda body: 2 * len(body.get("video_urls") or []),
+}
+
+
+# ── state ────────────────────────────────────────────────────────
+
+class AdmissionStore(ABC):
+    """Admission state backend. Methods are async so a networked store can implement them."""
+
+    @abstractmethod
+    async def take(self, client: str, cost: float, rate: float, burst: float) -> float:
+        """Charge `cost` tokens to `client`. Returns 0 if admitted, else seconds to wait."""
+
+    @abstractmethod
+    async def acquire(self, endpoint: str, limit: int) -> bool:
+        """Reserve an in-flight slot for `endpoint`; False if all `limit` are taken."""
+
+    @abstractmethod
+    async def release(self, endpoint: str) -> None:
+        """Give back a slot reserved by acquire()."""
+
+
+class InMemoryAdmissionStore(AdmissionStore):
+    def __init__(self):
+        self._buckets: dict[str, tuple[float, float]] = {}  # client -> (tokens, updated_at)
+        self._in_flight: dict[str, int] = {}
+
+    async def take(self, client: str, cost: float, rate: float, burst: float) -> float:
+        now = time.monotonic()
+        tokens, updated = self._buckets.get(client, (burst, now))
+        tokens = min(burst, tokens + (now - updated) * rate)
+        if tokens >= cost:
+            self._buckets[client] = (tokens - cost, now)
+            return 0.0
+        self._buckets[client] = (tokens, now)
+        # Drop idle full buckets now and then so the map doesn't grow forever
+        if len(self._buckets) > _MAX_BUCKETS:
+            self._buckets = {
+                k: v for k, v in self._buckets.items()
+                if v[0] + (now - v[1]) * rate < burst
+            }
+        return (cost - tokens) / rate
+
+    async def acquire(self, endpoint: str, limit: int) -> bool:
+        if self._in_flight.get(endpoint, 0) >= limit:
+            return False
+        self._in_flight[endpoint] = self._in_flight.get(endpoint, 0) + 1
+        return True
+
+    async def release(self, endpoint: str) -> None:
+        self._in_flight[endpoint] -= 1
+
+
+def _pid_alive(pid: int) -> bool:
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        pass
+    return True
+
+
+class SQLiteAdmissionStore(AdmissionStore):
+    """
+    Buckets and in-flight counts in a SQLite file shared by every worker
+    process on the host. Each check-and-update runs in one write transaction.
+    In-flight slots are recorded per worker pid, so the slots of a worker that
+    died are reclaimed instead of leaking.
+    """
+
+    def __init__(self, path: str):
+        self._pid = os.getpid()
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(path, timeout=10, isolation_level=None, check_same_thread=False)
+        with self._lock:
+            self._db.execute("PRAGMA journal_mode=WAL")
+            self._db.execute(
+                "CREATE TABLE IF NOT EXISTS buckets "
+                "(client TEXT PRIMARY KEY, tokens REAL NOT NULL, updated REAL NOT NULL)"
+            )
+            self._db.execute(
+                "CREATE TABLE IF NOT EXISTS in_flight "
+                "(endpoint TEXT NOT NULL, pid INTEGER NOT NULL, slots INTEGER NOT NULL, "
+                "PRIMARY KEY (endpoint, pid))"
+            )
+            # A previous process with this pid is gone
+            self._db.execute("DELETE FROM in_flight WHERE pid = ?", (self._pid,))
+
+    def _transaction(self, fn, *args):
+        with self._lock:
+            self._db.execute("BEGIN IMMEDIATE")
+            try:
+                result = fn(*args)
+            except BaseException:
+                self._db.execute("ROLLBACK")
+                raise
+            self._db.execute("COMMIT")
+            return result
+
+    def _take(self, client: str, cost: float, rate: float, burst: float) -> float:
+        now = time.time()
+        row = self._db.execute(
+            "SELECT tokens, updated FROM buckets WHERE client = ?", (client,),
+        ).fetchone()
+        tokens, updated = row or (burst, now)
+        tokens = min(burst, tokens + max(0.0, now - updated) * rate)
+        admitted = tokens >= cost
+        if admitted:
+            tokens -= cost
+        self._db.execute(
+            "INSERT OR REPLACE INTO buckets (client, tokens, updated) VALUES (?, ?, ?)",
+            (client, tokens, now),
+        )
+        if admitted:
+            return 0.0
+        if self._db.execute("SELECT COUNT(*) FROM buckets").fetchone()[0] > _MAX_BUCKETS:
+            self._db.execute(
+                "DELETE FROM buckets WHERE tokens + (? - updated) * ? >= ?", (now, rate, burst),
+            )
+        return (cost - tokens) / rate
+
+    def _in_flight(self, endpoint: str) -> int:
+        return self._db.execute(
+            "SELECT COALESCE(SUM(slots), 0) FROM in_flight WHERE endpoint = ?", (endpoint,),
+        ).fetchone()[0]
+
+    def _acquire(self, endpoint: str, limit: int) -> bool:
+        if self._in_flight(endpoint) >= limit:
+            dead = [
+                pid for (pid,) in self._db.execute("SELECT DISTINCT pid FROM in_flight")
+                if not _pid_alive(pid)
+            ]
+            self._db.executemany("DELETE FROM in_flight WHERE pid = ?", [(pid,) for pid in dead])
+            if not dead or self._in_flight(endpoint) >= limit:
+                return False
+        self._db.execute(
+            "INSERT INTO in_flight (endpoint, pid, slots) VALUES (?, ?, 1) "
+            "ON CONFLICT (endpoint, pid) DO UPDATE SET slots = slots + 1",
+            (endpoint, self._pid),
+        )
+        return True
+
+    def _release(self, endpoint: str) -> None:
+        self._db.execute(
+            "UPDATE in_flight SET slots = slots - 1 WHERE endpoint = ? AND pid = ?",
+            (endpoint, self._pid),
+        )
+
+    async def take(self, client: str, cost: float, rate: float, burst: float) -> float:
+        return await asyncio.to_thread(self._transaction, self._take, client, cost, rate, burst)
+
+    async def acquire(self, endpoint: str, limit: int) -> bool:
+        return await asyncio.to_thread(self._transaction, self._acquire, endpoint, limit)
+
+    async def release(self, endpoint: str) -> None:
+        await asyncio.to_thread(self._transaction, self._release, endpoint)
+
+
+def default_store() -> AdmissionStore:
+    if ADMISSION_STORE_PATH:
+        return SQLiteAdmissionStore(ADMISSION_STORE_PATH)
+    return InMemoryAdmissionStore()
+
+
+# ── middleware ───────────────────────────────────────────────────
+
+def _client_id(scope) -> str:
+    headers = scope.get("headers") or []
+    api_key = next((v for k, v in headers if k == b"x-api-key"), b"").decode("latin-1")
+    if api_key in ADMISSION_API_KEYS:
+        return "key:" + api_key
+    # Each trusted proxy appends the address it received the request from, so
+    # the client is the hop added by the outermost one; anything left of it
+    # was supplied by the client and can't be trusted
+    if ADMISSION_PROXY_HOPS:
+        hops = [
+            hop.strip()
+            for k, v in headers if k == b"x-forwarded-for"
+            for hop in v.decode("latin-1").split(",") if hop.strip()
+        ]
+        if len(hops) >= ADMISSION_PROXY_HOPS:
+            return "ip:" + hops[-ADMISSION_PROXY_HOPS]
+    client = scope.get("client")
+    return "ip:" + (client[0] if client else "unknown")
+
+
+async def _reject(send, message: str, retry_after: float) -> None:
+    body = json.dumps({"error": message}).encode("utf-8")
+    await send({
+        "type": "http.response.start",
+        "status": 429,
+        "headers": [
+            (b"content-type", b"application/json"),
+            (b"content-length", str(len(body)).encode()),
+            (b"retry-after", str(max(1, math.ceil(retry_after))).encode()),
+        ],
+    })
+    await send({"type": "http.response.body", "body": body})
+
+
+class AdmissionMiddleware:
+    """ASGI middleware; must sit inside CORSMiddleware so 429s carry CORS headers."""
+
+    def __init__(self, app, store: AdmissionStore | None = None):
+        self.app = app
+        self.store = store or default_store()
+        self.rate = ADMISSION_TOKENS_PER_MINUTE / 60.0
+
+    async def __call__(self, scope, receive, send):
+        if (scope["type"] != "http" or scope["method"] != "POST"
+                or scope["path"] not in ENDPOINT_COSTS):
+            await self.app(scope, receive, send)
+            return
+
+        # Buffer the (small) JSON body to estimate the cost, then replay it
+        chunks = []
+        while True:
+            message = await receive()
+            if message["type"] == "http.disconnect":
+                return
+            chunks.append(message.get("body", b""))
+            if not message.get("more_body"):
+                break
+        raw = b"".join(chunks)
+        try:
+            body = json.loads(raw or b"{}")
+            cost = ENDPOINT_COSTS[scope["path"]](body if isinstance(body, dict) else {})
+        except (ValueError, TypeError):
+            cost = 1  # let the endpoint's own validation reject it
+        cost = min(max(cost, 1), ADMISSION_BURST)
+
+        path = scope["path"]
+        if not await self.store.acquire(path, ADMISSION_MAX_IN_FLIGHT.get(path, 10)):
+            await _reject(send, "Server busy, please retry shortly", ADMISSION_BUSY_RETRY_AFTER)
+            return
+        try:
+            wait = await self.store.take(_client_id(scope), cost, self.rate, ADMISSION_BURST)
+            if wait > 0:
+                await _reject(send, "Too many requests, please slow down", wait)
+                return
+
+            replayed = False
+
+            async def replay():
+                nonlocal replayed
+                if not replayed:
+                    replayed = True
+                    return {"type": "http.request", "body": raw, "more_body": False}
+                return await receive()
+
+            await self.app(scope, replay, send)
+        finally:
+            await self.store.release(path)
@@ -0,0 +1,89 @@
+"""
+Symbolic render timeline: speech clips plus silent gaps, all in one PCM format.
+Pauses are stored as frame counts, never as PCM. Clips are any bytes-like
+object — spilled clips are mmap views (render_memory), passed on uncopied.
+When the timeline is streamed to the encoder, gaps are served from one shared
+zero buffer and background bells are mixed in on the fly, only where they
+actually sound.
+"""
+
+import numpy as np
+from pydub import AudioSegment
+
+# Chunk size for streaming gaps (frames) — one second at typical rates
+_GAP_CHUNK_FRAMES = 48000
+
+
+class Timeline:
+    def __init__(self, frame_rate: int, channels: int = 1, sample_width: int = 2):
+        self.frame_rate = frame_rate
+        self.channels = channels
+        self.sample_width = sample_width
+        self.frame_bytes = channels * sample_width
+        self.items: list = []  # bytes-like = PCM clip, int = silent frames
+        self.total_frames = 0
+        self._zeros = bytes(_GAP_CHUNK_FRAMES * self.frame_bytes)
+
+    def add_clip(self, data) -> None:
+        self.items.append(data)
+        self.total_frames += len(data) // self.frame_bytes
+
+    def add_gap(self, duration_ms: int) -> int:
+        frames = int(duration_ms * self.frame_rate / 1000)
+        self.items.append(frames)
+        self.total_frames += frames
+        return frames
+
+    @property
+    def duration_ms(self) -> int:
+        return int(self.total_frames * 1000 / self.frame_rate)
+
+    def clips(self) -> list:
+        return [item for item in self.items if not isinstance(item, int)]
+
+    def _mix(self, pos: int, data, frames: int, overlays: list) -> bytes:
+        """Return `frames` frames starting at `pos`, with overlapping overlays mixed in."""
+        hits = [(start, samples, gain) for start, samples, gain in overlays
+                if start < pos + frames and start + len(samples) > pos]
+        if not hits:
+            return data
+
+        mixed = np.frombuffer(data, dtype=np.int16).astype(np.float32)
+        mixed = mixed.reshape(frames, self.channels)
+        for start, samples, gain in hits:
+            lo = max(start, pos)
+            hi = min(start + len(samples), pos + frames)
+            mixed[lo - pos:hi - pos] += samples[lo - start:hi - start, None].astype(np.float32) * gain
+        return np.clip(mixed, -32768, 32767).astype(np.int16).tobytes()
+
+    def iter_pcm(self, overlays: list | None = None):
+        """
+        Yield the timeline as PCM chunks. `overlays` are (start_frame, mono
+        int16 samples, gain) triples — e.g. from bells_service.generate_bell_events.
+        """
+        overlays = overlays or []
+        if overlays and self.sample_width != 2:
+            raise ValueError("Overlays need a 16-bit timeline")
+        pos = 0
+        for item in self.items:
+            if isinstance(item, int):
+                remaining = item
+                while remaining:
+                    frames = min(remaining, _GAP_CHUNK_FRAMES)
+                    silence = memoryview(self._zeros)[:frames * self.frame_bytes]
+                    yield self._mix(pos, silence, frames, overlays)
+                    pos += frames
+                    remaining -= frames
+            else:
+                frames = len(item) // self.frame_bytes
+                yield self._mix(pos, item, frames, overlays)
+                pos += frames
+
+    def to_segment(self, overlays: list | None = None) -> AudioSegment:
+        """Materialize the whole timeline (only for short audio such as blocks)."""
+        return AudioSegment(
+            b"".join(bytes(chunk) for chunk in self.iter_pcm(overlays)),
+            frame_rate=self.frame_rate,
+            channels=self.channels,
+            sample_width=self.sample_width,
+        )
@@ -5,10 +5,15 @@ that can be mixed under the spoken meditation audio.
 """
 
 import random
+from functools import lru_cache
 import numpy as np
 from pydub import AudioSegment
 
-SAMPLE_RATE = 44100
+from config import RENDER_SAMPLE_RATE
+from cancellation import check_cancelled
+
+# Synthesized directly at the render rate — never resampled
+SAMPLE_RATE = RENDER_SAMPLE_RATE
 
 # Bell tunings — pentatonic scale frequencies for a peaceful feel
 # C5, D5, E5, G5, A5 (no dissonance)
@@ -17,13 +22,18 @@ BELL_FREQS = [523.25, 587.33, 659.25, 783.99, 880.00]
 # How quiet the bells are relative to voice (in dB)
 BELLS_VOLUME_DB = -22
 
+# Bell lengths in seconds, on a 0.25 s grid so that every (frequency, length)
+# pair is synthesized once per process. A render holds only references to
+# them, never a copy per strike.
+_BELL_DURATIONS = tuple(5.0 + 0.25 * i for i in range(9))
+
 
-def _synth_bell(freq: float, duration_s: float = 6.0) -> np.ndarray:
+def _synth_bell(freq: float, duration_s: float = 6.0, sample_rate: int = SAMPLE_RATE) -> np.ndarray:
     """
     Synthesize a single bell strike with harmonics and exponential decay.
     Models a Tibetan singing bowl / wind chime timbre.
     """
-    t = np.linspace(0, duration_s, int(SAMPLE_RATE * duration_s), endpoint=False)
+    t = np.linspace(0, duration_s, int(sample_rate * duration_s), endpoint=False)
 
     # Fundamental + inharmonic partials (characteristic of bells)
     harmonics = [
@@ -40,7 +50,7 @@ def _synth_bell(freq: float, duration_s: float = 6.0) -> np.ndarray:
         signal += amp * np.sin(2 * np.pi * h_freq * t) * decay
 
     # Soft attack (avoid click)
-    attack_samples = int(0.005 * SAMPLE_RATE)
+    attack_samples = int(0.005 * sample_rate)
     signal[:attack_samples] *= np.linspace(0, 1, attack_samples)
 
     # Normalize
@@ -51,51 +61,68 @@ def _synth_bell(freq: float, duration_s: float = 6.0) -> np.ndarray:
     return signal
 
 
-def _numpy_to_segment(samples: np.ndarray) -> AudioSegment:
-    """Convert float64 numpy array to pydub AudioSegment."""
-    pcm = (samples * 32767).astype(np.int16)
-    return AudioSegment(
-        pcm.tobytes(),
-        frame_rate=SAMPLE_RATE,
-        sample_width=2,
-        channels=1,
-    )
+@lru_cache(maxsize=len(BELL_FREQS) * len(_BELL_DURATIONS) * 2)
+def _bell_pcm(freq: float, duration_s: float, sample_rate: int) -> np.ndarray:
+    """A bell strike as read-only full-scale int16, shared by every render."""
+    samples = (_synth_bell(freq, duration_s, sample_rate) * 32767).astype(np.int16)
+    samples.flags.writeable = False
+    return samples
 
 
-def generate_bells_track(duration_ms: int, volume_pct: int = 50) -> AudioSegment:
+def generate_bell_events(
+    duration_ms: int, volume_pct: int = 50, sample_rate: int = SAMPLE_RATE, cancelled=None,
+) -> list[tuple[int, np.ndarray, float]]:
     """
-    Generate a gentle bells background track of the given duration.
+    Generate the bells for a track of the given duration as sparse events:
+    (start_frame, mono int16 samples, gain), ready to be mixed in
+    by audio_timeline without materializing a full-length bells track.
+    The samples are shared between events and renders; only the gain differs.
 
     Args:
         duration_ms: Track length in milliseconds.
         volume_pct: Bell volume 0-100 (0=silent, 50=default, 100=loud).
+        sample_rate: Rate of the track the bells are mixed into.
+        cancelled: Optional threading.Event checked before each bell.
     """
     if volume_pct <= 0:
-        return AudioSegment.silent(duration=duration_ms)
+        return []
 
+    # Map 0-100 percentage to dB range: -40dB (quiet) to -10dB (loud)
+    volume_db = -40 + (volume_pct / 100.0) * 30
     duration_s = duration_ms / 1000.0
-    track = AudioSegment.silent(duration=duration_ms)
+    events = []
 
     # Place bells every 15-30 seconds
     pos_s = random.uniform(5, 10)  # first bell after 5-10s
     while pos_s < duration_s - 7:
+        check_cancelled(cancelled)
         freq = random.choice(BELL_FREQS)
-        bell_duration = random.uniform(5.0, 7.0)
-        bell_samples = _synth_bell(freq, bell_duration)
-        bell_audio = _numpy_to_segment(bell_samples)
+        bell_duration = random.choice(_BELL_DURATIONS)
+        bell_samples = _bell_pcm(freq, bell_duration, sample_rate)
 
         # Random subtle volume variation per bell
         vol_variation = random.uniform(-3, 2)
-        bell_audio = bell_audio + vol_variation
-
-        pos_ms = int(pos_s * 1000)
-        track = track.overlay(bell_audio, position=pos_ms)
+        gain = 10 ** ((volume_db + vol_variation) / 20)
+        events.append((int(pos_s * sample_rate), bell_samples, gain))
 
         # Next bell in 15-30 seconds
         pos_s += random.uniform(15, 30)
 
-    # Map 0-100 percentage to dB range: -40dB (quiet) to -10dB (loud)
-    volume_db = -40 + (volume_pct / 100.0) * 30
-    track = track + volume_db
+    return events
 
-    return track
+
+def generate_bells_track(duration_ms: int, volume_pct: int = 50, cancelled=None) -> AudioSegment:
+    """
+    Generate a gentle bells background track of the given duration.
+
+    Args:
+        duration_ms: Track length in milliseconds.
+        volume_pct: Bell volume 0-100 (0=silent, 50=default, 100=loud).
+        cancelled: Optional threading.Event checked before each bell.
+    """
+    track = np.zeros(int(duration_ms * SAMPLE_RATE / 1000), dtype=np.float32)
+    for start, samples, gain in generate_bell_events(duration_ms, volume_pct, SAMPLE_RATE, cancelled):
+        end = min(start + len(samples), len(track))
+        track[start:end] += samples[:end - start].astype(np.float32) * gain
+    pcm = np.clip(track, -32768, 32767).astype(np.int16)
+    return AudioSegment(pcm.tobytes(), frame_rate=SAMPLE_RATE, sample_width=2, channels=1)
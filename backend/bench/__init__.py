@@ -0,0 +1,11 @@
+"""
+Benchmarks over stubbed Gemini and TTS engines — no API keys needed.
+
+    cd backend && python -m bench <scenario> [options]
+    python -m bench --help
+
+Each scenario prints one JSON report. Stub latencies are scaled by
+--time-scale, so a run can model minutes of provider time in seconds.
+Scenarios that encode audio (profiles, pauses, pcm_format, render_stress)
+run the real ffmpeg. nikud loads the Phonikud model from the Hugging Face hub.
+"""
@@ -0,0 +1,48 @@
+import sys
+import json
+import argparse
+
+import bench
+from bench import (
+    translate, sse, scheduler, resilience, profiles, pauses, pcm_format, nikud, render_stress,
+    bulk_captions,
+)
+
+SCENARIOS = {
+    "translate": translate,
+    "sse": sse,
+    "scheduler": scheduler,
+    "resilience": resilience,
+    "profiles": profiles,
+    "pauses": pauses,
+    "pcm_format": pcm_format,
+    "nikud": nikud,
+    "render_stress": render_stress,
+    "bulk_captions": bulk_captions,
+}
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(
+        prog="python -m bench", description=bench.__doc__,
+        formatter_class=argparse.RawDescriptionHelpFormatter,
+    )
+    subparsers = parser.add_subparsers(dest="scenario", required=True)
+    for name, module in SCENARIOS.items():
+        sub = subparsers.add_parser(
+            name, help=module.__doc__.strip().splitlines()[0], description=module.__doc__,
+            formatter_class=argparse.RawDescriptionHelpFormatter,
+        )
+        sub.add_argument("--time-scale", type=float, default=1.0,
+                         help="multiply every stub latency by this (default 1.0)")
+        module.add_arguments(sub)
+
+    args = parser.parse_args()
+    report = SCENARIOS[args.scenario].run(args)
+    json.dump(report, sys.stdout, indent=2, ensure_ascii=False)
+    print()
+    return 1 if report.get("failed") else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
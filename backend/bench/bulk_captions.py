@@ -0,0 +1,100 @@
+"""
+Bulk caption jobs: videos per minute, one video at a time vs translate_videos.
+
+The transcript fetch is stubbed with a blocking call that takes --fetch-s
+seconds and returns --segments English fragments, unique to each video. Gemini
+is a FakeGenAI. "sequential" is the old client flow: for each video, fetch the
+captions, receive the segments, send them back and translate them, then move
+on to the next video. "bulk" is translate_videos over the same list. Both
+start from an empty caption cache. "bulk_warm" repeats the bulk job, so every
+fetch and translation is a cache hit.
+"""
+
+import json
+import time
+import asyncio
+import tempfile
+
+import caption_cache
+import captions_service
+from bench.stubs import Stopwatch, use_fake_genai
+from captions_service import fetch_captions_cached, translate_captions_cached, translate_videos
+
+_WORDS = "breathe in slowly and let your shoulders drop as the air fills your chest".split()
+
+
+def add_arguments(parser) -> None:
+    parser.add_argument("--videos", type=int, default=20, help="videos per job (default 20)")
+    parser.add_argument("--segments", type=int, default=150,
+                        help="caption fragments per video (default 150)")
+    parser.add_argument("--fetch-s", type=float, default=1.5,
+                        help="seconds per transcript fetch, before --time-scale (default 1.5)")
+
+
+def _stub_fetch(segments: int, fetch_s: float):
+    def fetch_captions(video_id: str, target_language: str) -> dict:
+        time.sleep(fetch_s)
+        fragments = []
+        for i in range(segments):
+            words = [_WORDS[(i + k) % len(_WORDS)] for k in range(5)]
+            end = "." if i % 3 == 2 else ""
+            fragments.append({
+                "start": i * 2.5,
+                "duration": 2.5,
+                "text": f"{video_id} {i} {' '.join(words)}{end}",
+            })
+        return {"video_id": video_id, "source_language": "en", "segments": fragments}
+
+    return fetch_captions
+
+
+async def _sequential(video_ids: list[str], target_language: str) -> list[dict]:
+    results = []
+    for video_id in video_ids:
+        captions = await fetch_captions_cached(video_id, target_language)
+        if "error" in captions:
+            results.append({"video_id": video_id, "error": captions["error"]})
+            continue
+        # The client held the segments and posted them back to be translated
+        segments = json.loads(json.dumps(captions["segments"]))
+        translated = await translate_captions_cached(segments, target_language)
+        results.append({"video_id": video_id, "segments": translated})
+    return results
+
+
+async def _bulk(video_ids: list[str], target_language: str) -> list[dict]:
+    return [result async for result in translate_videos(video_ids, target_language)]
+
+
+async def _measure(job, video_ids: list[str], client) -> dict:
+    calls = client.stats["calls"]
+    with Stopwatch() as clock:
+        results = await job(video_ids, "he")
+    errors = [r for r in results if "error" in r]
+    return {
+        "wall_s": clock.wall_s,
+        "videos_per_min": round(len(results) / clock.wall_s * 60, 1),
+        "gemini_calls": client.stats["calls"] - calls,
+        "errors": len(errors),
+    }
+
+
+def run(args) -> dict:
+    client = use_fake_genai(time_scale=args.time_scale)
+    captions_service.fetch_captions = _stub_fetch(args.segments, args.fetch_s * args.time_scale)
+    video_ids = [f"video{n:04d}" for n in range(args.videos)]
+
+    async def scenario():
+        report = {}
+        with tempfile.TemporaryDirectory() as cold, tempfile.TemporaryDirectory() as warm:
+            caption_cache.CAPTIONS_CACHE_DIR = cold
+            report["sequential"] = await _measure(_sequential, video_ids, client)
+            caption_cache.CAPTIONS_CACHE_DIR = warm
+            report["bulk"] = await _measure(_bulk, video_ids, client)
+            report["bulk_warm"] = await _measure(_bulk, video_ids, client)
+        return report
+
+    report = {"videos": args.videos, "segments": args.segments, **asyncio.run(scenario())}
+    report["speedup"] = round(report["bulk"]["videos_per_min"] / report["sequential"]["videos_per_min"], 2)
+    report["failed"] = any(report[name]["errors"] for name in ("sequential", "bulk", "bulk_warm"))
+    return report
@@ -0,0 +1,150 @@
+"""
+Memory and throughput of nikud inference: a model per worker vs the sidecar.
+
+Starts --workers processes, standing in for uvicorn workers. Each one
+vocalizes --texts distinct Hebrew segments, --concurrency at a time, the way
+TTS threads call add_nikud_to_segment. This runs twice:
+
+- per_worker: every worker loads its own Phonikud model;
+- sidecar: workers send their segments to one nikud_sidecar process.
+
+Reports the peak RSS of each worker (and of the sidecar) and the segment
+throughput once the models are loaded. Needs the Phonikud model from the
+Hugging Face hub.
+"""
+
+import os
+import sys
+import time
+import random
+import tempfile
+import threading
+import subprocess
+import multiprocessing
+from concurrent.futures import ThreadPoolExecutor
+
+_WORDS = (
+    "נשימה עמוקה ואיטית מרגישים את הגוף נח על הקרקע המחשבות עוברות כמו עננים "
+    "בשמיים רגע אחר רגע חוזרים בעדינות אל הנשימה משחררים את הכתפיים ואת הלסת "
+    "שמים לב לתחושות בכפות הידיים ובכפות הרגליים האוויר נכנס ויוצא בקצב טבעי"
+).split()
+_SIDECAR_START_TIMEOUT_S = 600
+
+
+def add_arguments(parser) -> None:
+    parser.add_argument("--workers", type=int, default=4, help="worker processes (default 4)")
+    parser.add_argument("--texts", type=int, default=200, help="segments per worker (default 200)")
+    parser.add_argument("--concurrency", type=int, default=4,
+                        help="segments in flight per worker (default 4)")
+    parser.add_argument("--seed", type=int, default=1)
+
+
+def _texts(rng: random.Random, count: int) -> list[str]:
+    # Shuffled words make every segment distinct, so the sidecar cache never hits
+    return [" ".join(rng.choices(_WORDS, k=rng.randint(8, 40))) + "." for _ in range(count)]
+
+
+def _peak_rss_mb(pid: int) -> float:
+    with open(f"/proc/{pid}/status") as status:
+        for line in status:
+            if line.startswith("VmHWM:"):
+                return round(int(line.split()[1]) / 1024, 1)
+    return 0.0
+
+
+def _worker(socket_path, texts, concurrency, ready, start, results) -> None:
+    if socket_path:
+        os.environ["NIKUD_SOCKET"] = socket_path
+    else:
+        os.environ.pop("NIKUD_SOCKET", None)
+    import nikud_service
+
+    try:
+        nikud_service.add_nikud_to_segment(texts[0])  # load the model / reach the sidecar
+    except BaseException:
+        ready.abort()
+        raise
+    ready.wait()
+    start.wait()
+    began = time.time()
+    with ThreadPoolExecutor(concurrency) as pool:
+        list(pool.map(nikud_service.add_nikud_to_segment, texts[1:]))
+    results.put({
+        "began": began,
+        "ended": time.time(),
+        "chars": sum(len(text) for text in texts[1:]),
+        "fell_back": nikud_service._sidecar_down_until > 0,
+        "peak_rss_mb": _peak_rss_mb(os.getpid()),
+    })
+
+
+def _run_workers(args, socket_path) -> dict:
+    context = multiprocessing.get_context("spawn")
+    ready = context.Barrier(args.workers + 1)
+    start = context.Barrier(args.workers + 1)
+    results = context.Queue()
+    rng = random.Random(args.seed)
+    workers = [
+        context.Process(target=_worker, args=(
+            socket_path, _texts(rng, args.texts + 1), args.concurrency, ready, start, results,
+        ))
+        for _ in range(args.workers)
+    ]
+    for worker in workers:
+        worker.start()
+    try:
+        ready.wait()
+    except threading.BrokenBarrierError:
+        for worker in workers:
+            worker.terminate()
+        raise RuntimeError("a worker failed to load nikud (see its traceback above)") from None
+    start.wait()
+    reports = [results.get() for _ in workers]
+    for worker in workers:
+        worker.join()
+
+    elapsed = max(r["ended"] for r in reports) - min(r["began"] for r in reports)
+    return {
+        "segments_per_s": round(args.workers * args.texts / elapsed, 1),
+        "chars_per_s": round(sum(r["chars"] for r in reports) / elapsed),
+        "worker_peak_rss_mb": [r["peak_rss_mb"] for r in reports],
+        "fell_back_to_local_model": any(r["fell_back"] for r in reports),
+    }
+
+
+def _sidecar_run(args) -> dict:
+    backend = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    with tempfile.TemporaryDirectory() as tmp:
+        socket_path = os.path.join(tmp, "nikud.sock")
+        sidecar = subprocess.Popen(
+            [sys.executable, "nikud_sidecar.py", "--socket", socket_path],
+            cwd=backend, stdout=subprocess.DEVNULL,
+        )
+        try:
+            deadline = time.monotonic() + _SIDECAR_START_TIMEOUT_S
+            while not os.path.exists(socket_path):
+                if sidecar.poll() is not None or time.monotonic() > deadline:
+                    raise RuntimeError("nikud sidecar did not start")
+                time.sleep(0.2)
+            report = _run_workers(args, socket_path)
+            report["sidecar_peak_rss_mb"] = _peak_rss_mb(sidecar.pid)
+        finally:
+            sidecar.terminate()
+            sidecar.wait()
+    return report
+
+
+def run(args) -> dict:
+    per_worker = _run_workers(args, None)
+    sidecar = _sidecar_run(args)
+    return {
+        "workers": args.workers,
+        "per_worker": {**per_worker, "total_peak_rss_mb": round(sum(per_worker["worker_peak_rss_mb"]), 1)},
+        "sidecar": {
+            **sidecar,
+            "total_peak_rss_mb": round(
+                sum(sidecar["worker_peak_rss_mb"]) + sidecar["sidecar_peak_rss_mb"], 1,
+            ),
+        },
+        "failed": sidecar["fell_back_to_local_model"],
+    }
@@ -0,0 +1,101 @@
+"""
+Memory and encode cost of a pause-heavy session, materialized vs symbolic.
+
+Builds one synthetic session, with --pause-share of its running time in
+pauses and bells mixed in, and renders it two ways.
+
+"materialized" is how rendering worked before pauses became symbolic:
+- pauses become silent PCM;
+- everything is joined into one AudioSegment;
+- a full-length bells track is overlaid on it;
+- the result is encoded as 192 kbps CBR MP3.
+
+"symbolic" is the current path: a Timeline with gaps and sparse bell events,
+streamed into the VBR MP3 profile.
+
+Reports the tracemalloc peak of rendering plus encoding, encode time and
+output size. Needs the real ffmpeg.
+"""
+
+import os
+import random
+import asyncio
+import tempfile
+import tracemalloc
+
+from pydub import AudioSegment
+
+import encode_service
+from audio_timeline import Timeline
+from bells_service import generate_bell_events, generate_bells_track
+from bench.stubs import Stopwatch, child_cpu_s, session_script, speech_pcm
+from config import OUTPUT_PROFILES, RENDER_SAMPLE_RATE
+
+# The MP3 profile before VBR
+_CBR_PROFILE = {"ext": "mp3", "args": ["-c:a", "libmp3lame", "-b:a", "192k", "-f", "mp3"]}
+
+
+def add_arguments(parser) -> None:
+    parser.add_argument("--minutes", type=float, default=20.0, help="session length (default 20)")
+    parser.add_argument("--pause-share", type=float, default=0.6,
+                        help="share of the session in pauses (default 0.6)")
+    parser.add_argument("--bells", type=int, default=50, help="bells volume, 0 for none (default 50)")
+    parser.add_argument("--seed", type=int, default=1)
+
+
+def _materialized(units: list, clips: list, bells_volume: int, stem: str) -> str:
+    chunks = []
+    for kind, seconds in units:
+        if kind == "speech":
+            chunks.append(clips.pop(0))
+        else:
+            chunks.append(AudioSegment.silent(int(seconds * 1000), RENDER_SAMPLE_RATE).raw_data)
+    combined = AudioSegment(b"".join(chunks), frame_rate=RENDER_SAMPLE_RATE,
+                            channels=1, sample_width=2)
+    del chunks
+    if bells_volume > 0:
+        combined = combined.overlay(generate_bells_track(len(combined), bells_volume))
+    timeline = Timeline(RENDER_SAMPLE_RATE)
+    timeline.add_clip(combined.raw_data)
+    return asyncio.run(encode_service.encode_audio(timeline, stem, "mp3_cbr"))
+
+
+def _symbolic(units: list, clips: list, bells_volume: int, stem: str) -> str:
+    timeline = Timeline(RENDER_SAMPLE_RATE)
+    for kind, seconds in units:
+        if kind == "speech":
+            timeline.add_clip(clips.pop(0))
+        else:
+            timeline.add_gap(int(seconds * 1000))
+    bells = []
+    if bells_volume > 0:
+        bells = generate_bell_events(timeline.duration_ms, bells_volume, timeline.frame_rate)
+    return asyncio.run(encode_service.encode_audio(timeline, stem, "mp3", bells))
+
+
+def run(args) -> dict:
+    rng = random.Random(args.seed)
+    units = session_script(args.minutes, args.pause_share, rng)
+    speech = [speech_pcm(seconds, rng) for kind, seconds in units if kind == "speech"]
+    report = {
+        "duration_s": round(sum(seconds for _, seconds in units), 1),
+        "pause_s": round(sum(seconds for kind, seconds in units if kind == "pause"), 1),
+        "speech_pcm_bytes": sum(len(clip) for clip in speech),
+    }
+    OUTPUT_PROFILES["mp3_cbr"] = _CBR_PROFILE
+    with tempfile.TemporaryDirectory() as out_dir:
+        encode_service.AUDIO_OUTPUT_DIR = out_dir
+        for name, render in (("materialized", _materialized), ("symbolic", _symbolic)):
+            cpu_before = child_cpu_s()
+            tracemalloc.start()
+            with Stopwatch() as clock:
+                path = render(units, list(speech), args.bells, name)
+            _, peak = tracemalloc.get_traced_memory()
+            tracemalloc.stop()
+            report[name] = {
+                "peak_traced_mb": round(peak / 2 ** 20, 1),
+                "render_s": clock.wall_s,
+                "ffmpeg_cpu_s": round(child_cpu_s() - cpu_before, 3),
+                "bytes": os.path.getsize(os.path.join(out_dir, path)),
+            }
+    return report
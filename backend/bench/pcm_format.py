@@ -0,0 +1,108 @@
+"""
+CPU time per session of engine-output decoding, before and after the
+single internal PCM format.
+
+Every speech clip of a synthetic session is prepared as each engine delivers
+it. Edge serves 24 kHz MP3. ElevenLabs used to serve 44.1 kHz 128 kbps MP3 and
+now serves raw 24 kHz PCM. The session is then assembled on a timeline and
+encoded to MP3 both ways:
+
+- before: every clip is decoded with pydub's from_mp3 (a temp-file round
+  trip), and the timeline runs at the clips' rate;
+- after: edge clips are decoded in one ffmpeg pass straight into the render
+  format, and ElevenLabs PCM is used as is.
+
+Reports this process's CPU time and ffmpeg's per session and engine. Needs
+the real ffmpeg.
+"""
+
+import io
+import random
+import asyncio
+import subprocess
+import tempfile
+
+from pydub import AudioSegment
+
+import encode_service
+import tts_service
+from audio_timeline import Timeline
+from bench.stubs import Stopwatch, child_cpu_s, session_script, speech_pcm
+from config import RENDER_SAMPLE_RATE
+
+
+def add_arguments(parser) -> None:
+    parser.add_argument("--minutes", type=float, default=10.0, help="session length (default 10)")
+    parser.add_argument("--pause-share", type=float, default=0.3,
+                        help="share of the session in pauses (default 0.3)")
+    parser.add_argument("--seed", type=int, default=1)
+
+
+def _mp3(pcm: bytes, rate: int, bitrate: str) -> bytes:
+    return subprocess.run(
+        [AudioSegment.converter, "-hide_banner", "-loglevel", "error",
+         "-f", "s16le", "-ar", str(RENDER_SAMPLE_RATE), "-ac", "1", "-i", "pipe:0",
+         "-ar", str(rate), "-c:a", "libmp3lame", "-b:a", bitrate, "-f", "mp3", "pipe:1"],
+        input=pcm, capture_output=True, check=True,
+    ).stdout
+
+
+async def _before(units: list, clips: list, stem: str) -> str:
+    audios = [await asyncio.to_thread(AudioSegment.from_mp3, io.BytesIO(clip)) for clip in clips]
+    frame_rate = max(audio.frame_rate for audio in audios)
+    timeline = Timeline(frame_rate)
+    audios.reverse()
+    for kind, seconds in units:
+        if kind == "speech":
+            audio = audios.pop().set_frame_rate(frame_rate).set_channels(1).set_sample_width(2)
+            timeline.add_clip(audio.raw_data)
+        else:
+            timeline.add_gap(int(seconds * 1000))
+    return await encode_service.encode_audio(timeline, stem, "mp3")
+
+
+async def _after(units: list, clips: list, compressed: bool, stem: str) -> str:
+    timeline = Timeline(RENDER_SAMPLE_RATE)
+    clips = list(reversed(clips))
+    for kind, seconds in units:
+        if kind != "speech":
+            timeline.add_gap(int(seconds * 1000))
+        elif compressed:
+            timeline.add_clip((await tts_service._decode_to_render_format(clips.pop())).raw_data)
+        else:
+            timeline.add_clip(clips.pop())
+    return await encode_service.encode_audio(timeline, stem, "mp3")
+
+
+def _measure(render) -> dict:
+    cpu_before = child_cpu_s()
+    with Stopwatch() as clock:
+        asyncio.run(render())
+    ffmpeg_cpu = child_cpu_s() - cpu_before
+    return {
+        "cpu_s": clock.cpu_s,
+        "ffmpeg_cpu_s": round(ffmpeg_cpu, 3),
+        "total_cpu_s": round(clock.cpu_s + ffmpeg_cpu, 3),
+        "wall_s": clock.wall_s,
+    }
+
+
+def run(args) -> dict:
+    rng = random.Random(args.seed)
+    units = session_script(args.minutes, args.pause_share, rng)
+    speech = [speech_pcm(seconds, rng) for kind, seconds in units if kind == "speech"]
+    edge_mp3 = [_mp3(pcm, RENDER_SAMPLE_RATE, "48k") for pcm in speech]
+    eleven_mp3 = [_mp3(pcm, 44100, "128k") for pcm in speech]
+
+    report = {"duration_s": round(sum(seconds for _, seconds in units), 1), "clips": len(speech)}
+    with tempfile.TemporaryDirectory() as out_dir:
+        encode_service.AUDIO_OUTPUT_DIR = out_dir
+        report["edge"] = {
+            "before": _measure(lambda: _before(units, edge_mp3, "edge_before")),
+            "after": _measure(lambda: _after(units, edge_mp3, True, "edge_after")),
+        }
+        report["elevenlabs"] = {
+            "before": _measure(lambda: _before(units, eleven_mp3, "eleven_before")),
+            "after": _measure(lambda: _after(units, speech, False, "eleven_after")),
+        }
+    return report
@@ -0,0 +1,53 @@
+"""
+Encode time and output size of each output profile.
+
+Encodes the same synthetic session (speech clips and pauses on a render
+timeline) through encode_service with every profile in OUTPUT_PROFILES, using
+the real ffmpeg, and reports wall time, ffmpeg CPU time and output bytes.
+Output goes to a temporary directory.
+"""
+
+import os
+import random
+import asyncio
+import tempfile
+
+import encode_service
+from bench.stubs import Stopwatch, child_cpu_s, session_script, session_timeline
+from config import OUTPUT_PROFILES
+
+
+def add_arguments(parser) -> None:
+    parser.add_argument("--minutes", type=float, default=10.0, help="session length (default 10)")
+    parser.add_argument("--pause-share", type=float, default=0.3,
+                        help="share of the session in pauses (default 0.3)")
+    parser.add_argument("--profiles", nargs="+", default=list(OUTPUT_PROFILES),
+                        choices=list(OUTPUT_PROFILES))
+    parser.add_argument("--seed", type=int, default=1)
+
+
+def _size(path: str) -> int:
+    if not os.path.isdir(path):
+        return os.path.getsize(path)
+    return sum(entry.stat().st_size for entry in os.scandir(path))
+
+
+def run(args) -> dict:
+    rng = random.Random(args.seed)
+    timeline = session_timeline(session_script(args.minutes, args.pause_share, rng), rng)
+    report = {"duration_s": round(timeline.duration_ms / 1000, 1), "profiles": {}}
+    with tempfile.TemporaryDirectory() as out_dir:
+        encode_service.AUDIO_OUTPUT_DIR = out_dir
+        for profile in args.profiles:
+            cpu_before = child_cpu_s()
+            with Stopwatch() as clock:
+                path = asyncio.run(encode_service.encode_audio(timeline, profile, profile))
+            size = _size(os.path.dirname(os.path.join(out_dir, path))
+                         if profile == "hls" else os.path.join(out_dir, path))
+            report["profiles"][profile] = {
+                "encode_s": clock.wall_s,
+                "ffmpeg_cpu_s": round(child_cpu_s() - cpu_before, 3),
+                "bytes": size,
+                "kbps": round(size * 8 / timeline.duration_ms, 1),
+            }
+    return report
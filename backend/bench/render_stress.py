@@ -0,0 +1,113 @@
+"""
+Memory of concurrent full renders against the PCM budget.
+
+Runs --sessions generate_audio calls at once on --minutes long scripts, with a
+fake TTS engine returning synthetic speech. Output and render caches go to a
+temporary directory. A thread samples this process's memory while they run.
+
+The cap applies to anonymous memory (RssAnon), the part the budget governs.
+Spilled clips are read through mmap, and those file pages show up in VmRSS
+but are page cache the kernel can drop. VmRSS is reported too. The run fails
+(exit status 1) when anonymous memory grows past --rss-cap-mb above what the
+process used before rendering.
+"""
+
+import random
+import asyncio
+import tempfile
+import threading
+
+from pydub import AudioSegment
+
+import encode_service
+import render_manifest
+import render_memory
+import tts_service
+from bench.stubs import FakeTTS, Stopwatch, session_script, session_text
+from config import RENDER_MEMORY_BUDGET_MB
+from render_memory import MemoryBudget
+
+_SAMPLE_INTERVAL_S = 0.01
+
+
+def add_arguments(parser) -> None:
+    parser.add_argument("--sessions", type=int, default=8, help="concurrent renders (default 8)")
+    parser.add_argument("--minutes", type=float, default=30.0, help="session length (default 30)")
+    parser.add_argument("--budget-mb", type=int, default=RENDER_MEMORY_BUDGET_MB,
+                        help=f"PCM memory budget (default {RENDER_MEMORY_BUDGET_MB})")
+    parser.add_argument("--rss-cap-mb", type=float, default=None,
+                        help="allowed anonymous memory growth (default: budget + 128)")
+    parser.add_argument("--converter", default=None,
+                        help="encoder executable (default: pydub's ffmpeg)")
+    parser.add_argument("--seed", type=int, default=1)
+
+
+def _memory_mb() -> dict:
+    values = {}
+    with open("/proc/self/status") as status:
+        for line in status:
+            key, _, rest = line.partition(":")
+            if key in ("VmRSS", "RssAnon"):
+                values[key] = int(rest.split()[0]) / 1024
+    return values
+
+
+class _Sampler(threading.Thread):
+    def __init__(self):
+        super().__init__(daemon=True)
+        self.baseline = _memory_mb()
+        self.peak = dict(self.baseline)
+        self._done = threading.Event()
+
+    def run(self) -> None:
+        while not self._done.wait(_SAMPLE_INTERVAL_S):
+            for key, value in _memory_mb().items():
+                self.peak[key] = max(self.peak[key], value)
+
+    def stop(self) -> None:
+        self._done.set()
+        self.join()
+
+    def growth(self, key: str) -> float:
+        return round(self.peak[key] - self.baseline[key], 1)
+
+
+def run(args) -> dict:
+    rng = random.Random(args.seed)
+    scripts = [session_text(session_script(args.minutes, 0.3, rng)) for _ in range(args.sessions)]
+    cap_mb = args.rss_cap_mb if args.rss_cap_mb is not None else args.budget_mb + 128
+
+    if args.converter:
+        AudioSegment.converter = args.converter
+    engine = FakeTTS(time_scale=args.time_scale, seed=args.seed)
+    tts_service.resilient_tts._engines[tts_service.TTS_ENGINE] = engine
+    render_memory.budget = MemoryBudget(args.budget_mb * 1024 * 1024)
+
+    async def render_all():
+        return await asyncio.gather(*(
+            tts_service.generate_audio(script, bells_volume=50) for script in scripts
+        ))
+
+    with tempfile.TemporaryDirectory() as tmp:
+        encode_service.AUDIO_OUTPUT_DIR = tmp
+        render_manifest.RENDER_DIR = tmp
+        sampler = _Sampler()
+        sampler.start()
+        try:
+            with Stopwatch() as clock:
+                asyncio.run(render_all())
+        finally:
+            sampler.stop()
+
+    growth = sampler.growth("RssAnon")
+    return {
+        "sessions": args.sessions,
+        "minutes": args.minutes,
+        "tts_calls": engine.calls,
+        "budget": render_memory.budget.status(),
+        "rss_anon_growth_mb": growth,
+        "vm_rss_growth_mb": sampler.growth("VmRSS"),
+        "rss_cap_mb": cap_mb,
+        "wall_s": clock.wall_s,
+        "failed": growth > cap_mb,
+    }
@@ -0,0 +1,145 @@
+"""
+Segment latency tails with injected engine faults, with and without ResilientTTS.
+
+The fake engines answer in `base + chars / chars_per_s` seconds with lognormal
+jitter. The primary (edge, hedged) also stalls for --stall seconds on
+--stall-rate of its calls and fails outright on --error-rate of them. The
+fallback (elevenlabs) is slower but healthy. Two setups get the same
+sessions through a TTSScheduler with the configured caps. "direct" calls the
+primary and moves to the fallback on an error, as rendering did before the
+resilience layer. "resilient" goes through ResilientTTS.
+
+The layer's timeout, hedge and cooldown constants are multiplied by
+--time-scale along with the stub latencies.
+"""
+
+import time
+import random
+import asyncio
+
+import tts_resilience
+from bench.stubs import Stopwatch, percentiles
+from config import TTS_MAX_CONCURRENCY, TTS_ENGINE_CONCURRENCY
+from tts_resilience import ResilientTTS
+from tts_scheduler import TTSScheduler
+
+_PRIMARY, _FALLBACK = "edge", "elevenlabs"
+_SCALED_CONSTANTS = (
+    "_TIMEOUT_MIN_S", "_TIMEOUT_MAX_S", "_DEFAULT_TIMEOUT_S",
+    "_HEDGE_MIN_DELAY_S", "_BREAKER_COOLDOWN_S",
+)
+
+
+def add_arguments(parser) -> None:
+    parser.add_argument("--sessions", type=int, default=10, help="concurrent sessions (default 10)")
+    parser.add_argument("--segments", type=int, default=40, help="segments per session (default 40)")
+    parser.add_argument("--stall-rate", type=float, default=0.03,
+                        help="share of primary calls that stall (default 0.03)")
+    parser.add_argument("--stall", type=float, default=45.0,
+                        help="seconds a stalled call hangs, before --time-scale (default 45)")
+    parser.add_argument("--error-rate", type=float, default=0.05,
+                        help="share of primary calls that fail (default 0.05)")
+    parser.add_argument("--seed", type=int, default=1)
+
+
+class FaultyEngine:
+    """Fake TTS engine with a latency model and injected stalls and errors."""
+
+    def __init__(self, rng: random.Random, time_scale: float, base_s: float, chars_per_s: float,
+                 stall_rate: float = 0.0, stall_s: float = 0.0, error_rate: float = 0.0):
+        self.rng = rng
+        self.time_scale = time_scale
+        self.base_s = base_s
+        self.chars_per_s = chars_per_s
+        self.stall_rate = stall_rate
+        self.stall_s = stall_s
+        self.error_rate = error_rate
+        self.stats = {"calls": 0, "stalls": 0, "errors": 0}
+
+    async def __call__(self, text: str, language: str) -> str:
+        self.stats["calls"] += 1
+        roll = self.rng.random()
+        if roll < self.error_rate:
+            self.stats["errors"] += 1
+            await asyncio.sleep(self.base_s * self.time_scale)
+            raise ConnectionError("injected engine error")
+        seconds = (self.base_s + len(text) / self.chars_per_s) * self.rng.lognormvariate(0, 0.3)
+        if roll < self.error_rate + self.stall_rate:
+            self.stats["stalls"] += 1
+            seconds = self.stall_s
+        await asyncio.sleep(seconds * self.time_scale)
+        return text
+
+
+def _engines(args, seed_offset: int) -> dict:
+    rng = random.Random(args.seed + seed_offset)
+    return {
+        _PRIMARY: FaultyEngine(rng, args.time_scale, 0.5, 200.0,
+                               args.stall_rate, args.stall, args.error_rate),
+        _FALLBACK: FaultyEngine(rng, args.time_scale, 1.0, 120.0),
+    }
+
+
+async def _direct(engines: dict, text: str) -> str:
+    try:
+        return await engines[_PRIMARY](text, "he")
+    except Exception:
+        return await engines[_FALLBACK](text, "he")
+
+
+async def _measure(synthesize, texts: list[list[str]], scheduler: TTSScheduler) -> dict:
+    latencies = []
+    failures = 0
+
+    async def timed(text):
+        started = time.monotonic()
+        result = await synthesize(text)
+        latencies.append(time.monotonic() - started)
+        return result
+
+    async def session(segments):
+        nonlocal failures
+        async with scheduler.session(_PRIMARY) as tts:
+            futures = tts.submit_many([(len(t), lambda t=t: timed(t)) for t in segments])
+            for outcome in await asyncio.gather(*futures, return_exceptions=True):
+                failures += isinstance(outcome, Exception)
+
+    with Stopwatch() as clock:
+        await asyncio.gather(*(session(segments) for segments in texts))
+    return {
+        "segment_latency_s": percentiles(latencies, (50, 95, 99)),
+        "failed_segments": failures,
+        "wall_s": clock.wall_s,
+    }
+
+
+def run(args) -> dict:
+    rng = random.Random(args.seed)
+    texts = [
+        ["א" * rng.randint(80, 400) for _ in range(args.segments)]
+        for _ in range(args.sessions)
+    ]
+    for name in _SCALED_CONSTANTS:
+        setattr(tts_resilience, name, getattr(tts_resilience, name) * args.time_scale)
+
+    direct_engines = _engines(args, 1)
+    direct = asyncio.run(_measure(
+        lambda text: _direct(direct_engines, text), texts,
+        TTSScheduler(TTS_MAX_CONCURRENCY, TTS_ENGINE_CONCURRENCY),
+    ))
+    direct["engines"] = {name: engine.stats for name, engine in direct_engines.items()}
+
+    resilient_engines = _engines(args, 1)
+    scheduler = TTSScheduler(TTS_MAX_CONCURRENCY, TTS_ENGINE_CONCURRENCY)
+    tts = ResilientTTS(
+        engines=resilient_engines, fallbacks={_PRIMARY: _FALLBACK},
+        hedged={_PRIMARY}, slots=scheduler,
+    )
+
+    async def synthesize(text):
+        return await tts.synthesize(text, "he", tts.route(_PRIMARY))
+
+    resilient = asyncio.run(_measure(synthesize, texts, scheduler))
+    resilient["stats"] = tts.stats
+    resilient["engines"] = {name: engine.stats for name, engine in resilient_engines.items()}
+    return {"segments": args.sessions * args.segments, "direct": direct, "resilient": resilient}
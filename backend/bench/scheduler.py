@@ -0,0 +1,119 @@
+"""
+Session completion times under the TTS scheduler and under FIFO.
+
+A mix of short (3-minute) and long (30-minute) sessions arrive at random
+over --arrival-window seconds. Their segments go to a fake engine that takes
+`base + chars / chars_per_s` seconds per segment. Two setups are measured.
+In the first, the sessions share a TTSScheduler with the configured caps.
+In the second, every segment queues first come, first served for one
+semaphore of the engine's cap, which is how rendering worked before the
+scheduler. overall_p95_s puts the p95 completion time over all sessions of
+the two setups side by side.
+"""
+
+import time
+import random
+import asyncio
+
+from bench.stubs import Stopwatch, percentiles
+from config import TTS_MAX_CONCURRENCY, TTS_ENGINE_CONCURRENCY
+from tts_scheduler import TTSScheduler
+
+_ENGINE = "edge"
+# Segments per session length, roughly one per 15 s of speech between pauses
+_SEGMENTS = {"short": 12, "long": 120}
+
+
+def add_arguments(parser) -> None:
+    parser.add_argument("--sessions", type=int, default=30, help="sessions in the run (default 30)")
+    parser.add_argument("--long-share", type=float, default=0.2,
+                        help="fraction of 30-minute sessions (default 0.2)")
+    parser.add_argument("--arrival-window", type=float, default=60.0,
+                        help="sessions arrive uniformly over this many seconds (default 60)")
+    parser.add_argument("--seed", type=int, default=1)
+
+
+class _FakeEngine:
+    def __init__(self, time_scale: float, base_s: float = 0.4, chars_per_s: float = 150.0):
+        self.time_scale = time_scale
+        self.base_s = base_s
+        self.chars_per_s = chars_per_s
+
+    async def synthesize(self, chars: int) -> int:
+        await asyncio.sleep((self.base_s + chars / self.chars_per_s) * self.time_scale)
+        return chars
+
+
+def _workload(args) -> list[dict]:
+    rng = random.Random(args.seed)
+    sessions = []
+    for _ in range(args.sessions):
+        kind = "long" if rng.random() < args.long_share else "short"
+        sessions.append({
+            "kind": kind,
+            "arrival": rng.uniform(0, args.arrival_window) * args.time_scale,
+            "segments": [rng.randint(80, 400) for _ in range(_SEGMENTS[kind])],
+        })
+    return sessions
+
+
+async def _scheduled(session: dict, engine: _FakeEngine, scheduler: TTSScheduler) -> None:
+    async with scheduler.session(_ENGINE) as tts:
+        futures = tts.submit_many([
+            (chars, lambda c=chars: engine.synthesize(c)) for chars in session["segments"]
+        ])
+        await asyncio.gather(*futures)
+
+
+async def _fifo(session: dict, engine: _FakeEngine, slots: asyncio.Semaphore) -> None:
+    async def one(chars):
+        async with slots:
+            return await engine.synthesize(chars)
+
+    await asyncio.gather(*(one(chars) for chars in session["segments"]))
+
+
+async def _measure(render, sessions: list[dict]) -> dict:
+    start = time.monotonic()
+    times = {"short": [], "long": []}
+
+    async def arrive(session):
+        await asyncio.sleep(session["arrival"])
+        arrived = time.monotonic()
+        await render(session)
+        times[session["kind"]].append(time.monotonic() - arrived)
+
+    with Stopwatch() as clock:
+        await asyncio.gather(*(arrive(session) for session in sessions))
+    return {
+        "short_completion_s": percentiles(times["short"], (50, 95)),
+        "long_completion_s": percentiles(times["long"], (50, 95)),
+        "overall_completion_s": percentiles(times["short"] + times["long"], (50, 95)),
+        "makespan_s": round(time.monotonic() - start, 3),
+        "cpu_s": clock.cpu_s,
+    }
+
+
+def run(args) -> dict:
+    sessions = _workload(args)
+    engine = _FakeEngine(args.time_scale)
+    cap = TTS_ENGINE_CONCURRENCY[_ENGINE]
+
+    async def scheduled():
+        scheduler = TTSScheduler(TTS_MAX_CONCURRENCY, TTS_ENGINE_CONCURRENCY)
+        return await _measure(lambda s: _scheduled(s, engine, scheduler), sessions)
+
+    async def fifo():
+        slots = asyncio.Semaphore(cap)
+        return await _measure(lambda s: _fifo(s, engine, slots), sessions)
+
+    report = {
+        "sessions": {kind: sum(s["kind"] == kind for s in sessions) for kind in _SEGMENTS},
+        "engine_cap": cap,
+        "scheduler": asyncio.run(scheduled()),
+        "fifo": asyncio.run(fifo()),
+    }
+    report["overall_p95_s"] = {
+        name: report[name]["overall_completion_s"]["p95"] for name in ("scheduler", "fifo")
+    }
+    return report
@@ -0,0 +1,121 @@
+"""
+Event-loop wakeups and progress latency of many concurrent SSE streams.
+
+Runs --sessions streams at once. Each publishes --events progress updates at
+random times over --duration seconds, then a completion event. The streams
+are consumed two ways. The current way uses ProgressBus, with disconnects left
+to sse-starlette. The old way polls a queue every 0.5 s and calls
+is_disconnected() on every iteration.
+
+The bus holds progress updates back to one per PROGRESS_MIN_INTERVAL on
+purpose. It therefore runs a second time without the throttle, to compare
+delivery latency like for like. Completion latency is reported separately.
+On the throttled bus it includes waiting behind a held-back update.
+"""
+
+import time
+import random
+import asyncio
+from functools import partial
+
+from bench.stubs import Stopwatch, percentiles
+from progress_bus import ProgressBus
+
+_POLL_TIMEOUT_S = 0.5
+
+
+def add_arguments(parser) -> None:
+    parser.add_argument("--sessions", type=int, default=500, help="concurrent streams (default 500)")
+    parser.add_argument("--events", type=int, default=40, help="progress updates per stream (default 40)")
+    parser.add_argument("--duration", type=float, default=20.0,
+                        help="seconds each stream runs, before --time-scale (default 20)")
+
+
+class _Request:
+    """is_disconnected() the way Starlette does it: a receive that gives up at once."""
+
+    async def is_disconnected(self) -> bool:
+        await asyncio.sleep(0)
+        return False
+
+
+async def _produce(publish, close, events: int, duration: float) -> None:
+    start = time.monotonic()
+    for n, at in enumerate(sorted(random.uniform(0, duration) for _ in range(events))):
+        await asyncio.sleep(max(0.0, start + at - time.monotonic()))
+        publish({"event": "progress", "percent": n, "sent": time.monotonic()}, True)
+    publish({"event": "complete", "sent": time.monotonic()}, False)
+    close()
+
+
+def _record(latencies: dict, event: dict) -> None:
+    latencies[event["event"]].append(time.monotonic() - event["sent"])
+
+
+async def _bus_stream(events: int, duration: float, latencies: dict, **bus_args) -> None:
+    bus = ProgressBus(**bus_args)
+    producer = asyncio.create_task(_produce(bus.publish, bus.close, events, duration))
+    async for event in bus.events():
+        _record(latencies, event)
+    await producer
+
+
+async def _polling_stream(events: int, duration: float, latencies: dict) -> None:
+    queue: asyncio.Queue = asyncio.Queue()
+    request = _Request()
+    producer = asyncio.create_task(_produce(
+        lambda event, coalesce: queue.put_nowait(event), lambda: None, events, duration,
+    ))
+    while True:
+        if await request.is_disconnected():
+            break
+        try:
+            event = await asyncio.wait_for(queue.get(), timeout=_POLL_TIMEOUT_S)
+        except asyncio.TimeoutError:
+            continue
+        _record(latencies, event)
+        if event["event"] == "complete":
+            break
+    await producer
+
+
+async def _measure(stream, sessions: int, events: int, duration: float) -> dict:
+    # Every pass of the event loop blocks in selector.select() exactly once
+    selector = asyncio.get_running_loop()._selector
+    select = selector.select
+    wakeups = 0
+
+    def counting_select(timeout=None):
+        nonlocal wakeups
+        wakeups += 1
+        return select(timeout)
+
+    selector.select = counting_select
+    latencies = {"progress": [], "complete": []}
+    try:
+        with Stopwatch() as clock:
+            await asyncio.gather(*(stream(events, duration, latencies) for _ in range(sessions)))
+    finally:
+        selector.select = select
+    return {
+        "loop_wakeups": wakeups,
+        "wakeups_per_s": round(wakeups / clock.wall_s),
+        "progress_delivered": len(latencies["progress"]),
+        "progress_latency_s": percentiles(latencies["progress"]),
+        "complete_latency_s": percentiles(latencies["complete"]),
+        "cpu_s": clock.cpu_s,
+        "wall_s": clock.wall_s,
+    }
+
+
+def run(args) -> dict:
+    duration = args.duration * args.time_scale
+    report = {"sessions": args.sessions, "progress_published": args.sessions * args.events}
+    streams = {
+        "progress_bus": _bus_stream,
+        "progress_bus_unthrottled": partial(_bus_stream, min_interval=0),
+        "polling": _polling_stream,
+    }
+    for name, stream in streams.items():
+        report[name] = asyncio.run(_measure(stream, args.sessions, args.events, duration))
+    return report
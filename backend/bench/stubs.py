@@ -0,0 +1,176 @@
+"""Stub providers and measurement helpers shared by the scenarios."""
+
+import re
+import time
+import random
+import asyncio
+import resource
+from types import SimpleNamespace
+
+import numpy as np
+from pydub import AudioSegment
+
+from config import RENDER_SAMPLE_RATE, PAUSE_DURATIONS
+from llm_gateway import gateway
+from audio_timeline import Timeline
+
+_TRANSLATE_PAYLOAD = re.compile(r"TEXT TO TRANSLATE:\n(.*)\Z", re.DOTALL)
+_NUMBERED_LINE = re.compile(r"^\d+\. .*$", re.MULTILINE)
+
+
+def percentiles(values, points=(50, 95, 99)) -> dict:
+    ordered = sorted(values)
+    if not ordered:
+        return {f"p{p}": None for p in points}
+    return {
+        f"p{p}": round(ordered[min(len(ordered) - 1, int(p / 100 * len(ordered)))], 4)
+        for p in points
+    }
+
+
+class FakeGenAI:
+    """
+    Stand-in for genai.Client. generate_content takes `base_s` plus the time
+    to "generate" its output at `chars_per_s`. It answers a translation prompt
+    with the text to translate (pause markers intact) and a subtitle prompt
+    with its numbered lines. Token counts are characters / 4.
+    """
+
+    def __init__(self, base_s: float = 0.6, chars_per_s: float = 500.0, time_scale: float = 1.0):
+        self.base_s = base_s
+        self.chars_per_s = chars_per_s
+        self.time_scale = time_scale
+        self.stats = {"calls": 0, "prompt_tokens": 0, "output_tokens": 0}
+        self.aio = SimpleNamespace(
+            models=SimpleNamespace(generate_content=self._generate),
+            caches=SimpleNamespace(create=self._create_cache),
+        )
+
+    async def _generate(self, model, contents, config=None):
+        prompt = contents if isinstance(contents, str) else repr(contents)
+        match = _TRANSLATE_PAYLOAD.search(prompt)
+        if match:
+            text = match.group(1)
+        else:
+            text = "\n".join(_NUMBERED_LINE.findall(prompt)) or "Breathe in slowly. [pause] " * 20
+        self.stats["calls"] += 1
+        self.stats["prompt_tokens"] += len(prompt) // 4
+        self.stats["output_tokens"] += len(text) // 4
+        await asyncio.sleep((self.base_s + len(text) / self.chars_per_s) * self.time_scale)
+        usage = SimpleNamespace(
+            prompt_token_count=len(prompt) // 4,
+            cached_content_token_count=0,
+            candidates_token_count=len(text) // 4,
+        )
+        return SimpleNamespace(text=text, usage_metadata=usage)
+
+    async def _create_cache(self, model, config):
+        return SimpleNamespace(name=f"cachedContents/{id(config)}")
+
+
+def use_fake_genai(**kwargs) -> FakeGenAI:
+    """Route the shared LLM gateway to a FakeGenAI."""
+    client = FakeGenAI(**kwargs)
+    gateway._client = client
+    return client
+
+
+class Stopwatch:
+    """Wall and CPU time (this process, all threads) of a block."""
+
+    def __enter__(self):
+        self._wall = time.perf_counter()
+        self._cpu = time.process_time()
+        return self
+
+    def __exit__(self, *exc):
+        self.wall_s = round(time.perf_counter() - self._wall, 4)
+        self.cpu_s = round(time.process_time() - self._cpu, 4)
+
+
+def speech_pcm(seconds: float, rng: random.Random, frame_rate: int = RENDER_SAMPLE_RATE) -> bytes:
+    """
+    Speech-like 16-bit mono PCM: noise shaped into syllable-rate bursts, so
+    encoders see neither pure tones nor white noise.
+    """
+    frames = int(seconds * frame_rate)
+    noise = np.random.default_rng(rng.getrandbits(32)).standard_normal(frames)
+    voiced = np.convolve(noise, np.ones(12) / 12, mode="same")
+    t = np.arange(frames) / frame_rate
+    envelope = np.clip(np.sin(2 * np.pi * 4 * t + rng.random() * 6), 0, None) ** 2
+    return (voiced * envelope * 6000).astype(np.int16).tobytes()
+
+
+def session_script(minutes: float, pause_share: float, rng: random.Random) -> list[tuple[str, float]]:
+    """
+    A session's render units as ("speech" | "pause", seconds), with about
+    `pause_share` of the running time in pauses.
+    """
+    units = []
+    speech_s = 0.0
+    pause_s = 0.0
+    while speech_s + pause_s < minutes * 60:
+        seconds = rng.uniform(6, 18)
+        units.append(("speech", seconds))
+        speech_s += seconds
+        while pause_s < pause_share * (speech_s + pause_s):
+            seconds = rng.choice(list(PAUSE_DURATIONS.values())) / 1000
+            units.append(("pause", seconds))
+            pause_s += seconds
+    return units
+
+
+def session_timeline(units: list[tuple[str, float]], rng: random.Random) -> Timeline:
+    """A render timeline of `units` (see session_script) with synthetic speech."""
+    timeline = Timeline(RENDER_SAMPLE_RATE)
+    for kind, seconds in units:
+        if kind == "speech":
+            timeline.add_clip(speech_pcm(seconds, rng))
+        else:
+            timeline.add_gap(int(seconds * 1000))
+    return timeline
+
+
+def child_cpu_s() -> float:
+    """CPU time of this process's waited-for children (ffmpeg), user + system."""
+    usage = resource.getrusage(resource.RUSAGE_CHILDREN)
+    return usage.ru_utime + usage.ru_stime
+
+
+# Speaking rate of the synthetic voice, characters of text per second of audio
+SPEECH_CHARS_PER_S = 15
+_PAUSE_MARKERS = {ms: marker for marker, ms in PAUSE_DURATIONS.items()}
+_FILLER = "breathe in slowly and let the body soften a little more with every breath "
+
+
+def session_text(units: list[tuple[str, float]]) -> str:
+    """An English script for `units` (see session_script) with pause markers."""
+    parts = []
+    for kind, seconds in units:
+        if kind == "speech":
+            chars = int(seconds * SPEECH_CHARS_PER_S)
+            parts.append((_FILLER * (chars // len(_FILLER) + 1))[:chars].strip() + ".")
+        else:
+            parts.append(_PAUSE_MARKERS[int(seconds * 1000)])
+    return "\n".join(parts)
+
+
+class FakeTTS:
+    """
+    Stand-in TTS engine `fn(text, language)`: waits `base_s + chars / chars_per_s`
+    and returns synthetic speech at the render rate, SPEECH_CHARS_PER_S long.
+    """
+
+    def __init__(self, base_s: float = 0.8, chars_per_s: float = 150.0, time_scale: float = 1.0,
+                 seed: int = 1):
+        self.base_s = base_s
+        self.chars_per_s = chars_per_s
+        self.time_scale = time_scale
+        self.rng = random.Random(seed)
+        self.calls = 0
+
+    async def __call__(self, text: str, language: str) -> AudioSegment:
+        self.calls += 1
+        await asyncio.sleep((self.base_s + len(text) / self.chars_per_s) * self.time_scale)
+        pcm = speech_pcm(len(text) / SPEECH_CHARS_PER_S, self.rng)
+        return AudioSegment(pcm, frame_rate=RENDER_SAMPLE_RATE, channels=1, sample_width=2)
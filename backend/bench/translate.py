@@ -0,0 +1,73 @@
+"""
+Chunked concurrent translation vs one Gemini call per script.
+
+For each --requests level, sends that many concurrent translations of a
+--chars long script through the shared gateway: once as a single prompt per
+script (the old path), once split into chunks translated concurrently
+(translate_text). The FakeGenAI's latency grows with output length.
+"""
+
+import asyncio
+
+from bench.stubs import Stopwatch, percentiles, use_fake_genai
+from translation_service import build_translation_prompt, translate_text
+from llm_gateway import gateway
+
+_PARAGRAPH = (
+    "Let your breath slow down and settle ({}). [pause] Feel the weight of your body "
+    "resting, supported and safe. [breath] With every exhale, let go a little more.\n\n"
+)
+
+
+def _script(chars: int, request: int) -> str:
+    """A script unique to `request` in every paragraph, so the gateway can't coalesce them."""
+    paragraphs = []
+    while sum(map(len, paragraphs)) < chars:
+        paragraphs.append(_PARAGRAPH.format(f"{request}.{len(paragraphs)}"))
+    return "".join(paragraphs)[:chars]
+
+
+def add_arguments(parser) -> None:
+    parser.add_argument("--chars", type=int, default=30000, help="script length (default 30000)")
+    parser.add_argument("--requests", type=int, nargs="+", default=[1, 20],
+                        help="concurrency levels to run (default 1 20)")
+
+
+async def _single_call(text: str) -> str:
+    response = await gateway.generate(build_translation_prompt(text, "en", "he"))
+    return response.text.strip()
+
+
+async def _measure(translate, chars: int, requests: int) -> dict:
+    async def one(i: int) -> float:
+        loop = asyncio.get_running_loop()
+        start = loop.time()
+        await translate(_script(chars, i))
+        return loop.time() - start
+
+    with Stopwatch() as clock:
+        latencies = await asyncio.gather(*(one(i) for i in range(requests)))
+    return {
+        "latency_s": percentiles(latencies),
+        "wall_s": clock.wall_s,
+        "chars_per_s": round(requests * chars / clock.wall_s),
+    }
+
+
+def run(args) -> dict:
+    client = use_fake_genai(time_scale=args.time_scale)
+
+    async def scenario():
+        report = {}
+        for requests in args.requests:
+            level = report[f"{requests}_concurrent"] = {}
+            for name, translate in (
+                ("single_call", _single_call),
+                ("chunked", lambda t: translate_text(t, "en", "he")),
+            ):
+                calls = client.stats["calls"]
+                level[name] = await _measure(translate, args.chars, requests)
+                level[name]["gemini_calls"] = client.stats["calls"] - calls
+        return report
+
+    return {"chars": args.chars, **asyncio.run(scenario())}
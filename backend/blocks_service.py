@@ -0,0 +1,139 @@
+"""
+Library of pre-rendered, topic-independent session blocks.
+The opening (induction + deepening) and closing (emergence) are generated and
+synthesized once per mode, language, age group and depth by an offline job;
+sessions then only ask the LLM for the topic-specific middle and splice it
+between the cached blocks.
+
+Build the library with:  python blocks_service.py [--mode hypnosis] [--force]
+"""
+
+import os
+import json
+import asyncio
+import argparse
+from functools import lru_cache
+
+from pydub import AudioSegment
+
+from config import BLOCKS_DIR
+from prompt_template import build_meditation_instructions, build_block_request
+from prompt_cache import generate_with_instructions
+from tts_service import synthesize_script
+
+BLOCK_KINDS = ("opening", "closing")
+
+# Target length of each block when building the library
+BLOCK_MINUTES = {"opening": 3, "closing": 1}
+
+# Below this, splicing blocks leaves too little room for the therapeutic work
+MIN_MIDDLE_MINUTES = 2
+
+MODES = ("imagery", "hypnosis")
+LANGUAGES = ("he", "en")
+AGE_GROUPS = ("children", "teens", "adults")
+DEPTHS = ("light", "standard", "medium", "deep")
+
+
+def _block_base(kind: str, mode: str, language: str, age_group: str, depth: str) -> str:
+    if mode == "imagery":
+        depth = "any"  # imagery prompts don't vary by depth
+    return os.path.join(BLOCKS_DIR, mode, f"{language}_{age_group}_{depth}_{kind}")
+
+
+@lru_cache(maxsize=32)
+def _load_block(base: str, mtime: float) -> dict:
+    """Load one block; `mtime` keys the cache so a rebuilt library is picked up."""
+    with open(base + ".json", encoding="utf-8") as f:
+        meta = json.load(f)
+    return {"script": meta["script"], "audio": AudioSegment.from_wav(base + ".wav")}
+
+
+def load_blocks(mode: str, language: str, age_group: str, depth: str) -> dict | None:
+    """Return {"opening": {...}, "closing": {...}}, or None if any block is missing."""
+    blocks = {}
+    for kind in BLOCK_KINDS:
+        base = _block_base(kind, mode, language, age_group, depth)
+        try:
+            mtime = os.path.getmtime(base + ".wav")
+            blocks[kind] = _load_block(base, mtime)
+        except (OSError, ValueError, KeyError):
+            return None
+    return blocks
+
+
+def select_blocks(
+    mode: str, language: str, age_group: str, depth: str, duration_minutes: int,
+) -> tuple[dict | None, int]:
+    """
+    Pick the pre-rendered blocks for a session, if the library has them and the
+    session is long enough. Returns (blocks or None, minutes left for the LLM).
+    """
+    blocks = load_blocks(mode, language, age_group, depth)
+    if blocks is None:
+        return None, duration_minutes
+
+    block_ms = sum(len(b["audio"]) for b in blocks.values())
+    middle_minutes = duration_minutes - round(block_ms / 60000)
+    if middle_minutes < MIN_MIDDLE_MINUTES:
+        return None, duration_minutes
+    return blocks, middle_minutes
+
+
+async def build_block(
+    kind: str, mode: str, language: str, age_group: str, depth: str,
+    force: bool = False,
+) -> bool:
+    """Generate and synthesize one block. Returns False if it already exists."""
+    base = _block_base(kind, mode, language, age_group, depth)
+    if not force and os.path.exists(base + ".wav"):
+        return False
+
+    instructions = build_meditation_instructions(language, mode, depth, age_group)
+    request = build_block_request(kind, BLOCK_MINUTES[kind], language, mode)
+    response = await generate_with_instructions(instructions, request, label="block")
+    script = response.text.strip()
+    if not script:
+        raise RuntimeError(f"Empty script for block {base}")
+
+    audio = await synthesize_script(script)
+
+    os.makedirs(os.path.dirname(base), exist_ok=True)
+    with open(base + ".json", "w", encoding="utf-8") as f:
+        json.dump({"script": script, "duration_ms": len(audio)}, f, ensure_ascii=False)
+    # Write the audio last and atomically — its presence marks the block as ready
+    audio.export(base + ".wav.tmp", format="wav")
+    os.replace(base + ".wav.tmp", base + ".wav")
+    return True
+
+
+async def build_library(modes, languages, age_groups, depths, force: bool = False) -> None:
+    for mode in modes:
+        # Imagery blocks are shared across depths
+        for depth in (depths[:1] if mode == "imagery" else depths):
+            for language in languages:
+                for age_group in age_groups:
+                    for kind in BLOCK_KINDS:
+                        built = await build_block(
+                            kind, mode, language, age_group, depth, force,
+                        )
+                        status = "built" if built else "exists"
+                        print(f"{status}: {_block_base(kind, mode, language, age_group, depth)}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Build the pre-rendered block library.")
+    parser.add_argument("--mode", choices=MODES, action="append")
+    parser.add_argument("--language", choices=LANGUAGES, action="append")
+    parser.add_argument("--age-group", choices=AGE_GROUPS, action="append")
+    parser.add_argument("--depth", choices=DEPTHS, action="append")
+    parser.add_argument("--force", action="store_true", help="Rebuild existing blocks")
+    args = parser.parse_args()
+
+    asyncio.run(build_library(
+        args.mode or MODES,
+        args.language or LANGUAGES,
+        args.age_group or AGE_GROUPS,
+        args.depth or DEPTHS,
+        force=args.force,
+    ))
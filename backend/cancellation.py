@@ -0,0 +1,72 @@
+"""
+Request-scoped cancellation.
+Each expensive request runs as one task that is cancelled when the client
+disconnects. Async stages stop at their next await; blocking stages run in
+worker threads and poll a threading.Event at their checkpoints.
+"""
+
+import asyncio
+import threading
+
+
+class OperationCancelled(Exception):
+    """Raised inside a worker thread when its request has been cancelled."""
+
+
+def check_cancelled(cancelled: threading.Event | None) -> None:
+    """Checkpoint for blocking code running in a worker thread."""
+    if cancelled is not None and cancelled.is_set():
+        raise OperationCancelled()
+
+
+def _consume_result(future) -> None:
+    # Nobody awaits an abandoned worker any more — swallow its outcome quietly
+    if not future.cancelled():
+        future.exception()
+
+
+async def run_cancellable(func, *args, **kwargs):
+    """
+    Run blocking `func(*args, cancelled=<Event>, **kwargs)` in a worker thread.
+    If the calling task is cancelled, the event is set so the thread stops at its
+    next checkpoint, and the cancellation propagates immediately.
+    """
+    cancelled = threading.Event()
+    future = asyncio.ensure_future(asyncio.to_thread(func, *args, cancelled=cancelled, **kwargs))
+    future.add_done_callback(_consume_result)
+    try:
+        return await asyncio.shield(future)
+    except asyncio.CancelledError:
+        cancelled.set()
+        raise
+
+
+async def watch_disconnect(request, task: asyncio.Task) -> None:
+    """
+    Cancel `task` as soon as the client behind `request` goes away.
+    Blocks on the ASGI receive channel (the body has already been read), so an
+    idle connection costs nothing until the server reports http.disconnect.
+    """
+    while True:
+        message = await request.receive()
+        if message["type"] == "http.disconnect":
+            task.cancel()
+            return
+
+
+async def cancel_on_disconnect(request, coro):
+    """
+    Await `coro` as its own task, cancelling it if the client disconnects.
+    Returns None when the work was abandoned because of a disconnect.
+    """
+    task = asyncio.create_task(coro)
+    watcher = asyncio.create_task(watch_disconnect(request, task))
+    try:
+        return await task
+    except asyncio.CancelledError:
+        if task.cancelled() and not asyncio.current_task().cancelling():
+            return None
+        task.cancel()
+        raise
+    finally:
+        watcher.cancel()
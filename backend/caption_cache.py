@@ -0,0 +1,95 @@
+"""
+On-disk cache of fetched YouTube captions and of caption translations, shared
+by the single-video and bulk caption endpoints. Fetches are keyed by video and
+target language, translations by the exact segments and target language — so
+a video translated once is never fetched or sent to Gemini again.
+
+Hits refresh an entry's mtime; entries unused for CAPTIONS_CACHE_MAX_AGE_DAYS
+and the least recently used beyond CAPTIONS_CACHE_MAX_ENTRIES are pruned.
+"""
+
+import os
+import json
+import time
+import hashlib
+import tempfile
+import itertools
+
+from config import CAPTIONS_CACHE_DIR, CAPTIONS_CACHE_MAX_ENTRIES, CAPTIONS_CACHE_MAX_AGE_DAYS
+
+# Prune once per this many writes
+_PRUNE_EVERY = 50
+_writes = itertools.count(1)
+
+
+def _path(kind: str, raw: str) -> str:
+    return os.path.join(CAPTIONS_CACHE_DIR, f"{kind}_{hashlib.sha1(raw.encode('utf-8')).hexdigest()}.json")
+
+
+def _read(path: str):
+    try:
+        with open(path, encoding="utf-8") as f:
+            value = json.load(f)
+        os.utime(path)
+    except (OSError, ValueError):
+        return None
+    return value
+
+
+def _write(path: str, value) -> None:
+    # A temp file of its own per write: concurrent writers of one key must
+    # not replace each other's half-written file
+    with tempfile.NamedTemporaryFile(
+        "w", encoding="utf-8", dir=CAPTIONS_CACHE_DIR, suffix=".tmp", delete=False,
+    ) as f:
+        try:
+            json.dump(value, f, ensure_ascii=False)
+        except BaseException:
+            f.close()
+            os.unlink(f.name)
+            raise
+    os.replace(f.name, path)
+    if next(_writes) % _PRUNE_EVERY == 0:
+        prune()
+
+
+def prune() -> None:
+    """Drop expired entries (and stale temp files), then the least recently used beyond the cap."""
+    expires = time.time() - CAPTIONS_CACHE_MAX_AGE_DAYS * 86400
+    entries = []
+    for entry in os.scandir(CAPTIONS_CACHE_DIR):
+        try:
+            mtime = entry.stat().st_mtime
+            if mtime < expires:
+                os.unlink(entry.path)
+            elif entry.name.endswith(".json"):
+                entries.append((mtime, entry.path))
+        except OSError:
+            continue  # removed by another worker meanwhile
+    entries.sort(reverse=True)
+    for _, path in entries[CAPTIONS_CACHE_MAX_ENTRIES:]:
+        try:
+            os.unlink(path)
+        except OSError:
+            pass
+
+
+def _translation_key(segments: list[dict], target_language: str) -> str:
+    fields = [[s["start"], s["duration"], s["text"]] for s in segments]
+    return json.dumps([target_language, fields], ensure_ascii=False)
+
+
+def get_cached_captions(video_id: str, target_language: str) -> dict | None:
+    return _read(_path("captions", f"{video_id}:{target_language}"))
+
+
+def put_cached_captions(video_id: str, target_language: str, captions: dict) -> None:
+    _write(_path("captions", f"{video_id}:{target_language}"), captions)
+
+
+def get_cached_translation(segments: list[dict], target_language: str) -> list[dict] | None:
+    return _read(_path("translation", _translation_key(segments, target_language)))
+
+
+def put_cached_translation(segments: list[dict], target_language: str, translated: list[dict]) -> None:
+    _write(_path("translation", _translation_key(segments, target_language)), translated)
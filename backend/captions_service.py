@@ -0,0 +1,272 @@
+"""
+YouTube captions: fetching, and translation via Gemini.
+Captions arrive as many 2-4 second fragments. Adjacent fragments are
+merged into sentence-level units (by punctuation and timing gaps), the units
+are translated, and each translation is spread back over the original
+fragments in proportion to their length — same timeline, fewer and better
+translated lines.
+
+Fetches and translations are cached (caption_cache). translate_videos runs
+bulk jobs as a pipeline: transcripts are fetched a few at a time in worker
+threads while earlier videos are being translated.
+"""
+
+import re
+import asyncio
+
+from youtube_transcript_api import YouTubeTranscriptApi
+
+from config import BULK_FETCH_CONCURRENCY, BULK_TRANSLATE_CONCURRENCY
+from llm_gateway import gateway
+from caption_cache import (
+    get_cached_captions, put_cached_captions, get_cached_translation, put_cached_translation,
+)
+
+CAPTION_LANG_NAMES = {"he": "עברית", "en": "English", "ar": "العربية", "ru": "Русский",
+                      "fr": "Français", "es": "Español", "de": "Deutsch"}
+
+# Units per Gemini call
+BATCH_SIZE = 20
+
+# Merging limits
+_MAX_GAP_S = 1.5
+_MAX_UNIT_CHARS = 250
+_MAX_UNIT_FRAGMENTS = 8
+_SENTENCE_END = re.compile(r'[\.\!\?…。؟]["\'”»)]*$')
+
+
+def build_caption_prompt(numbered_lines: str, target_name: str, target_language: str) -> str:
+    return f"""Translate these subtitle lines to {target_name}.
+
+RULES:
+- Return ONLY the numbered translations, one per line, same numbering
+- Keep translations concise and natural for subtitles
+- Do not add explanations or notes
+{"- Use modern spoken Hebrew, no nikud" if target_language == "he" else ""}
+
+{numbered_lines}"""
+
+
+def merge_fragments(segments: list[dict]) -> list[list[int]]:
+    """Group fragment indices into sentence-level units."""
+    units = []
+    current = []
+    chars = 0
+    for i, seg in enumerate(segments):
+        if current:
+            prev = segments[current[-1]]
+            gap = seg["start"] - (prev["start"] + prev["duration"])
+            if (gap > _MAX_GAP_S or len(current) >= _MAX_UNIT_FRAGMENTS
+                    or chars + len(seg["text"]) > _MAX_UNIT_CHARS):
+                units.append(current)
+                current, chars = [], 0
+        current.append(i)
+        chars += len(seg["text"]) + 1
+        if _SENTENCE_END.search(seg["text"].strip()):
+            units.append(current)
+            current, chars = [], 0
+    if current:
+        units.append(current)
+    return units
+
+
+def distribute(text: str, weights: list[int]) -> list[str]:
+    """Split `text` on word boundaries into len(weights) parts sized by `weights`.
+
+    Every part gets at least one word while there are enough words to go round;
+    with fewer words than parts, the trailing parts are left empty.
+    """
+    if len(weights) == 1:
+        return [text]
+    words = text.split()
+    weights = [max(w, 1) for w in weights]
+    total = sum(weights)
+    parts = []
+    start = 0
+    cumulative = 0
+    for i, weight in enumerate(weights):
+        cumulative += weight
+        remaining = len(weights) - 1 - i
+        end = round(len(words) * cumulative / total)
+        # At least one word here, and leave one for each part still to come
+        end = min(max(end, start + 1), max(len(words) - remaining, start + 1), len(words))
+        parts.append(" ".join(words[start:end]))
+        start = end
+    return parts
+
+
+def _parse_numbered(text: str, count: int) -> list[str | None]:
+    lines = text.strip().split("\n")
+    result = []
+    for j in range(count):
+        translated = None
+        for line in lines:
+            # Match "1. translated text" or "1) translated text"
+            match = re.match(rf'^{j+1}[\.\)]\s*(.+)', line.strip())
+            if match:
+                translated = match.group(1).strip()
+                break
+        result.append(translated)
+    return result
+
+
+async def translate_captions(segments: list[dict], target_language: str) -> list[dict]:
+    """Translate caption fragments onto the same timeline.
+
+    Each input fragment keeps its own entry, except where a short translation
+    runs out of words: an empty fragment is folded into the previous cue of its
+    unit, which is stretched to cover it.
+    """
+    target_name = CAPTION_LANG_NAMES.get(target_language, target_language)
+    units = merge_fragments(segments)
+    unit_texts = [
+        " ".join(segments[i]["text"].replace("\n", " ").strip() for i in members)
+        for members in units
+    ]
+
+    translated_units = []
+    for b in range(0, len(units), BATCH_SIZE):
+        batch = unit_texts[b:b + BATCH_SIZE]
+        numbered_lines = "\n".join(f"{j+1}. {text}" for j, text in enumerate(batch))
+        response = await gateway.generate(
+            build_caption_prompt(numbered_lines, target_name, target_language),
+        )
+        translated_units.extend(_parse_numbered(response.text, len(batch)))
+
+    translated_segments = []
+    for members, translated in zip(units, translated_units):
+        if translated is None:
+            parts = [segments[i]["text"] for i in members]  # fallback
+        else:
+            parts = distribute(translated, [len(segments[i]["text"]) for i in members])
+        first = len(translated_segments)
+        for i, text in zip(members, parts):
+            seg = segments[i]
+            if not text.strip() and len(translated_segments) > first:
+                prev = translated_segments[-1]
+                prev["duration"] = seg["start"] + seg["duration"] - prev["start"]
+                prev["original"] += " " + seg["text"]
+                continue
+            translated_segments.append({
+                "start": seg["start"],
+                "duration": seg["duration"],
+                "original": seg["text"],
+                "text": text,
+            })
+    return translated_segments
+
+
+def as_translated(segments: list[dict]) -> list[dict]:
+    """Captions already in the target language, in translate_captions' shape."""
+    return [{**seg, "original": seg["text"]} for seg in segments]
+
+
+def fetch_captions(video_id: str, target_language: str) -> dict:
+    """Blocking transcript fetch — run in a worker thread."""
+    # Try to fetch captions in order of preference
+    try:
+        ytt_api = YouTubeTranscriptApi()
+        transcript_list = ytt_api.list(video_id)
+    except Exception:
+        return {"error": "לא ניתן לגשת לכתוביות של הסרטון"}
+
+    captions = None
+    source_lang = None
+
+    # 1. Try target language first (already translated by YouTube)
+    try:
+        captions = ytt_api.fetch(transcript_list, languages=[target_language])
+        source_lang = target_language
+    except Exception:
+        pass
+
+    # 2. Try English
+    if captions is None:
+        try:
+            captions = ytt_api.fetch(transcript_list, languages=["en"])
+            source_lang = "en"
+        except Exception:
+            pass
+
+    # 3. Try any available language
+    if captions is None:
+        try:
+            captions = ytt_api.fetch(transcript_list)
+            source_lang = "unknown"
+        except Exception:
+            return {"error": "No captions available for this video"}
+
+    segments = [
+        {"start": s.start, "duration": s.duration, "text": s.text}
+        for s in captions
+    ]
+
+    return {
+        "video_id": video_id,
+        "source_language": source_lang,
+        "segments": segments,
+    }
+
+
+async def fetch_captions_cached(video_id: str, target_language: str) -> dict:
+    cached = await asyncio.to_thread(get_cached_captions, video_id, target_language)
+    if cached is not None:
+        return cached
+    result = await asyncio.to_thread(fetch_captions, video_id, target_language)
+    if "error" not in result:
+        try:
+            await asyncio.to_thread(put_cached_captions, video_id, target_language, result)
+        except OSError:
+            pass  # the cache is best effort; the captions are still good
+    return result
+
+
+async def translate_captions_cached(segments: list[dict], target_language: str) -> list[dict]:
+    cached = await asyncio.to_thread(get_cached_translation, segments, target_language)
+    if cached is not None:
+        return cached
+    translated = await translate_captions(segments, target_language)
+    try:
+        await asyncio.to_thread(put_cached_translation, segments, target_language, translated)
+    except OSError:
+        pass
+    return translated
+
+
+async def translate_videos(video_ids: list[str], target_language: str):
+    """
+    Fetch and translate the captions of many videos, yielding one result per
+    video as soon as it is ready: {"video_id", "source_language", "segments"}
+    or {"video_id", "error"}.
+    """
+    fetch_slots = asyncio.Semaphore(BULK_FETCH_CONCURRENCY)
+    translate_slots = asyncio.Semaphore(BULK_TRANSLATE_CONCURRENCY)
+
+    async def process(video_id: str) -> dict:
+        try:
+            # The fetch slot is freed before translating, so the next
+            # transcripts download while this one is with Gemini
+            async with fetch_slots:
+                captions = await fetch_captions_cached(video_id, target_language)
+            if "error" in captions:
+                return {"video_id": video_id, "error": captions["error"]}
+            if captions["source_language"] == target_language:
+                segments = as_translated(captions["segments"])
+            else:
+                async with translate_slots:
+                    segments = await translate_captions_cached(captions["segments"], target_language)
+        except Exception as e:
+            return {"video_id": video_id, "error": str(e)}
+        return {
+            "video_id": video_id,
+            "source_language": captions["source_language"],
+            "segments": segments,
+        }
+
+    tasks = [asyncio.create_task(process(video_id)) for video_id in dict.fromkeys(video_ids)]
+    try:
+        for next_done in asyncio.as_completed(tasks):
+            yield await next_done
+    finally:
+        for task in tasks:
+            task.cancel()
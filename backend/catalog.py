@@ -0,0 +1,177 @@
+"""
+Offline catalog renderer: pre-generates popular sessions before peak hours.
+
+    python catalog.py catalog.jsonl [--script-concurrency 4] [--render-concurrency 2]
+
+The manifest is JSONL or CSV; every row holds SessionRequest fields. Results go
+straight into AUDIO_OUTPUT_DIR and the session cache, so /api/session serves
+them instantly. Rows already in the cache are skipped, and progress is
+checkpointed to <manifest>.checkpoint.jsonl — a crashed run resumes where it
+stopped, reusing any scripts generated before the crash.
+"""
+
+import os
+import csv
+import json
+import time
+import asyncio
+import argparse
+
+from pydantic import ValidationError
+
+from models import SessionRequest
+from session_service import plan_session, generate_script, render_session
+from session_cache import session_key, get_cached_session, put_cached_session
+
+# Catalog renders yield to live sessions in the shared TTS scheduler
+CATALOG_PRIORITY = -1
+
+
+def load_catalog(path: str) -> tuple[list[SessionRequest], list[str]]:
+    """Parse and validate the manifest. Returns (unique sessions, row errors)."""
+    with open(path, encoding="utf-8") as f:
+        if path.endswith(".csv"):
+            # Empty cells fall back to the SessionRequest defaults
+            rows = [{k: v for k, v in row.items() if v not in (None, "")} for row in csv.DictReader(f)]
+        else:
+            rows = []
+            for line in f:
+                if not line.strip():
+                    continue
+                try:
+                    rows.append(json.loads(line))
+                except ValueError as e:
+                    rows.append(e)  # reported with its row number below
+
+    sessions, errors, seen = [], [], set()
+    for i, row in enumerate(rows, 1):
+        if isinstance(row, ValueError):
+            errors.append(f"row {i}: invalid JSON ({row})")
+            continue
+        if not isinstance(row, dict):
+            errors.append(f"row {i}: expected a JSON object")
+            continue
+        try:
+            session = SessionRequest(**row)
+        except ValidationError as e:
+            errors.append(f"row {i}: {e.errors()[0]['msg']}")
+            continue
+        key = session_key(session)
+        if key not in seen:
+            seen.add(key)
+            sessions.append(session)
+    return sessions, errors
+
+
+def _load_checkpoint(path: str) -> dict:
+    """Scripts generated by earlier runs, by session key."""
+    scripts = {}
+    if not os.path.exists(path):
+        return scripts
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            try:
+                record = json.loads(line)
+            except ValueError:
+                continue  # torn last line after a crash
+            if "script" in record:
+                scripts[record["key"]] = record
+    return scripts
+
+
+async def run_catalog(path: str, script_concurrency: int, render_concurrency: int) -> dict:
+    sessions, errors = load_catalog(path)
+    for error in errors:
+        print(f"invalid: {error}")
+
+    checkpoint_path = path + ".checkpoint.jsonl"
+    scripts = _load_checkpoint(checkpoint_path)
+    script_slots = asyncio.Semaphore(script_concurrency)
+    render_slots = asyncio.Semaphore(render_concurrency)
+
+    report = {
+        "total": len(sessions),
+        "invalid": len(errors),
+        "rendered": 0,
+        "skipped": 0,
+        "resumed_scripts": 0,
+        "failed": 0,
+        "audio_minutes": 0,
+        "script_seconds": 0.0,
+        "render_seconds": 0.0,
+    }
+
+    with open(checkpoint_path, "a", encoding="utf-8") as checkpoint:
+        def record(entry: dict) -> None:
+            checkpoint.write(json.dumps(entry, ensure_ascii=False) + "\n")
+            checkpoint.flush()
+
+        async def process(session: SessionRequest) -> None:
+            key = session_key(session)
+            if await asyncio.to_thread(get_cached_session, session):
+                report["skipped"] += 1
+                return
+            try:
+                blocks, script_minutes = await plan_session(session)
+                saved = scripts.get(key)
+                if saved and saved["framed"] == (blocks is not None):
+                    script = saved["script"]
+                    report["resumed_scripts"] += 1
+                else:
+                    async with script_slots:
+                        start = time.perf_counter()
+                        script = await generate_script(session, blocks, script_minutes)
+                        report["script_seconds"] += time.perf_counter() - start
+                    if not script:
+                        raise RuntimeError("Failed to generate script")
+                    record({"key": key, "script": script, "framed": blocks is not None})
+
+                async with render_slots:
+                    start = time.perf_counter()
+                    filename, full_script = await render_session(
+                        script, session, blocks, priority=CATALOG_PRIORITY,
+                    )
+                    report["render_seconds"] += time.perf_counter() - start
+
+                await asyncio.to_thread(put_cached_session, session, full_script, filename)
+                record({"key": key, "audio_file": filename})
+                report["rendered"] += 1
+                report["audio_minutes"] += session.duration_minutes
+                print(f"rendered: {session.topic!r} ({session.language}/{session.mode}) -> {filename}")
+            except Exception as e:
+                report["failed"] += 1
+                print(f"failed: {session.topic!r} ({session.language}/{session.mode}): {e}")
+
+        start = time.perf_counter()
+        await asyncio.gather(*(process(s) for s in sessions))
+        report["wall_seconds"] = time.perf_counter() - start
+
+    return report
+
+
+def print_report(report: dict) -> None:
+    wall_min = max(report["wall_seconds"], 1e-9) / 60
+    print()
+    print(f"sessions:        {report['total']} ({report['invalid']} invalid rows)")
+    print(f"rendered:        {report['rendered']}")
+    print(f"skipped:         {report['skipped']} (already in cache)")
+    print(f"resumed scripts: {report['resumed_scripts']}")
+    print(f"failed:          {report['failed']}")
+    print(f"wall time:       {report['wall_seconds']:.1f}s")
+    print(f"throughput:      {report['rendered'] / wall_min:.2f} sessions/min, "
+          f"{report['audio_minutes'] / wall_min:.1f} audio min/min")
+    if report["rendered"]:
+        print(f"avg stage time:  script {report['script_seconds'] / report['rendered']:.1f}s, "
+              f"render {report['render_seconds'] / report['rendered']:.1f}s")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Pre-render a catalog of sessions.")
+    parser.add_argument("manifest", help="JSONL or CSV file of SessionRequest rows")
+    parser.add_argument("--script-concurrency", type=int, default=4)
+    parser.add_argument("--render-concurrency", type=int, default=2)
+    args = parser.parse_args()
+
+    print_report(asyncio.run(
+        run_catalog(args.manifest, args.script_concurrency, args.render_concurrency)
+    ))
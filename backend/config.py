@@ -18,9 +18,28 @@ ELEVEN_VOICE_ID = os.getenv("ELEVEN_VOICE_ID", "21m00Tcm4TlvDq8ikWAM")
 # Gemini
 GEMINI_MODEL = "gemini-2.5-flash"
 
-# ElevenLabs
+# All Gemini calls go through llm_gateway: calls in flight at once across all
+# endpoints, and retries of transient errors (429/5xx) with exponential backoff
+LLM_MAX_CONCURRENCY = int(os.getenv("LLM_MAX_CONCURRENCY", "16"))
+LLM_MAX_RETRIES = 3
+
+# Context caching of the static prompt instructions (set PROMPT_CACHE=0 to disable)
+PROMPT_CACHE_ENABLED = os.getenv("PROMPT_CACHE", "1") != "0"
+PROMPT_CACHE_TTL_SECONDS = 3600
+
+# Script translation: chunk size (characters) and parallel Gemini calls
+TRANSLATE_CHUNK_CHARS = 4000
+TRANSLATE_CONCURRENCY = 4
+
+# Internal render format (16-bit PCM): speech, pauses and bells are all
+# produced in it, so the final encode is the only compression step.
+# 24 kHz mono is what edge-tts and ElevenLabs' PCM output deliver natively.
+RENDER_SAMPLE_RATE = 24000
+RENDER_CHANNELS = 1
+
+# ElevenLabs — raw PCM at the render rate, no MP3 decode
 TTS_MODEL = "eleven_multilingual_v2"
-TTS_OUTPUT_FORMAT = "mp3_44100_128"
+TTS_OUTPUT_FORMAT = f"pcm_{RENDER_SAMPLE_RATE}"
 
 # Voice settings optimized for calm meditation delivery
 TTS_VOICE_SETTINGS = {
@@ -30,6 +49,21 @@ TTS_VOICE_SETTINGS = {
     "use_speaker_boost": True,
 }
 
+# TTS scheduling: segments synthesized at once across all sessions, and per engine
+TTS_MAX_CONCURRENCY = int(os.getenv("TTS_MAX_CONCURRENCY", "8"))
+TTS_ENGINE_CONCURRENCY = {
+    "edge": int(os.getenv("TTS_EDGE_CONCURRENCY", "6")),
+    "elevenlabs": int(os.getenv("TTS_ELEVENLABS_CONCURRENCY", "3")),
+}
+
+# Nikud inference. With NIKUD_SOCKET set, all workers share one model process
+# (python nikud_sidecar.py) that batches requests arriving within the window;
+# unset, every worker loads its own model.
+NIKUD_SOCKET = os.getenv("NIKUD_SOCKET")
+NIKUD_BATCH_WINDOW_MS = 10
+NIKUD_MAX_BATCH = 32
+NIKUD_CACHE_SIZE = 4096
+
 # Pause durations in milliseconds
 PAUSE_DURATIONS = {
     "[pause]": 3000,
@@ -41,3 +75,88 @@ PAUSE_DURATIONS = {
 # Audio output directory
 AUDIO_OUTPUT_DIR = os.path.join(os.path.dirname(__file__), "audio_output")
 os.makedirs(AUDIO_OUTPUT_DIR, exist_ok=True)
+
+# Output profiles: ffmpeg encoder arguments per SessionRequest.output_profile
+OUTPUT_PROFILES = {
+    # VBR (LAME V2, ~190 kbps on speech) — pause spans cost next to nothing
+    "mp3": {"ext": "mp3", "args": ["-c:a", "libmp3lame", "-q:a", "2", "-f", "mp3"]},
+    # Speech-tuned VBR Opus — a fraction of the MP3 size for voice over silence
+    "opus": {"ext": "opus", "args": [
+        "-c:a", "libopus", "-b:a", "48k", "-vbr", "on", "-application", "voip", "-f", "ogg",
+    ]},
+    "aac": {"ext": "m4a", "args": [
+        "-c:a", "aac", "-b:a", "64k", "-movflags", "+faststart", "-f", "ipod",
+    ]},
+    # VOD playlist + 6 s AAC segments
+    "hls": {"ext": "m3u8", "args": [
+        "-c:a", "aac", "-b:a", "64k",
+        "-f", "hls", "-hls_time", "6", "-hls_playlist_type", "vod",
+    ]},
+}
+
+# PCM kept in RAM across all concurrent renders; beyond this budget clips
+# spill to memory-mapped temp files (RENDER_SPILL_DIR, default: system temp)
+RENDER_MEMORY_BUDGET_MB = int(os.getenv("RENDER_MEMORY_BUDGET_MB", "256"))
+RENDER_SPILL_DIR = os.getenv("RENDER_SPILL_DIR")
+
+# Speech timelines + render manifests, kept for incremental re-rendering.
+# Renders unused for RENDER_CACHE_MAX_AGE_DAYS and the least recently used
+# beyond RENDER_CACHE_MAX_MB are pruned (those sessions can't be re-rendered).
+RENDER_DIR = os.path.join(os.path.dirname(__file__), "render_cache")
+os.makedirs(RENDER_DIR, exist_ok=True)
+RENDER_CACHE_MAX_MB = int(os.getenv("RENDER_CACHE_MAX_MB", "2048"))
+RENDER_CACHE_MAX_AGE_DAYS = 14
+
+# Pre-rendered sessions (filled by catalog.py, served by /api/session)
+SESSION_CACHE_DIR = os.path.join(os.path.dirname(__file__), "session_cache")
+os.makedirs(SESSION_CACHE_DIR, exist_ok=True)
+
+# Fetched YouTube captions and their translations, pruned by age and LRU count
+CAPTIONS_CACHE_DIR = os.path.join(os.path.dirname(__file__), "captions_cache")
+os.makedirs(CAPTIONS_CACHE_DIR, exist_ok=True)
+CAPTIONS_CACHE_MAX_ENTRIES = 20000
+CAPTIONS_CACHE_MAX_AGE_DAYS = 30
+
+# Bulk caption jobs: videos per request, and how many are fetched / translated at once
+BULK_CAPTIONS_MAX_VIDEOS = 100
+BULK_FETCH_CONCURRENCY = 4
+BULK_TRANSLATE_CONCURRENCY = 3
+
+# Pre-rendered opening/closing blocks (built offline by blocks_service.py)
+BLOCKS_DIR = os.path.join(os.path.dirname(__file__), "audio_blocks")
+
+# Session progress streaming (seconds)
+PROGRESS_MIN_INTERVAL = 0.25
+
+# Admission control for the expensive endpoints.
+# Tokens: 1 per session minute, per 1000 characters, per 20 caption lines,
+# 2 per video of a bulk caption job.
+ADMISSION_TOKENS_PER_MINUTE = float(os.getenv("ADMISSION_TOKENS_PER_MINUTE", "10"))
+ADMISSION_BURST = float(os.getenv("ADMISSION_BURST", "60"))
+ADMISSION_MAX_IN_FLIGHT = {
+    "/api/session": 20,
+    "/api/session/rerender": 10,
+    "/api/translate": 20,
+    "/api/youtube/captions": 20,
+    "/api/youtube/translate-captions": 10,
+    "/api/youtube/bulk-captions": 2,
+}
+ADMISSION_BUSY_RETRY_AFTER = 5
+# Clients are keyed by API key — only keys listed here, comma-separated —
+# else by IP. ADMISSION_PROXY_HOPS is the number of trusted reverse proxies
+# that append to X-Forwarded-For (1 on Render); 0 keys on the socket peer.
+ADMISSION_API_KEYS = frozenset(
+    key.strip() for key in os.getenv("ADMISSION_API_KEYS", "").split(",") if key.strip()
+)
+ADMISSION_PROXY_HOPS = int(os.getenv("ADMISSION_PROXY_HOPS", "0"))
+# SQLite file holding admission state shared by all workers on the host;
+# unset, each worker keeps its own state in memory
+ADMISSION_STORE_PATH = os.getenv("ADMISSION_STORE_PATH")
+
+# On-demand profiling (see profiling.py). The X-Profile header and the admin
+# endpoints need PROFILING_ADMIN_TOKEN; unset, profiling is off entirely.
+PROFILING_ADMIN_TOKEN = os.getenv("PROFILING_ADMIN_TOKEN")
+PROFILE_DIR = os.path.join(os.path.dirname(__file__), "profiles")
+os.makedirs(PROFILE_DIR, exist_ok=True)
+PROFILE_MAX_KEPT = 50
+PROFILE_SAMPLE_INTERVAL = 0.005
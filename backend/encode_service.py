@@ -0,0 +1,108 @@
+"""
+Final audio encoding through an ffmpeg subprocess.
+Unlike pydub's blocking export, the encoder runs as an asyncio subprocess fed
+straight from the render timeline, so a cancelled session kills ffmpeg and
+leaves no partial output behind.
+
+Output profiles (see config.OUTPUT_PROFILES) cover single-file MP3, Opus and
+AAC, plus HLS: a VOD playlist with short AAC segments that players can fetch,
+seek and cache independently. The playlist and its segments are published
+together once the encode has finished. Segments are not published while
+they are written: a session's URL is only announced on completion, and
+nothing may be visible before the encode succeeds, so incremental HLS
+publishing was dropped.
+"""
+
+import os
+import shutil
+import asyncio
+
+from pydub import AudioSegment
+
+from config import AUDIO_OUTPUT_DIR, OUTPUT_PROFILES
+from audio_timeline import Timeline
+
+_SAMPLE_FORMATS = {1: "u8", 2: "s16le", 4: "s32le"}
+
+HLS_PLAYLIST = "playlist.m3u8"
+
+
+def output_path(stem: str, profile: str) -> str:
+    """Path of a session's audio relative to AUDIO_OUTPUT_DIR (i.e. under /audio/)."""
+    if profile == "hls":
+        return f"{stem}/{HLS_PLAYLIST}"
+    return f"{stem}.{OUTPUT_PROFILES[profile]['ext']}"
+
+
+def _remove(path: str) -> None:
+    if os.path.isdir(path):
+        shutil.rmtree(path, ignore_errors=True)
+    elif os.path.exists(path):
+        os.unlink(path)
+
+
+async def encode_audio(
+    timeline: Timeline, stem: str, profile: str = "mp3", overlays: list | None = None,
+) -> str:
+    """
+    Stream `timeline` (with `overlays`, e.g. bells, mixed in on the fly) through
+    the given output profile and return the output path relative to
+    AUDIO_OUTPUT_DIR. The output only appears once encoding succeeded.
+    """
+    settings = OUTPUT_PROFILES[profile]
+    if profile == "hls":
+        final = os.path.join(AUDIO_OUTPUT_DIR, stem)
+        partial = final + ".part"
+        os.makedirs(partial, exist_ok=True)
+        target = [
+            "-hls_segment_filename", os.path.join(partial, "segment_%03d.ts"),
+            os.path.join(partial, HLS_PLAYLIST),
+        ]
+    else:
+        final = os.path.join(AUDIO_OUTPUT_DIR, output_path(stem, profile))
+        partial = final + ".part"
+        target = [partial]
+
+    cmd = [
+        AudioSegment.converter, "-hide_banner", "-loglevel", "error", "-y",
+        "-f", _SAMPLE_FORMATS[timeline.sample_width],
+        "-ar", str(timeline.frame_rate),
+        "-ac", str(timeline.channels),
+        "-i", "pipe:0",
+        *settings["args"],
+        *target,
+    ]
+    proc = await asyncio.create_subprocess_exec(
+        *cmd,
+        stdin=asyncio.subprocess.PIPE,
+        stdout=asyncio.subprocess.DEVNULL,
+        stderr=asyncio.subprocess.PIPE,
+    )
+    stderr_task = asyncio.create_task(proc.stderr.read())
+    try:
+        try:
+            # Silent gaps are streamed from one shared zero buffer and spilled
+            # clips straight from their mmap — the full track is never
+            # materialized in memory
+            for chunk in timeline.iter_pcm(overlays):
+                proc.stdin.write(chunk)
+                await proc.stdin.drain()
+            proc.stdin.close()
+        except (BrokenPipeError, ConnectionResetError):
+            pass  # ffmpeg exited early; its stderr says why
+        stderr = await stderr_task
+        await proc.wait()
+    except BaseException:
+        stderr_task.cancel()
+        if proc.returncode is None:
+            proc.kill()
+            # Reap it even while being cancelled, so no ffmpeg outlives the request
+            await asyncio.shield(proc.wait())
+        _remove(partial)
+        raise
+
+    if proc.returncode != 0:
+        _remove(partial)
+        raise RuntimeError(f"ffmpeg failed: {stderr.decode(errors='replace').strip()}")
+    os.replace(partial, final)
+    return output_path(stem, profile)
@@ -0,0 +1,153 @@
+"""
+Shared gateway for every Gemini call in the backend.
+- Single-flight: concurrent identical calls (same model, prompt and generation
+  config) share one in-flight request
+- A global concurrency cap across all endpoints
+- Retry with exponential backoff on transient errors (429/5xx, timeouts)
+- Per-call latency and token usage metrics
+"""
+
+import random
+import asyncio
+import hashlib
+from collections import deque
+
+from google import genai
+
+from config import GOOGLE_API_KEY, GEMINI_MODEL, LLM_MAX_CONCURRENCY, LLM_MAX_RETRIES
+
+_RETRY_BASE_S = 1.0
+_RETRY_MAX_S = 20.0
+_TRANSIENT_CODES = {429, 500, 502, 503, 504}
+_LATENCY_WINDOW = 500
+
+
+def _is_transient(error: Exception) -> bool:
+    if isinstance(error, (TimeoutError, ConnectionError)):
+        return True
+    return getattr(error, "code", None) in _TRANSIENT_CODES
+
+
+def _request_key(model: str, contents, config) -> str:
+    raw = repr(contents) + "\0" + model + "\0"
+    if config is not None:
+        raw += config.model_dump_json(exclude_none=True)
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+
+class _Flight:
+    """One in-flight request and the number of callers waiting on it."""
+
+    def __init__(self, task: asyncio.Task):
+        self.task = task
+        self.waiters = 0
+
+
+class LLMGateway:
+    def __init__(self, max_concurrency: int = LLM_MAX_CONCURRENCY, max_retries: int = LLM_MAX_RETRIES):
+        self._client = None
+        self._max_concurrency = max_concurrency
+        self._semaphore = None
+        self._max_retries = max_retries
+        self._flights: dict[str, _Flight] = {}
+        self._latencies: deque[float] = deque(maxlen=_LATENCY_WINDOW)
+        self.stats = {
+            "calls": 0,
+            "coalesced": 0,
+            "retries": 0,
+            "errors": 0,
+            "prompt_tokens": 0,
+            "cached_tokens": 0,
+            "output_tokens": 0,
+        }
+
+    @property
+    def client(self):
+        if self._client is None:
+            self._client = genai.Client(api_key=GOOGLE_API_KEY)
+        return self._client
+
+    async def _with_retries(self, call):
+        if self._semaphore is None:
+            self._semaphore = asyncio.Semaphore(self._max_concurrency)
+        loop = asyncio.get_running_loop()
+        attempt = 0
+        while True:
+            try:
+                async with self._semaphore:
+                    start = loop.time()
+                    result = await call()
+                    self._latencies.append(loop.time() - start)
+                return result
+            except Exception as e:
+                if attempt >= self._max_retries or not _is_transient(e):
+                    self.stats["errors"] += 1
+                    raise
+                attempt += 1
+                self.stats["retries"] += 1
+                delay = min(_RETRY_BASE_S * 2 ** (attempt - 1), _RETRY_MAX_S)
+                await asyncio.sleep(delay * random.uniform(0.5, 1.0))
+
+    def _record_usage(self, response) -> None:
+        usage = getattr(response, "usage_metadata", None)
+        if usage is None:
+            return
+        self.stats["prompt_tokens"] += usage.prompt_token_count or 0
+        self.stats["cached_tokens"] += usage.cached_content_token_count or 0
+        self.stats["output_tokens"] += usage.candidates_token_count or 0
+
+    async def _generate(self, model: str, contents, config):
+        self.stats["calls"] += 1
+        response = await self._with_retries(lambda: self.client.aio.models.generate_content(
+            model=model, contents=contents, config=config,
+        ))
+        self._record_usage(response)
+        return response
+
+    async def generate(self, contents, config=None, model: str = GEMINI_MODEL):
+        """generate_content through the gateway; identical concurrent calls are coalesced."""
+        key = _request_key(model, contents, config)
+        flight = self._flights.get(key)
+        if flight is None:
+            flight = _Flight(asyncio.create_task(self._generate(model, contents, config)))
+            self._flights[key] = flight
+            flight.task.add_done_callback(
+                lambda _, k=key, f=flight: self._flights.pop(k) if self._flights.get(k) is f else None
+            )
+        else:
+            self.stats["coalesced"] += 1
+
+        flight.waiters += 1
+        try:
+            # Shielded: one caller going away must not cancel the others' request
+            return await asyncio.shield(flight.task)
+        finally:
+            flight.waiters -= 1
+            if flight.waiters == 0 and not flight.task.done():
+                # Nobody is left waiting; forget it now so a new identical call
+                # starts afresh instead of joining the dying task
+                if self._flights.get(key) is flight:
+                    del self._flights[key]
+                flight.task.cancel()
+
+    async def create_cache(self, config, model: str = GEMINI_MODEL):
+        """caches.create through the gateway (retries and concurrency cap, no coalescing)."""
+        return await self._with_retries(lambda: self.client.aio.caches.create(
+            model=model, config=config,
+        ))
+
+    def status(self) -> dict:
+        ordered = sorted(self._latencies)
+
+        def pct(p):
+            return round(ordered[min(len(ordered) - 1, int(p / 100 * len(ordered)))], 3) if ordered else None
+
+        return {
+            "stats": dict(self.stats),
+            "in_flight": len(self._flights),
+            "latency_p50_s": pct(50),
+            "latency_p95_s": pct(95),
+        }
+
+
+gateway = LLMGateway()
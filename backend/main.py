@@ -6,16 +6,27 @@ from pathlib import Path
 from fastapi import FastAPI, Request
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.staticfiles import StaticFiles
-from fastapi.responses import FileResponse
+from fastapi.responses import FileResponse, JSONResponse
 from pydantic import BaseModel, Field
 from typing import Optional
 from sse_starlette.sse import EventSourceResponse
-from google import genai
-from youtube_transcript_api import YouTubeTranscriptApi
 
-from config import GOOGLE_API_KEY, GEMINI_MODEL, AUDIO_OUTPUT_DIR
-from prompt_template import build_meditation_prompt
-from tts_service import generate_audio
+from config import AUDIO_OUTPUT_DIR, BULK_CAPTIONS_MAX_VIDEOS
+from llm_gateway import gateway
+from models import SessionRequest
+from translation_service import translate_text, split_into_chunks, iter_translated_chunks
+from captions_service import fetch_captions_cached, translate_captions_cached, translate_videos
+from tts_service import rerender_audio, resilient_tts
+from session_service import plan_session, generate_script, render_session
+from session_cache import get_cached_session
+from progress_bus import ProgressBus
+from cancellation import cancel_on_disconnect
+from admission import AdmissionMiddleware
+from nikud_service import sidecar_status
+from render_memory import budget as render_budget
+from profiling import (
+    PROFILE_KINDS, is_admin, arm_profiling, armed_counts, start_capture, list_profiles, profile_path,
+)
 
 app = FastAPI(title="Guided Imagery")
 
@@ -28,6 +39,8 @@ ALLOWED_ORIGINS = [
 if os.getenv("RENDER_EXTERNAL_URL"):
     ALLOWED_ORIGINS.append(os.getenv("RENDER_EXTERNAL_URL"))
 
+# Added first so it sits inside CORS — 429 responses still carry CORS headers
+app.add_middleware(AdmissionMiddleware)
 app.add_middleware(
     CORSMiddleware,
     allow_origins=ALLOWED_ORIGINS,
@@ -41,165 +54,221 @@ app.mount("/audio", StaticFiles(directory=AUDIO_OUTPUT_DIR), name="audio")
 # Serve built frontend in production
 FRONTEND_DIR = Path(__file__).parent.parent / "frontend" / "dist"
 
-gemini_client = None
-
-def get_gemini_client():
-    global gemini_client
-    if gemini_client is None:
-        gemini_client = genai.Client(api_key=GOOGLE_API_KEY)
-    return gemini_client
-
-
-class SessionRequest(BaseModel):
-    topic: str = Field(..., min_length=2, max_length=200)
-    duration_minutes: int = Field(..., ge=3, le=30)
-    language: str = Field(default="he", pattern="^(he|en)$")
-    mode: str = Field(default="imagery", pattern="^(imagery|hypnosis)$")
-    depth: str = Field(default="standard", pattern="^(light|standard|medium|deep)$")
-    age_group: str = Field(default="adults", pattern="^(children|teens|adults)$")
-    bells_volume: int = Field(default=50, ge=0, le=100)
-
 
 class TranslateRequest(BaseModel):
     text: str = Field(..., min_length=1, max_length=50000)
     source_language: str = Field(..., pattern="^(he|en)$")
     target_language: str = Field(..., pattern="^(he|en)$")
+    stream: bool = False
+
+
+def _progress_event(stage: str, message: str, percent: int) -> dict:
+    return {
+        "event": "progress",
+        "data": json.dumps({
+            "stage": stage,
+            "message": message,
+            "percent": percent,
+        }, ensure_ascii=False),
+    }
 
 
 @app.post("/api/session")
 async def create_session(request: Request, session: SessionRequest):
-    async def event_generator():
+    bus = ProgressBus()
+
+    async def run_pipeline():
+        capture = None
+        status = "cancelled"
         try:
-            # Stage 1: Generate script
-            yield {
-                "event": "progress",
-                "data": json.dumps({
-                    "stage": "generating_script",
-                    "message": (
-                        "יוצר תסריט היפנוזה..." if session.mode == "hypnosis" else "יוצר תסריט מדיטציה..."
-                    ) if session.language == "he" else (
-                        "Generating hypnosis script..." if session.mode == "hypnosis" else "Generating meditation script..."
-                    ),
-                    "percent": 10,
-                }, ensure_ascii=False),
-            }
+            # Pre-rendered by the catalog job? Then there is nothing to generate
+            cached = await asyncio.to_thread(get_cached_session, session)
+            if cached:
+                bus.publish({
+                    "event": "complete",
+                    "data": json.dumps({
+                        "script": cached["script"],
+                        "audio_url": f"/audio/{cached['audio_file']}",
+                        "duration_minutes": session.duration_minutes,
+                    }, ensure_ascii=False),
+                })
+                return
 
-            prompt = build_meditation_prompt(
-                topic=session.topic,
-                duration_minutes=session.duration_minutes,
-                language=session.language,
-                mode=session.mode,
-                depth=session.depth,
-                age_group=session.age_group,
+            # Only a real render uses up an armed capture
+            capture = start_capture(
+                request, "session", f"{session.duration_minutes} min {session.language}/{session.mode}",
             )
 
-            response = await get_gemini_client().aio.models.generate_content(
-                model=GEMINI_MODEL,
-                contents=prompt,
-            )
-            script = response.text.strip()
+            # Stage 1: Generate script
+            bus.publish(_progress_event(
+                "generating_script",
+                (
+                    "יוצר תסריט היפנוזה..." if session.mode == "hypnosis" else "יוצר תסריט מדיטציה..."
+                ) if session.language == "he" else (
+                    "Generating hypnosis script..." if session.mode == "hypnosis" else "Generating meditation script..."
+                ),
+                10,
+            ))
+
+            if capture:
+                capture.stage("script")
+            blocks, script_minutes = await plan_session(session)
+            script = await generate_script(session, blocks, script_minutes)
 
             if not script:
-                yield {
+                status = "error"
+                bus.publish({
                     "event": "error",
                     "data": json.dumps({"message": "Failed to generate script"}),
-                }
+                })
                 return
 
-            yield {
-                "event": "progress",
-                "data": json.dumps({
-                    "stage": "script_ready",
-                    "message": "התסריט מוכן, מתחיל הקלטה..." if session.language == "he" else "Script ready, recording audio...",
-                    "percent": 25,
-                }, ensure_ascii=False),
-            }
-
-            # Stage 2: TTS with progress
-            progress_queue = asyncio.Queue()
+            bus.publish(_progress_event(
+                "script_ready",
+                "התסריט מוכן, מתחיל הקלטה..." if session.language == "he" else "Script ready, recording audio...",
+                25,
+            ))
 
+            # Stage 2: TTS with progress (coalesced — only the latest percent matters)
             async def on_tts_progress(stage, percent):
+                if capture and stage == "combining":
+                    capture.stage("encode")
                 overall = 25 + int(percent * 0.70)
                 msg = f"מקליט אודיו... {percent}%" if session.language == "he" else f"Recording audio... {percent}%"
-                await progress_queue.put({
-                    "event": "progress",
-                    "data": json.dumps({
-                        "stage": stage,
-                        "message": msg,
-                        "percent": overall,
-                    }, ensure_ascii=False),
-                })
-
-            tts_task = asyncio.create_task(
-                generate_audio(script, on_tts_progress, bells_volume=session.bells_volume)
-            )
-
-            while not tts_task.done():
-                try:
-                    event = await asyncio.wait_for(progress_queue.get(), timeout=0.5)
-                    yield event
-                except asyncio.TimeoutError:
-                    pass
-
-                if await request.is_disconnected():
-                    tts_task.cancel()
-                    return
-
-            while not progress_queue.empty():
-                yield await progress_queue.get()
+                bus.publish(_progress_event(stage, msg, overall), coalesce=True)
 
-            filename = tts_task.result()
+            if capture:
+                capture.stage("tts")
+            filename, script = await render_session(script, session, blocks, on_tts_progress)
 
             # Stage 3: Done
-            yield {
+            bus.publish({
                 "event": "complete",
                 "data": json.dumps({
                     "script": script,
                     "audio_url": f"/audio/{filename}",
                     "duration_minutes": session.duration_minutes,
                 }, ensure_ascii=False),
-            }
+            })
+            status = "ok"
 
         except Exception as e:
-            yield {
+            status = "error"
+            bus.publish({
                 "event": "error",
                 "data": json.dumps({"message": str(e)}),
-            }
+            })
+        finally:
+            if capture:
+                await capture.finish(status)
+            bus.close()
+
+    async def event_generator():
+        pipeline = asyncio.create_task(run_pipeline())
+        try:
+            async for event in bus.events():
+                yield event
+        finally:
+            # sse-starlette cancels this generator on http.disconnect
+            pipeline.cancel()
 
     return EventSourceResponse(event_generator())
 
 
+class RerenderRequest(BaseModel):
+    audio_url: str = Field(
+        ..., pattern=r"^/audio/meditation_[0-9a-f]{8}(\.(mp3|opus|m4a)|/playlist\.m3u8)$",
+    )
+    script: str = Field(..., min_length=1, max_length=50000)
+    bells_volume: int = Field(default=50, ge=0, le=100)
+
+
+@app.post("/api/session/rerender")
+async def rerender_session(request: Request, req: RerenderRequest):
+    """Re-render an edited script, synthesizing only the segments that changed."""
+    stem = re.match(r"^/audio/(meditation_[0-9a-f]{8})", req.audio_url).group(1)
+    try:
+        result = await cancel_on_disconnect(
+            request, rerender_audio(stem, req.script, bells_volume=req.bells_volume),
+        )
+    except FileNotFoundError:
+        return {"error": "This session can't be re-rendered — generate it again instead"}
+    if result is None:
+        return {"error": "Client disconnected"}
+
+    return {
+        "script": req.script,
+        "audio_url": f"/audio/{result['filename']}",
+        "segments_rendered": result["rendered"],
+        "segments_reused": result["reused"],
+    }
+
+
 @app.post("/api/translate")
-async def translate_script(req: TranslateRequest):
+async def translate_script(request: Request, req: TranslateRequest):
     """Translate a meditation script between Hebrew and English using Gemini."""
-    if req.source_language == req.target_language:
-        return {"translated_text": req.text}
-
-    lang_names = {"he": "Hebrew", "en": "English"}
-    source = lang_names[req.source_language]
-    target = lang_names[req.target_language]
+    label = f"{len(req.text)} chars {req.source_language}->{req.target_language}"
 
-    prompt = f"""You are a professional translator specializing in meditation and guided imagery scripts.
+    if not req.stream:
+        if req.source_language == req.target_language:
+            return {"translated_text": req.text}
+        capture = start_capture(request, "translate", label)
+        status = "error"
+        try:
+            translated = await cancel_on_disconnect(request, translate_text(
+                req.text, req.source_language, req.target_language,
+            ))
+            status = "ok" if translated is not None else "cancelled"
+        finally:
+            if capture:
+                await capture.finish(status)
+        if translated is None:
+            return {"error": "Client disconnected"}
+        return {"translated_text": translated}
 
-Translate the following {source} meditation script into {target}.
+    async def event_generator():
+        if req.source_language == req.target_language:
+            yield {
+                "event": "complete",
+                "data": json.dumps({"translated_text": req.text}, ensure_ascii=False),
+            }
+            return
 
-RULES:
-- Preserve ALL pause markers exactly as they are: [pause], [short_pause], [long_pause], [breath]
-- Keep the same calm, flowing, therapeutic tone
-- Use natural {target} suitable for spoken meditation guidance
-- Do not add or remove content — translate faithfully
-- Output ONLY the translated text, nothing else
-{"- Use warm modern spoken Hebrew (no biblical/formal). No nikud (diacritics)." if req.target_language == "he" else "- Use warm, flowing English suitable for deep relaxation."}
+        capture = start_capture(request, "translate", label)
+        chunks = split_into_chunks(req.text)
+        parts = []
+        status = "cancelled"
+        try:
+            async for part in iter_translated_chunks(
+                chunks, req.source_language, req.target_language,
+            ):
+                parts.append(part)
+                yield {
+                    "event": "chunk",
+                    "data": json.dumps({
+                        "index": len(parts) - 1,
+                        "total": len(chunks),
+                        "text": part,
+                    }, ensure_ascii=False),
+                }
+            status = "ok"
+        except Exception as e:
+            status = "error"
+            yield {
+                "event": "error",
+                "data": json.dumps({"message": str(e)}),
+            }
+            return
+        finally:
+            if capture:
+                await capture.finish(status)
 
-TEXT TO TRANSLATE:
-{req.text}"""
+        yield {
+            "event": "complete",
+            "data": json.dumps({"translated_text": "".join(parts).strip()}, ensure_ascii=False),
+        }
 
-    response = await get_gemini_client().aio.models.generate_content(
-        model=GEMINI_MODEL,
-        contents=prompt,
-    )
-    translated = response.text.strip()
-    return {"translated_text": translated}
+    return EventSourceResponse(event_generator())
 
 
 # ── YouTube Translation ─────────────────────────────────────────
@@ -223,61 +292,24 @@ def _extract_video_id(url: str) -> str:
 
 
 @app.post("/api/youtube/captions")
-async def get_youtube_captions(req: YouTubeCaptionsRequest):
+async def get_youtube_captions(request: Request, req: YouTubeCaptionsRequest):
     """Fetch YouTube captions and translate them to target language."""
     try:
         video_id = _extract_video_id(req.video_url)
     except ValueError:
         return {"error": "קישור יוטיוב לא תקין"}
 
-    # Try to fetch captions in order of preference
-    try:
-        ytt_api = YouTubeTranscriptApi()
-        transcript_list = ytt_api.list(video_id)
-    except Exception:
-        return {"error": "לא ניתן לגשת לכתוביות של הסרטון"}
-
-    captions = None
-    source_lang = None
-
-    # 1. Try target language first (already translated by YouTube)
-    try:
-        captions = ytt_api.fetch(transcript_list, languages=[req.target_language])
-        source_lang = req.target_language
-    except Exception:
-        pass
-
-    # 2. Try English
-    if captions is None:
-        try:
-            captions = ytt_api.fetch(transcript_list, languages=["en"])
-            source_lang = "en"
-        except Exception:
-            pass
-
-    # 3. Try any available language
-    if captions is None:
-        try:
-            captions = ytt_api.fetch(transcript_list)
-            source_lang = "unknown"
-        except Exception:
-            return {"error": "No captions available for this video"}
-
-    segments = [
-        {"start": s.start, "duration": s.duration, "text": s.text}
-        for s in captions
-    ]
-
-    return {
-        "video_id": video_id,
-        "source_language": source_lang,
-        "segments": segments,
-    }
+    result = await cancel_on_disconnect(
+        request, fetch_captions_cached(video_id, req.target_language),
+    )
+    if result is None:
+        return {"error": "Client disconnected"}
+    return result
 
 
 @app.post("/api/youtube/translate-captions")
 async def translate_youtube_captions(request: Request):
-    """Translate caption segments to Hebrew using Gemini via SSE streaming."""
+    """Translate caption segments to the target language using Gemini."""
     body = await request.json()
     segments = body.get("segments", [])
     target_language = body.get("target_language", "he")
@@ -285,52 +317,60 @@ async def translate_youtube_captions(request: Request):
     if not segments:
         return {"error": "No segments provided"}
 
-    lang_names = {"he": "עברית", "en": "English", "ar": "العربية", "ru": "Русский",
-                  "fr": "Français", "es": "Español", "de": "Deutsch"}
-    target_name = lang_names.get(target_language, target_language)
-
-    # Translate in batches of 20 segments for speed
-    BATCH_SIZE = 20
-    translated_segments = []
+    # Stop issuing batches as soon as the client goes away
+    translated_segments = await cancel_on_disconnect(
+        request, translate_captions_cached(segments, target_language),
+    )
+    if translated_segments is None:
+        return {"error": "Client disconnected"}
 
-    for i in range(0, len(segments), BATCH_SIZE):
-        batch = segments[i:i + BATCH_SIZE]
-        numbered_lines = "\n".join(
-            f"{j+1}. {seg['text']}" for j, seg in enumerate(batch)
-        )
+    return {"segments": translated_segments}
 
-        prompt = f"""Translate these subtitle lines to {target_name}.
 
-RULES:
-- Return ONLY the numbered translations, one per line, same numbering
-- Keep translations concise and natural for subtitles
-- Do not add explanations or notes
-{"- Use modern spoken Hebrew, no nikud" if target_language == "he" else ""}
+class BulkCaptionsRequest(BaseModel):
+    video_urls: list[str] = Field(..., min_length=1, max_length=BULK_CAPTIONS_MAX_VIDEOS)
+    target_language: str = Field(default="he", pattern="^(he|en|ar|ru|fr|es|de)$")
 
-{numbered_lines}"""
 
-        response = await get_gemini_client().aio.models.generate_content(
-            model=GEMINI_MODEL,
-            contents=prompt,
-        )
+@app.post("/api/youtube/bulk-captions")
+async def bulk_youtube_captions(req: BulkCaptionsRequest):
+    """
+    Fetch and translate the captions of many videos in one job, streaming each
+    video's segments (event "video") or failure ("video_error") as it finishes.
+    """
+    video_ids = []
+    invalid = []
+    for url in req.video_urls:
+        try:
+            video_ids.append(_extract_video_id(url))
+        except ValueError:
+            invalid.append(url)
 
-        lines = response.text.strip().split("\n")
-        for j, seg in enumerate(batch):
-            translated_text = seg["text"]  # fallback
-            for line in lines:
-                # Match "1. translated text" or "1) translated text"
-                match = re.match(rf'^{j+1}[\.\)]\s*(.+)', line)
-                if match:
-                    translated_text = match.group(1).strip()
-                    break
-            translated_segments.append({
-                "start": seg["start"],
-                "duration": seg["duration"],
-                "original": seg["text"],
-                "text": translated_text,
-            })
+    async def event_generator():
+        for url in invalid:
+            yield {
+                "event": "video_error",
+                "data": json.dumps({"video_url": url, "error": "Invalid YouTube URL"}),
+            }
+        translated = 0
+        failed = len(invalid)
+        # sse-starlette cancels us on disconnect, which cancels the pending videos
+        async for result in translate_videos(video_ids, req.target_language):
+            if "error" in result:
+                failed += 1
+                yield {"event": "video_error", "data": json.dumps(result, ensure_ascii=False)}
+            else:
+                translated += 1
+                yield {"event": "video", "data": json.dumps(result, ensure_ascii=False)}
+        yield {
+            "event": "complete",
+            "data": json.dumps({
+                "translated": translated,
+                "failed": failed,
+            }),
+        }
 
-    return {"segments": translated_segments}
+    return EventSourceResponse(event_generator())
 
 
 @app.get("/api/health")
@@ -338,6 +378,74 @@ async def health():
     return {"status": "ok"}
 
 
+@app.get("/api/tts/status")
+async def tts_status():
+    """Circuit-breaker state, latency percentiles and failover counters per TTS engine."""
+    return resilient_tts.status()
+
+
+@app.get("/api/llm/status")
+async def llm_status():
+    """Gemini gateway counters (calls, coalesced, retries, tokens) and latency percentiles."""
+    return gateway.status()
+
+
+@app.get("/api/nikud/status")
+async def nikud_status():
+    """Queue depth, batch sizes and cache counters of the shared nikud sidecar."""
+    status = await asyncio.to_thread(sidecar_status)
+    return status or {"error": "Nikud sidecar not configured or not reachable"}
+
+
+@app.get("/api/render/status")
+async def render_status():
+    """PCM held in memory by concurrent renders against the budget, and spill counters."""
+    return render_budget.status()
+
+
+# ── Profiling (admin) ───────────────────────────────────────────
+
+class ProfilingArmRequest(BaseModel):
+    kind: str = Field(..., pattern="^(session|translate)$")
+    count: int = Field(default=1, ge=0, le=100)
+
+
+def _forbidden() -> JSONResponse:
+    return JSONResponse({"error": "Forbidden"}, status_code=403)
+
+
+@app.post("/api/admin/profiling/arm")
+async def profiling_arm(request: Request, req: ProfilingArmRequest):
+    """Profile the next `count` sessions or translations (0 disarms)."""
+    if not is_admin(request):
+        return _forbidden()
+    arm_profiling(req.kind, req.count)
+    return {"armed": armed_counts()}
+
+
+@app.get("/api/admin/profiles")
+async def profiling_list(request: Request):
+    """Stored profiles, newest first: stages with wall/CPU time, sample counts."""
+    if not is_admin(request):
+        return _forbidden()
+    return {"armed": armed_counts(), "profiles": await asyncio.to_thread(list_profiles)}
+
+
+@app.get("/api/admin/profiles/{profile_id}/{fmt}")
+async def profiling_download(request: Request, profile_id: str, fmt: str):
+    """Download a profile: `collapsed` (flamegraph input) or `json` (metadata)."""
+    if not is_admin(request):
+        return _forbidden()
+    if fmt not in ("collapsed", "json") or not re.match(
+        rf"^({'|'.join(PROFILE_KINDS)})_[0-9-]+_[0-9a-f]{{6}}$", profile_id,
+    ):
+        return JSONResponse({"error": "Not found"}, status_code=404)
+    path = profile_path(profile_id, fmt)
+    if path is None:
+        return JSONResponse({"error": "Not found"}, status_code=404)
+    return FileResponse(path, filename=f"{profile_id}.{fmt}")
+
+
 # Serve frontend static files (must be after API routes)
 if FRONTEND_DIR.exists():
     app.mount("/assets", StaticFiles(directory=FRONTEND_DIR / "assets"), name="frontend_assets")
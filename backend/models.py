@@ -0,0 +1,18 @@
+"""
+Request models shared by the API and the offline catalog renderer, kept apart
+from main.py so the catalog CLI doesn't build the web app to import them.
+"""
+
+from pydantic import BaseModel, Field
+
+
+class SessionRequest(BaseModel):
+    topic: str = Field(..., min_length=2, max_length=200)
+    duration_minutes: int = Field(..., ge=3, le=30)
+    language: str = Field(default="he", pattern="^(he|en)$")
+    mode: str = Field(default="imagery", pattern="^(imagery|hypnosis)$")
+    depth: str = Field(default="standard", pattern="^(light|standard|medium|deep)$")
+    age_group: str = Field(default="adults", pattern="^(children|teens|adults)$")
+    bells_volume: int = Field(default=50, ge=0, le=100)
+    prebuilt_blocks: bool = True
+    output_profile: str = Field(default="mp3", pattern="^(mp3|opus|aac|hls)$")
@@ -1,14 +1,47 @@
 """
 Nikud (Hebrew diacritics) service using Phonikud-ONNX.
 Ensures all Hebrew text has proper vowel marks for accurate TTS pronunciation.
+
+With config.NIKUD_SOCKET set, inference goes to the shared nikud_sidecar
+process instead of a per-worker model; if the sidecar is unreachable the
+worker falls back to its own model for a while.
 """
 
 import re
 import os
+import json
+import time
+import socket
 from functools import lru_cache
+import numpy as np
 from huggingface_hub import hf_hub_download
 from phonikud_onnx import Phonikud
 
+# Batched inference reuses phonikud-onnx internals (tested against the version
+# pinned in requirements.txt); without them every text goes through the
+# public add_diacritics one by one
+try:
+    from phonikud_onnx.model import (
+        NIKUD_CLASSES, SHIN_CLASSES, MAT_LECT_TOKEN, STRESS_CHAR, VOCAL_SHVA_CHAR, PREFIX_CHAR,
+        is_hebrew_letter, is_matres_letter, remove_nikkud,
+    )
+    _HAS_DECODE_INTERNALS = True
+except ImportError:
+    _HAS_DECODE_INTERNALS = False
+
+from config import NIKUD_SOCKET
+
+# A long script can take a while when the sidecar is busy
+_SIDECAR_TIMEOUT_S = 60
+# After a failed sidecar request, use the local model for this long
+_SIDECAR_RETRY_S = 30
+
+# Padded characters per inference call: chunks of similar length are batched
+# together up to this size (attention memory grows with batch x length²)
+_BATCH_CHARS = 8192
+
+_sidecar_down_until = 0.0
+
 # Phonikud adds phonetic markers we need to clean for TTS
 # | = morpheme boundary, ֫ = stress mark, ֽ = meteg
 _PHONETIC_CLEANUP = re.compile(r'[|ֽ֫֬]')
@@ -27,6 +60,132 @@ def _get_model() -> Phonikud:
     return Phonikud(model_path)
 
 
+def _decode(sentence: str, offsets, nikud, shin, stress, vocal_shva, prefix) -> str:
+    """One sentence's letters with their predicted marks (as in OnnxModel.predict)."""
+    output = []
+    prev_index = 0
+    for idx, (start, end) in enumerate(offsets):
+        if start > prev_index:
+            output.append(sentence[prev_index:start])
+        if end - start != 1:
+            continue
+        char = sentence[start:end]
+        prev_index = end
+        if not is_hebrew_letter(char):
+            output.append(char)
+            continue
+        mark = NIKUD_CLASSES[nikud[idx]]
+        if mark == MAT_LECT_TOKEN:
+            if is_matres_letter(char):
+                output.append(char)
+                continue
+            mark = ""  # no matres on other letters
+        output.append(
+            char
+            + (SHIN_CLASSES[shin[idx]] if char == "ש" else "")
+            + mark
+            + (STRESS_CHAR if stress[idx] else "")
+            + (VOCAL_SHVA_CHAR if vocal_shva[idx] else "")
+            + (PREFIX_CHAR if prefix[idx] else "")
+        )
+    output.append(sentence[prev_index:])
+    return "".join(output)
+
+
+def _predict_batch(onnx, sentences: list[str]) -> list[str]:
+    """One ONNX inference call for several (nikud-free) sentences."""
+    inputs, offset_mapping = onnx._create_inputs(sentences, "longest")
+    outputs = dict(zip(onnx.output_names, onnx.session.run(onnx.output_names, inputs)))
+    nikud = np.argmax(outputs["nikud_logits"], axis=-1)
+    shin = np.argmax(outputs["shin_logits"], axis=-1)
+    additional = outputs["additional_logits"] > 0  # stress, vocal shva, prefix
+    return [
+        _decode(sentence, offsets, nikud[i], shin[i], additional[i, :, 0],
+                additional[i, :, 1], additional[i, :, 2])
+        for i, (sentence, offsets) in enumerate(zip(sentences, offset_mapping))
+    ]
+
+
+def _can_batch(model: Phonikud) -> bool:
+    onnx = getattr(model, "model", None)
+    return (
+        _HAS_DECODE_INTERNALS
+        and callable(getattr(model, "prepare_chunks", None))
+        and callable(getattr(onnx, "_create_inputs", None))
+        and hasattr(onnx, "session")
+        and hasattr(onnx, "output_names")
+    )
+
+
+def run_model(texts: list[str]) -> list[str]:
+    """
+    Raw Phonikud output for each text, computed in this process. All texts go
+    through the model together: their chunks are sorted by length and run in
+    padded batches instead of one inference call per chunk.
+    """
+    model = _get_model()
+    if not _can_batch(model):
+        return [model.add_diacritics(text) for text in texts]
+
+    chunks = []  # (text index, chunk)
+    for i, text in enumerate(texts):
+        chunks.extend((i, remove_nikkud(chunk)) for chunk in model.prepare_chunks(text))
+
+    # Ascending lengths, so each batch is padded to its last (longest) chunk
+    batches, batch = [], []
+    for k in sorted(range(len(chunks)), key=lambda k: len(chunks[k][1])):
+        width = len(chunks[k][1]) + 2  # [CLS] and [SEP]
+        if batch and (len(batch) + 1) * width > _BATCH_CHARS:
+            batches.append(batch)
+            batch = []
+        batch.append(k)
+    if batch:
+        batches.append(batch)
+
+    results = [""] * len(chunks)
+    for batch in batches:
+        for k, result in zip(batch, _predict_batch(model.model, [chunks[k][1] for k in batch])):
+            results[k] = result
+
+    vocalized = [""] * len(texts)
+    for (i, _), result in zip(chunks, results):
+        vocalized[i] += result
+    return vocalized
+
+
+def _sidecar_call(request: dict) -> dict:
+    with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as sock:
+        sock.settimeout(_SIDECAR_TIMEOUT_S)
+        sock.connect(NIKUD_SOCKET)
+        sock.sendall(json.dumps(request, ensure_ascii=False).encode("utf-8") + b"\n")
+        reply = json.loads(sock.makefile("rb").readline())
+    if "error" in reply:
+        raise RuntimeError(f"nikud sidecar: {reply['error']}")
+    return reply
+
+
+def _diacritize(texts: list[str]) -> list[str]:
+    """Vocalize `texts` (phonetic markers still in) through the sidecar or locally."""
+    global _sidecar_down_until
+    if NIKUD_SOCKET and time.monotonic() >= _sidecar_down_until:
+        try:
+            return _sidecar_call({"texts": texts})["texts"]
+        except (OSError, ValueError, RuntimeError):
+            # Not running, not answering or failing — don't stall every segment on it
+            _sidecar_down_until = time.monotonic() + _SIDECAR_RETRY_S
+    return run_model(texts)
+
+
+def sidecar_status() -> dict | None:
+    """Queue, batch and cache metrics of the sidecar; None when not configured or down."""
+    if not NIKUD_SOCKET:
+        return None
+    try:
+        return _sidecar_call({"op": "stats"})
+    except (OSError, ValueError, RuntimeError):
+        return None
+
+
 def _has_nikud(text: str) -> bool:
     """Check if text already has nikud (Hebrew vowel diacritics U+05B0-U+05BD)."""
     nikud_chars = sum(1 for c in text if '\u05B0' <= c <= '\u05BD')
@@ -54,23 +213,21 @@ def add_nikud(script: str) -> str:
     if _has_nikud(script):
         return script
 
-    model = _get_model()
-
     # Split on pause markers, keeping them
     parts = _PAUSE_PATTERN.split(script)
-    markers = _PAUSE_PATTERN.findall(script)
+
+    # Vocalize all text segments in one request
+    texts = [part.strip() for i, part in enumerate(parts) if i % 2 == 0 and part.strip()]
+    vocalized = iter(_diacritize(texts))
 
     result_parts = []
-    marker_idx = 0
 
     for i, part in enumerate(parts):
         if i % 2 == 0:
             # Text segment - apply nikud
             if part.strip():
-                vocalized = model.add_diacritics(part.strip())
                 # Clean phonetic markers that TTS doesn't need
-                vocalized = _PHONETIC_CLEANUP.sub('', vocalized)
-                result_parts.append(vocalized)
+                result_parts.append(_PHONETIC_CLEANUP.sub('', next(vocalized)))
             else:
                 result_parts.append(part)
         else:
@@ -85,6 +242,5 @@ def add_nikud_to_segment(text: str) -> str:
     if not text or not text.strip() or _has_nikud(text):
         return text
 
-    model = _get_model()
-    vocalized = model.add_diacritics(text.strip())
+    vocalized = _diacritize([text.strip()])[0]
     return _PHONETIC_CLEANUP.sub('', vocalized)
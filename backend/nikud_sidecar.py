@@ -0,0 +1,156 @@
+"""
+Shared nikud inference process for all uvicorn workers.
+One Phonikud model serves every worker over a Unix socket, instead of one
+model per worker. Requests from different sessions that arrive within
+NIKUD_BATCH_WINDOW_MS are gathered into one batch that runs through the model
+as padded batched inference (run_model), identical texts are computed once,
+and results are kept in an LRU cache.
+
+    NIKUD_SOCKET=/tmp/nikud.sock python nikud_sidecar.py
+
+Protocol: one JSON object per line — {"texts": [...]} is answered with
+{"texts": [...]} (raw model output, in order), {"op": "stats"} with metrics.
+"""
+
+import os
+import json
+import asyncio
+import argparse
+from collections import OrderedDict, deque
+
+from config import NIKUD_SOCKET, NIKUD_BATCH_WINDOW_MS, NIKUD_MAX_BATCH, NIKUD_CACHE_SIZE
+from nikud_service import run_model
+
+# Longest request line accepted (a full script in one request)
+_MAX_LINE_BYTES = 4 * 1024 * 1024
+_BATCH_WINDOW = 500
+
+
+class NikudBatcher:
+    def __init__(self, window_s: float, max_batch: int, cache_size: int):
+        self._window_s = window_s
+        self._max_batch = max_batch
+        self._cache_size = cache_size
+        self._queue: asyncio.Queue[str] = asyncio.Queue()
+        self._pending: dict[str, asyncio.Future] = {}  # queued or running, by text
+        self._cache: OrderedDict[str, str] = OrderedDict()
+        self._batch_sizes: deque[int] = deque(maxlen=_BATCH_WINDOW)
+        self.stats = {
+            "requests": 0,
+            "texts": 0,
+            "cache_hits": 0,
+            "coalesced": 0,
+            "batches": 0,
+            "errors": 0,
+        }
+
+    async def submit(self, texts: list[str]) -> list[str]:
+        self.stats["requests"] += 1
+        self.stats["texts"] += len(texts)
+        loop = asyncio.get_running_loop()
+        futures = []
+        for text in texts:
+            if text in self._cache:
+                self._cache.move_to_end(text)
+                self.stats["cache_hits"] += 1
+                future = loop.create_future()
+                future.set_result(self._cache[text])
+            elif text in self._pending:
+                self.stats["coalesced"] += 1
+                future = self._pending[text]
+            else:
+                future = self._pending[text] = loop.create_future()
+                self._queue.put_nowait(text)
+            futures.append(future)
+        # Shielded: a client hanging up must not fail the same text for others
+        return list(await asyncio.gather(*(asyncio.shield(f) for f in futures)))
+
+    async def _next_batch(self) -> list[str]:
+        loop = asyncio.get_running_loop()
+        batch = [await self._queue.get()]
+        deadline = loop.time() + self._window_s
+        while len(batch) < self._max_batch:
+            timeout = deadline - loop.time()
+            if timeout <= 0:
+                break
+            try:
+                batch.append(await asyncio.wait_for(self._queue.get(), timeout))
+            except asyncio.TimeoutError:
+                break
+        return batch
+
+    async def run(self) -> None:
+        """Batch loop: one batched model pass at a time, off the event loop."""
+        while True:
+            batch = await self._next_batch()
+            self.stats["batches"] += 1
+            self._batch_sizes.append(len(batch))
+            try:
+                results = await asyncio.to_thread(run_model, batch)
+            except Exception as e:
+                self.stats["errors"] += 1
+                for text in batch:
+                    future = self._pending.pop(text)
+                    future.set_exception(e)
+                    future.exception()  # mark retrieved if nobody waits anymore
+                continue
+            for text, result in zip(batch, results):
+                self._cache[text] = result
+                if len(self._cache) > self._cache_size:
+                    self._cache.popitem(last=False)
+                self._pending.pop(text).set_result(result)
+
+    def status(self) -> dict:
+        sizes = self._batch_sizes
+        return {
+            "stats": dict(self.stats),
+            "queue_depth": self._queue.qsize(),
+            "in_flight": len(self._pending),
+            "cache_size": len(self._cache),
+            "batch_size_avg": round(sum(sizes) / len(sizes), 2) if sizes else None,
+            "batch_size_max": max(sizes, default=None),
+        }
+
+
+async def _handle(batcher: NikudBatcher, reader, writer) -> None:
+    try:
+        while line := await reader.readline():
+            try:
+                request = json.loads(line)
+                if request.get("op") == "stats":
+                    reply = batcher.status()
+                else:
+                    reply = {"texts": await batcher.submit([str(t) for t in request["texts"]])}
+            except (ValueError, KeyError, TypeError) as e:
+                reply = {"error": f"bad request: {e}"}
+            except Exception as e:
+                reply = {"error": str(e)}
+            writer.write(json.dumps(reply, ensure_ascii=False).encode("utf-8") + b"\n")
+            await writer.drain()
+    except (ConnectionError, asyncio.LimitOverrunError, ValueError):
+        pass  # client went away or sent an oversized line
+    finally:
+        writer.close()
+
+
+async def serve(path: str) -> None:
+    # Load the model before accepting connections
+    await asyncio.to_thread(run_model, [])
+    batcher = NikudBatcher(NIKUD_BATCH_WINDOW_MS / 1000, NIKUD_MAX_BATCH, NIKUD_CACHE_SIZE)
+    if os.path.exists(path):
+        os.unlink(path)  # stale socket from a previous run
+    server = await asyncio.start_unix_server(
+        lambda r, w: _handle(batcher, r, w), path=path, limit=_MAX_LINE_BYTES,
+    )
+    print(f"nikud sidecar listening on {path}")
+    async with server:
+        await asyncio.gather(server.serve_forever(), batcher.run())
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Shared nikud inference process.")
+    parser.add_argument("--socket", default=NIKUD_SOCKET, help="Unix socket path (default: $NIKUD_SOCKET)")
+    args = parser.parse_args()
+    if not args.socket:
+        parser.error("set NIKUD_SOCKET or pass --socket")
+    asyncio.run(serve(args.socket))
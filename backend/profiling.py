@@ -0,0 +1,161 @@
+"""
+On-demand profiling of individual sessions and translations.
+Armed per request (X-Profile header carrying the admin token) or for the next
+N requests of a kind via the admin endpoint. While a capture runs, a sampler
+thread records the stacks of all threads — the event loop plus the TTS,
+bells and encode workers — as collapsed stacks (flamegraph.pl / speedscope
+input), and the pipeline marks its stages for wall and CPU time.
+
+Nothing runs when no capture is armed: call sites only check for None.
+CPU time and samples are process-wide, so concurrent requests show up too.
+"""
+
+import os
+import sys
+import json
+import time
+import uuid
+import asyncio
+import threading
+from collections import Counter
+
+from config import PROFILING_ADMIN_TOKEN, PROFILE_DIR, PROFILE_MAX_KEPT, PROFILE_SAMPLE_INTERVAL
+
+PROFILE_KINDS = ("session", "translate")
+
+_armed = {kind: 0 for kind in PROFILE_KINDS}
+
+
+def is_admin(request) -> bool:
+    return bool(PROFILING_ADMIN_TOKEN) and request.headers.get("x-admin-token") == PROFILING_ADMIN_TOKEN
+
+
+def arm_profiling(kind: str, count: int) -> int:
+    """Profile the next `count` requests of `kind`. Returns the number now armed."""
+    _armed[kind] = max(0, count)
+    return _armed[kind]
+
+
+def armed_counts() -> dict:
+    return dict(_armed)
+
+
+def start_capture(request, kind: str, label: str = "") -> "ProfileCapture | None":
+    """Start a capture for this request if it asked for one or one is armed."""
+    if _armed[kind] > 0:
+        _armed[kind] -= 1
+    elif not (PROFILING_ADMIN_TOKEN and request.headers.get("x-profile") == PROFILING_ADMIN_TOKEN):
+        return None
+    capture = ProfileCapture(kind, label)
+    capture.start()
+    return capture
+
+
+def _frame_name(frame) -> str:
+    code = frame.f_code
+    return f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})"
+
+
+class ProfileCapture:
+    def __init__(self, kind: str, label: str):
+        self.id = f"{kind}_{time.strftime('%Y%m%d-%H%M%S')}_{uuid.uuid4().hex[:6]}"
+        self.kind = kind
+        self.label = label
+        self.stacks: Counter[str] = Counter()
+        self.samples = 0
+        self._marks: list[tuple[str, float, float]] = []  # (stage, wall, cpu) at its start
+        self._stop = threading.Event()
+        self._sampler = threading.Thread(target=self._sample, name="profiler", daemon=True)
+
+    def start(self) -> None:
+        self._started_at = time.time()
+        self.stage("setup")
+        self._sampler.start()
+
+    def stage(self, name: str) -> None:
+        """Mark the start of a pipeline stage (the previous one ends here)."""
+        self._marks.append((name, time.perf_counter(), time.process_time()))
+
+    def _sample(self) -> None:
+        own = threading.get_ident()
+        names = {t.ident: t.name for t in threading.enumerate()}
+        while not self._stop.wait(PROFILE_SAMPLE_INTERVAL):
+            for ident, frame in sys._current_frames().items():
+                if ident == own:
+                    continue
+                stack = []
+                while frame is not None:
+                    stack.append(_frame_name(frame))
+                    frame = frame.f_back
+                if ident not in names:
+                    names = {t.ident: t.name for t in threading.enumerate()}
+                stack.append(names.get(ident, f"thread-{ident}"))
+                self.stacks[";".join(reversed(stack))] += 1
+            self.samples += 1
+
+    async def finish(self, status: str = "ok") -> str:
+        """Stop sampling and write the profile in the background. Returns its id."""
+        self.stage("end")
+        self._stop.set()
+        # The sampler may be mid-walk over every thread's stack; don't block the loop on it
+        await asyncio.to_thread(self._sampler.join)
+        threading.Thread(target=self._save, args=(status,), daemon=True).start()
+        return self.id
+
+    def _save(self, status: str) -> None:
+        stages = [
+            {"stage": name, "wall_s": round(wall_end - wall, 4), "cpu_s": round(cpu_end - cpu, 4)}
+            for (name, wall, cpu), (_, wall_end, cpu_end) in zip(self._marks, self._marks[1:])
+        ]
+        meta = {
+            "id": self.id,
+            "kind": self.kind,
+            "label": self.label,
+            "status": status,
+            "started_at": self._started_at,
+            "wall_s": round(self._marks[-1][1] - self._marks[0][1], 4),
+            "cpu_s": round(self._marks[-1][2] - self._marks[0][2], 4),
+            "stages": stages,
+            "samples": self.samples,
+            "sample_interval_s": PROFILE_SAMPLE_INTERVAL,
+        }
+        base = os.path.join(PROFILE_DIR, self.id)
+        with open(base + ".collapsed", "w", encoding="utf-8") as f:
+            for stack, count in self.stacks.most_common():
+                f.write(f"{stack} {count}\n")
+        # The metadata file marks the profile complete
+        with open(base + ".json.tmp", "w", encoding="utf-8") as f:
+            json.dump(meta, f, ensure_ascii=False)
+        os.replace(base + ".json.tmp", base + ".json")
+        _prune()
+
+
+def _prune() -> None:
+    """Keep only the newest PROFILE_MAX_KEPT profiles."""
+    for meta in list_profiles()[PROFILE_MAX_KEPT:]:
+        for ext in (".json", ".collapsed"):
+            try:
+                os.unlink(os.path.join(PROFILE_DIR, meta["id"] + ext))
+            except OSError:
+                pass
+
+
+def list_profiles() -> list[dict]:
+    """Metadata of the stored profiles, newest first."""
+    profiles = []
+    for name in os.listdir(PROFILE_DIR):
+        if not name.endswith(".json"):
+            continue
+        try:
+            with open(os.path.join(PROFILE_DIR, name), encoding="utf-8") as f:
+                profiles.append(json.load(f))
+        except (OSError, ValueError):
+            continue
+    profiles.sort(key=lambda meta: meta["started_at"], reverse=True)
+    return profiles
+
+
+def profile_path(profile_id: str, fmt: str) -> str | None:
+    """Path of a stored profile file (fmt "collapsed" or "json"), None if missing."""
+    path = os.path.join(PROFILE_DIR, f"{os.path.basename(profile_id)}.{fmt}")
+    return path if os.path.exists(path) else None
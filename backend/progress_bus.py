@@ -0,0 +1,65 @@
+"""
+Event-driven progress delivery for SSE streams.
+The pipeline task publishes events and the SSE generator awaits them directly,
+so an idle connection costs nothing until something actually happens.
+"""
+
+import asyncio
+from collections import deque
+
+from config import PROGRESS_MIN_INTERVAL
+
+
+class ProgressBus:
+    """
+    Single-producer / single-consumer event channel.
+
+    Coalescable events (percent updates) replace an undelivered predecessor
+    and are throttled to at most one per `min_interval` seconds. All other
+    events (errors, completion) are always delivered, in order.
+    """
+
+    def __init__(self, min_interval: float = PROGRESS_MIN_INTERVAL):
+        self._min_interval = min_interval
+        self._events: deque[tuple[dict, bool]] = deque()
+        self._wakeup = asyncio.Event()
+        self._closed = False
+        self._last_sent = 0.0
+
+    def publish(self, event: dict, coalesce: bool = False) -> None:
+        """Queue an event. Must be called from the event loop thread."""
+        if self._closed:
+            return
+        if coalesce and self._events and self._events[-1][1]:
+            self._events[-1] = (event, True)
+        else:
+            self._events.append((event, coalesce))
+        self._wakeup.set()
+
+    def close(self) -> None:
+        """Mark the stream finished; the consumer drains what is left and stops."""
+        self._closed = True
+        self._wakeup.set()
+
+    async def events(self):
+        """Yield events as they are published until the bus is closed."""
+        loop = asyncio.get_running_loop()
+        while True:
+            if not self._events:
+                if self._closed:
+                    return
+                self._wakeup.clear()
+                await self._wakeup.wait()
+                continue
+
+            event, coalesce = self._events[0]
+            if coalesce and not self._closed:
+                delay = self._last_sent + self._min_interval - loop.time()
+                if delay > 0:
+                    # Newer updates published meanwhile replace this one
+                    await asyncio.sleep(delay)
+                    continue
+
+            self._events.popleft()
+            self._last_sent = loop.time()
+            yield event
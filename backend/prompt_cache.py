@@ -0,0 +1,99 @@
+"""
+Gemini context caching for the static instruction part of session prompts.
+The large fixed blocks (phase structure, PAUSE_LEGEND, STYLE_RULES) are
+registered once per distinct instruction text — settings the instructions
+don't depend on (e.g. depth for imagery) share one cache — and every later
+request only sends its small per-session part. Falls back to a plain system
+instruction whenever caching is unavailable or the cache has expired. Token
+usage is tracked by llm_gateway.
+"""
+
+import re
+import asyncio
+import time
+import hashlib
+
+from google.genai import types
+
+from config import PROMPT_CACHE_ENABLED, PROMPT_CACHE_TTL_SECONDS
+from llm_gateway import gateway
+
+# Recreate handles this long before the provider expires them
+_REFRESH_MARGIN_S = 60
+# After a failed cache creation, don't retry for this long
+_RETRY_AFTER_S = 600
+
+_CACHE_GONE = re.compile(r"cached ?content", re.IGNORECASE)
+
+_handles: dict[str, tuple[str, float]] = {}  # instructions digest -> (cache name, expires_at)
+_locks: dict[str, asyncio.Lock] = {}
+_disabled_until = 0.0
+
+stats = {
+    "cache_hits": 0,
+    "cache_creates": 0,
+    "fallbacks": 0,
+}
+
+
+def _is_cache_gone(error: Exception) -> bool:
+    """The cached content expired or was evicted — unlike quota, safety or other 4xx errors."""
+    code = getattr(error, "code", None)
+    return code == 404 or (code == 400 and bool(_CACHE_GONE.search(str(error))))
+
+
+async def _get_handle(key: str, label: str, instructions: str) -> str | None:
+    """Return a live cached-content name for `key`, creating it if needed."""
+    global _disabled_until
+    if not PROMPT_CACHE_ENABLED or time.monotonic() < _disabled_until:
+        return None
+
+    handle = _handles.get(key)
+    if handle and handle[1] - _REFRESH_MARGIN_S > time.monotonic():
+        stats["cache_hits"] += 1
+        return handle[0]
+
+    lock = _locks.setdefault(key, asyncio.Lock())
+    async with lock:
+        handle = _handles.get(key)
+        if handle and handle[1] - _REFRESH_MARGIN_S > time.monotonic():
+            stats["cache_hits"] += 1
+            return handle[0]
+        try:
+            cache = await gateway.create_cache(types.CreateCachedContentConfig(
+                display_name=f"{label}-{key[:12]}",
+                system_instruction=instructions,
+                ttl=f"{PROMPT_CACHE_TTL_SECONDS}s",
+            ))
+        except Exception:
+            # Caching not supported for this model/key/tier — don't hammer it
+            _disabled_until = time.monotonic() + _RETRY_AFTER_S
+            return None
+        stats["cache_creates"] += 1
+        _handles[key] = (cache.name, time.monotonic() + PROMPT_CACHE_TTL_SECONDS)
+        return cache.name
+
+
+async def generate_with_instructions(instructions: str, contents: str, label: str = "session"):
+    """
+    Call generate_content with `instructions` as the (cached) system instruction
+    and `contents` as the per-request prompt. Returns the raw response.
+    `label` prefixes the cache's display name.
+    """
+    key = hashlib.sha256(instructions.encode("utf-8")).hexdigest()
+    name = await _get_handle(key, label, instructions)
+    if name is not None:
+        try:
+            return await gateway.generate(
+                contents, types.GenerateContentConfig(cached_content=name),
+            )
+        except Exception as e:
+            if not _is_cache_gone(e):
+                raise
+            # Handle expired or was evicted early — forget it and send uncached
+            _handles.pop(key, None)
+
+    stats["fallbacks"] += 1
+    return await gateway.generate(
+        contents, types.GenerateContentConfig(system_instruction=instructions),
+    )
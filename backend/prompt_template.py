@@ -77,21 +77,19 @@ def _age_instruction(age_group: str, language: str) -> str:
 
 # ── GUIDED IMAGERY prompt ────────────────────────────────────────
 
-def build_imagery_prompt(
-    topic: str,
-    duration_minutes: int,
+def build_imagery_instructions(
     language: str,
     age_group: str = "adults",
     depth: str = "standard",
 ) -> str:
+    """Static system instructions — identical for every imagery topic and duration."""
     lang_name = "Hebrew" if language == "he" else "English"
-    target_words = duration_minutes * 80
 
     prompt = f"""You are an expert clinical guided imagery therapist trained in evidence-based
 visualization therapy, Ericksonian language patterns, and neuroscience-informed relaxation.
 
-Write a complete guided imagery script in {lang_name} for: "{topic}".
-Duration: {duration_minutes} minutes (~{target_words} words excluding pause markers).
+You write complete guided imagery scripts in {lang_name}. Each request gives the session
+topic and its target duration and word count.
 
 {_age_instruction(age_group, language)}
 
@@ -118,7 +116,7 @@ PHASE 2 — DEEPENING (15% of script):
 - Anchor: "Press your thumb and finger together gently... this is your anchor to this peace"
 
 PHASE 3 — THERAPEUTIC IMAGERY (45% of script):
-Core journey tailored to "{topic}":
+Core journey tailored to the session topic:
 
 For ANXIETY/PHOBIA topics:
 - Imagery rescripting: approach the feared element from the safe place
@@ -198,15 +196,13 @@ Just the words to be spoken, flowing naturally from start to finish."""
 
 # ── SELF-HYPNOSIS prompt ─────────────────────────────────────────
 
-def build_hypnosis_prompt(
-    topic: str,
-    duration_minutes: int,
+def build_hypnosis_instructions(
     language: str,
     depth: str = "deep",
     age_group: str = "adults",
 ) -> str:
+    """Static system instructions — identical for every hypnosis topic and duration."""
     lang_name = "Hebrew" if language == "he" else "English"
-    target_words = duration_minutes * 70  # slower pace for hypnosis
 
     depth_instructions = ""
     if depth == "light":
@@ -230,8 +226,8 @@ def build_hypnosis_prompt(
 Dave Elman rapid induction, Elkins Hypnotic Relaxation Therapy, and modern neuroscience-based
 hypnotherapy. You create self-hypnosis audio sessions.
 
-Write a complete self-hypnosis session script in {lang_name} for: "{topic}".
-Duration: {duration_minutes} minutes (~{target_words} words excluding pause markers).
+You write complete self-hypnosis session scripts in {lang_name}. Each request gives the
+session topic and its target duration and word count.
 {depth_instructions}
 
 {_age_instruction(age_group, language)}
@@ -280,7 +276,7 @@ PHASE 4 — SAFE PLACE CONSTRUCTION (10% of script):
   anytime you need it" [pause]
 
 PHASE 5 — THERAPEUTIC SUGGESTIONS (35% of script):
-The core therapeutic work for "{topic}":
+The core therapeutic work for the session topic:
 
 Use the WELL-FORMED SUGGESTION FORMULA:
 Trigger → Command → Resource → Identity
@@ -353,8 +349,126 @@ Just the words to be spoken, as a continuous hypnotic monologue."""
     return prompt
 
 
+# ── Per-request part ──────────────────────────────────────────────
+
+# Spoken words per minute (hypnosis is delivered more slowly)
+WORDS_PER_MINUTE = {"imagery": 80, "hypnosis": 70}
+
+
+# Phases covered by the pre-rendered opening/closing blocks (see blocks_service)
+BLOCK_PHASES = {
+    "imagery": {
+        "opening": "PHASE 1 and PHASE 2",
+        "middle": "PHASE 3 and PHASE 4",
+        "closing": "PHASE 5",
+    },
+    "hypnosis": {
+        "opening": "PHASE 1 to PHASE 3",
+        "middle": "PHASE 4 to PHASE 7",
+        "closing": "PHASE 8",
+    },
+}
+
+
+def build_session_request(
+    topic: str,
+    duration_minutes: int,
+    language: str,
+    mode: str = "imagery",
+    framed: bool = False,
+) -> str:
+    """
+    The small, per-session part of the prompt that follows the static instructions.
+    With `framed`, only the topic-specific middle is requested — the opening and
+    closing come from pre-rendered blocks.
+    """
+    lang_name = "Hebrew" if language == "he" else "English"
+    target_words = duration_minutes * WORDS_PER_MINUTE.get(mode, 80)
+    kind = "self-hypnosis session script" if mode == "hypnosis" else "guided imagery script"
+    if not framed:
+        return (
+            f'Write a complete {kind} in {lang_name} for: "{topic}".\n'
+            f"Duration: {duration_minutes} minutes (~{target_words} words excluding pause markers)."
+        )
+
+    phases = BLOCK_PHASES[mode]
+    return (
+        f'Write ONLY the middle of a {kind} in {lang_name} for: "{topic}" — '
+        f"{phases['middle']}, with the phase percentages rescaled to fill the whole length.\n"
+        f"Duration: {duration_minutes} minutes (~{target_words} words excluding pause markers).\n"
+        f"{phases['opening']} are pre-recorded and already played: the listener is "
+        f"relaxed, deepened and resting in their safe place. Begin there, without any welcome.\n"
+        f"{phases['closing']} is pre-recorded and follows your text: stop before the "
+        f"count-up and emergence."
+    )
+
+
+def build_block_request(
+    kind: str,
+    duration_minutes: int,
+    language: str,
+    mode: str = "imagery",
+) -> str:
+    """Request for a topic-independent opening or closing block (offline library build)."""
+    lang_name = "Hebrew" if language == "he" else "English"
+    target_words = duration_minutes * WORDS_PER_MINUTE.get(mode, 80)
+    phases = BLOCK_PHASES[mode]
+    if kind == "opening":
+        position = (
+            f"It ends with the listener relaxed and resting in their safe place; "
+            f"{phases['middle']} will follow."
+        )
+    else:
+        position = (
+            f"It begins right after {phases['middle']} and brings the listener gently back."
+        )
+    return (
+        f"Write ONLY {phases[kind]} of a session in {lang_name}, as a reusable block "
+        f"that works for any topic — do not mention any specific problem or goal.\n"
+        f"{position}\n"
+        f"Duration: {duration_minutes} minutes (~{target_words} words excluding pause markers)."
+    )
+
+
+def build_imagery_prompt(
+    topic: str,
+    duration_minutes: int,
+    language: str,
+    age_group: str = "adults",
+    depth: str = "standard",
+) -> str:
+    return (
+        build_imagery_instructions(language, age_group, depth)
+        + "\n\n" + build_session_request(topic, duration_minutes, language, "imagery")
+    )
+
+
+def build_hypnosis_prompt(
+    topic: str,
+    duration_minutes: int,
+    language: str,
+    depth: str = "deep",
+    age_group: str = "adults",
+) -> str:
+    return (
+        build_hypnosis_instructions(language, depth, age_group)
+        + "\n\n" + build_session_request(topic, duration_minutes, language, "hypnosis")
+    )
+
+
 # ── Main dispatcher ───────────────────────────────────────────────
 
+def build_meditation_instructions(
+    language: str,
+    mode: str = "imagery",
+    depth: str = "standard",
+    age_group: str = "adults",
+) -> str:
+    if mode == "hypnosis":
+        return build_hypnosis_instructions(language, depth, age_group)
+    return build_imagery_instructions(language, age_group, depth)
+
+
 def build_meditation_prompt(
     topic: str,
     duration_minutes: int,
@@ -0,0 +1,137 @@
+"""
+Render manifests: the per-segment layout of a session's speech timeline.
+Each rendered session keeps its pre-bells speech clips and a manifest of
+segment text hashes, PCM offsets and durations, so an edited script can be
+re-rendered by synthesizing only the segments whose text changed.
+
+Loading a manifest marks the render as used. Renders unused for
+RENDER_CACHE_MAX_AGE_DAYS, and the least recently used ones beyond
+RENDER_CACHE_MAX_MB, are pruned after each save; a re-render replaces the
+render it was made from.
+"""
+
+import os
+import json
+import time
+import difflib
+import hashlib
+
+from config import RENDER_DIR, RENDER_CACHE_MAX_MB, RENDER_CACHE_MAX_AGE_DAYS
+
+MANIFEST_VERSION = 1
+
+
+def segment_hash(text: str) -> str:
+    return hashlib.sha1(text.strip().encode("utf-8")).hexdigest()[:16]
+
+
+def _paths(stem: str) -> tuple[str, str]:
+    base = os.path.join(RENDER_DIR, stem)
+    return base + ".json", base + ".pcm"
+
+
+def save_render(stem: str, manifest: dict, clips: list[bytes]) -> None:
+    """
+    Store the speech clips and the manifest (which marks the render complete).
+    Pauses have no PCM — the manifest records only their duration.
+    """
+    manifest_path, pcm_path = _paths(stem)
+    with open(pcm_path, "wb") as f:
+        for clip in clips:
+            f.write(clip)
+    with open(manifest_path + ".tmp", "w", encoding="utf-8") as f:
+        json.dump(manifest, f, ensure_ascii=False)
+    os.replace(manifest_path + ".tmp", manifest_path)
+    prune_renders()
+
+
+def load_manifest(stem: str) -> dict | None:
+    manifest_path, pcm_path = _paths(stem)
+    try:
+        with open(manifest_path, encoding="utf-8") as f:
+            manifest = json.load(f)
+        os.utime(manifest_path)
+    except (OSError, ValueError):
+        return None
+    if manifest.get("version") != MANIFEST_VERSION or not os.path.exists(pcm_path):
+        return None
+    return manifest
+
+
+def _unlink_all(paths) -> None:
+    for path in paths:
+        try:
+            os.unlink(path)
+        except OSError:
+            pass
+
+
+def delete_render(stem: str) -> None:
+    """Remove a stored render (its audio output is left alone)."""
+    _unlink_all(_paths(stem))
+
+
+def prune_renders() -> None:
+    """Drop expired renders, then the least recently used beyond RENDER_CACHE_MAX_MB."""
+    expires = time.time() - RENDER_CACHE_MAX_AGE_DAYS * 86400
+    renders: dict[str, dict] = {}
+    for entry in os.scandir(RENDER_DIR):
+        try:
+            info = entry.stat()
+        except OSError:
+            continue
+        stem = entry.name.split(".", 1)[0]
+        render = renders.setdefault(stem, {"used": None, "mtime": 0.0, "size": 0, "paths": []})
+        render["paths"].append(entry.path)
+        render["size"] += info.st_size
+        render["mtime"] = max(render["mtime"], info.st_mtime)
+        if entry.name.endswith(".json"):
+            render["used"] = info.st_mtime
+
+    kept = []
+    for render in renders.values():
+        # Without a manifest the render is still being saved (or its save
+        # crashed), so only its own age can expire it
+        if (render["used"] or render["mtime"]) < expires:
+            _unlink_all(render["paths"])
+        elif render["used"] is not None:
+            kept.append((render["used"], render["size"], render["paths"]))
+
+    total = sum(size for _, size, _ in kept)
+    for _, size, paths in sorted(kept):
+        if total <= RENDER_CACHE_MAX_MB * 1024 * 1024:
+            break
+        _unlink_all(paths)
+        total -= size
+
+
+def read_pcm(stem: str, entries: list[dict]):
+    """Yield the PCM bytes of the given manifest entries, one at a time."""
+    _, pcm_path = _paths(stem)
+    with open(pcm_path, "rb") as f:
+        for entry in entries:
+            f.seek(entry["pcm_offset"])
+            yield f.read(entry["pcm_length"])
+
+
+def _key(unit: dict) -> tuple:
+    if unit["type"] == "pause":
+        return ("pause", unit["duration_ms"])
+    return (unit["type"], unit["hash"])
+
+
+def plan_rerender(manifest: dict, units: list[dict]) -> list[dict | None]:
+    """
+    Align the units of an edited script against the manifest.
+    Returns, per unit, the manifest entry whose audio can be reused, or None
+    if the unit has to be rendered.
+    """
+    old = manifest["segments"]
+    matcher = difflib.SequenceMatcher(
+        a=[_key(e) for e in old], b=[_key(u) for u in units], autojunk=False,
+    )
+    plan = [None] * len(units)
+    for a, b, size in matcher.get_matching_blocks():
+        for k in range(size):
+            plan[b + k] = old[a + k]
+    return plan
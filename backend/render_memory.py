@@ -0,0 +1,121 @@
+"""
+Memory budget for rendered PCM.
+Every render keeps its speech clips in a PCMStore. Clips stay in RAM while the
+process-wide budget (RENDER_MEMORY_BUDGET_MB, shared by all concurrent
+renders) has room; beyond it they are appended to a temp file and served
+from a read-only mmap, so the timeline and the encoder read them without
+copying and the page cache — not the heap — holds them.
+"""
+
+import mmap
+import tempfile
+import threading
+
+from config import RENDER_MEMORY_BUDGET_MB, RENDER_SPILL_DIR
+
+
+class MemoryBudget:
+    def __init__(self, limit_bytes: int):
+        self.limit_bytes = limit_bytes
+        self._lock = threading.Lock()
+        self.stats = {
+            "in_memory_bytes": 0,
+            "peak_in_memory_bytes": 0,
+            "spilled_bytes_total": 0,
+            "spilled_clips_total": 0,
+        }
+
+    def reserve(self, size: int) -> bool:
+        with self._lock:
+            if self.stats["in_memory_bytes"] + size > self.limit_bytes:
+                return False
+            self.stats["in_memory_bytes"] += size
+            self.stats["peak_in_memory_bytes"] = max(
+                self.stats["peak_in_memory_bytes"], self.stats["in_memory_bytes"],
+            )
+            return True
+
+    def release(self, size: int) -> None:
+        with self._lock:
+            self.stats["in_memory_bytes"] -= size
+
+    def record_spill(self, size: int) -> None:
+        with self._lock:
+            self.stats["spilled_bytes_total"] += size
+            self.stats["spilled_clips_total"] += 1
+
+    def status(self) -> dict:
+        return {"limit_bytes": self.limit_bytes, **self.stats}
+
+
+budget = MemoryBudget(RENDER_MEMORY_BUDGET_MB * 1024 * 1024)
+
+
+class PCMRef:
+    """A clip in a PCMStore; `view()` gives its bytes (a zero-copy mmap view if spilled)."""
+
+    __slots__ = ("_store", "_data", "_offset", "_length")
+
+    def __init__(self, store: "PCMStore", data: bytes | None, offset: int, length: int):
+        self._store = store
+        self._data = data
+        self._offset = offset
+        self._length = length
+
+    def __len__(self) -> int:
+        return self._length
+
+    def view(self):
+        if self._data is not None:
+            return self._data
+        return self._store._view(self._offset, self._length)
+
+
+class PCMStore:
+    """Per-render clip storage. Thread-safe; close() when the render is done."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._reserved = 0
+        self._file = None
+        self._size = 0
+        self._maps: list[mmap.mmap] = []
+
+    def put(self, data: bytes) -> PCMRef:
+        """Store `data` (blocking file I/O if it has to spill)."""
+        if budget.reserve(len(data)):
+            with self._lock:
+                self._reserved += len(data)
+            return PCMRef(self, data, 0, len(data))
+
+        with self._lock:
+            if self._file is None:
+                self._file = tempfile.TemporaryFile(prefix="render_", suffix=".pcm", dir=RENDER_SPILL_DIR)
+            offset = self._size
+            self._file.write(data)
+            self._size += len(data)
+        budget.record_spill(len(data))
+        return PCMRef(self, None, offset, len(data))
+
+    def _view(self, offset: int, length: int) -> memoryview:
+        with self._lock:
+            # Map again once the file has grown past the newest mapping; older
+            # mappings stay open for the views already handed out
+            if not self._maps or len(self._maps[-1]) < offset + length:
+                self._file.flush()
+                self._maps.append(mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ))
+            return memoryview(self._maps[-1])[offset:offset + length]
+
+    def close(self) -> None:
+        with self._lock:
+            budget.release(self._reserved)
+            self._reserved = 0
+            for mapping in self._maps:
+                try:
+                    mapping.close()
+                except BufferError:
+                    pass  # a view is still alive; the mapping goes with it
+            self._maps = []
+            if self._file is not None:
+                self._file.close()  # unlinked already, the space is freed with the last mapping
+                self._file = None
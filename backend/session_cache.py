@@ -0,0 +1,48 @@
+"""
+Cache of pre-rendered sessions, filled ahead of peak hours by catalog.py.
+/api/session answers straight from here when an identical request (topic,
+duration, language, mode, depth, age group, bells volume, pre-built blocks and
+output profile) is in the catalog.
+"""
+
+import os
+import json
+import hashlib
+import tempfile
+
+from config import SESSION_CACHE_DIR, AUDIO_OUTPUT_DIR
+
+CACHE_FIELDS = (
+    "topic", "duration_minutes", "language", "mode", "depth", "age_group", "bells_volume",
+    "prebuilt_blocks", "output_profile",
+)
+
+
+def session_key(session) -> str:
+    fields = {name: getattr(session, name) for name in CACHE_FIELDS}
+    fields["topic"] = " ".join(fields["topic"].lower().split())
+    raw = json.dumps(fields, sort_keys=True, ensure_ascii=False)
+    return hashlib.sha1(raw.encode("utf-8")).hexdigest()
+
+
+def get_cached_session(session) -> dict | None:
+    """Return {"script", "audio_file"} if this session was pre-rendered and its audio still exists."""
+    path = os.path.join(SESSION_CACHE_DIR, session_key(session) + ".json")
+    try:
+        with open(path, encoding="utf-8") as f:
+            entry = json.load(f)
+    except (OSError, ValueError):
+        return None
+    if not os.path.exists(os.path.join(AUDIO_OUTPUT_DIR, entry["audio_file"])):
+        return None
+    return entry
+
+
+def put_cached_session(session, script: str, audio_file: str) -> None:
+    path = os.path.join(SESSION_CACHE_DIR, session_key(session) + ".json")
+    # Own temp file per write, so concurrent writers of one key can't collide
+    with tempfile.NamedTemporaryFile(
+        "w", encoding="utf-8", dir=SESSION_CACHE_DIR, suffix=".tmp", delete=False,
+    ) as f:
+        json.dump({"script": script, "audio_file": audio_file}, f, ensure_ascii=False)
+    os.replace(f.name, path)
@@ -0,0 +1,61 @@
+"""
+Session pipeline stages shared by /api/session and the offline catalog renderer:
+script generation (Gemini) and audio rendering (TTS + bells + encode).
+"""
+
+import asyncio
+
+from prompt_template import build_meditation_instructions, build_session_request
+from prompt_cache import generate_with_instructions
+from blocks_service import select_blocks
+from tts_service import generate_audio
+
+
+async def plan_session(session) -> tuple[dict | None, int]:
+    """
+    Pick pre-rendered opening/closing blocks when the library has them.
+    Returns (blocks or None, minutes the generated script should cover).
+    """
+    if not session.prebuilt_blocks:
+        return None, session.duration_minutes
+    return await asyncio.to_thread(
+        select_blocks, session.mode, session.language,
+        session.age_group, session.depth, session.duration_minutes,
+    )
+
+
+async def generate_script(session, blocks: dict | None, script_minutes: int) -> str:
+    """Generate the spoken script (only the middle when blocks are spliced in)."""
+    instructions = build_meditation_instructions(
+        language=session.language,
+        mode=session.mode,
+        depth=session.depth,
+        age_group=session.age_group,
+    )
+    session_prompt = build_session_request(
+        topic=session.topic,
+        duration_minutes=script_minutes,
+        language=session.language,
+        mode=session.mode,
+        framed=blocks is not None,
+    )
+    response = await generate_with_instructions(instructions, session_prompt)
+    return response.text.strip()
+
+
+async def render_session(
+    script: str, session, blocks: dict | None, on_progress=None, priority: int = 0,
+) -> tuple[str, str]:
+    """Render the audio. Returns (audio path under /audio/, full script including block text)."""
+    filename = await generate_audio(
+        script, on_progress, bells_volume=session.bells_volume,
+        intro=blocks["opening"] if blocks else None,
+        outro=blocks["closing"] if blocks else None,
+        priority=priority,
+        output_profile=session.output_profile,
+    )
+    if blocks:
+        script = "\n\n".join(
+            [blocks["opening"]["script"], script, blocks["closing"]["script"]]
+        )
+    return filename, script
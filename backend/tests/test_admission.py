@@ -0,0 +1,98 @@
+"""Admission control: per-client limits and state shared between workers."""
+
+import os
+import sys
+import asyncio
+import subprocess
+
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+import admission
+from admission import AdmissionMiddleware
+
+SESSION = {"topic": "calm", "duration_minutes": 30}  # half the default burst
+
+
+def _client(monkeypatch, proxy_hops=1, api_keys=frozenset()):
+    monkeypatch.setattr(admission, "ADMISSION_PROXY_HOPS", proxy_hops)
+    monkeypatch.setattr(admission, "ADMISSION_API_KEYS", api_keys)
+    app = FastAPI()
+
+    @app.post("/api/session")
+    async def session():
+        return {"ok": True}
+
+    app.add_middleware(AdmissionMiddleware)
+    return TestClient(app)
+
+
+def test_spoofed_forwarded_hops_share_one_bucket(monkeypatch):
+    client = _client(monkeypatch)
+    statuses = [
+        # The proxy appends the real client address after whatever was sent
+        client.post("/api/session", json=SESSION,
+                    headers={"X-Forwarded-For": f"10.0.0.{i}, 203.0.113.7"}).status_code
+        for i in range(3)
+    ]
+    assert statuses == [200, 200, 429]
+
+
+def test_proxy_hop_separates_real_clients(monkeypatch):
+    client = _client(monkeypatch)
+    statuses = [
+        client.post("/api/session", json=SESSION,
+                    headers={"X-Forwarded-For": f"203.0.113.{i}"}).status_code
+        for i in range(3)
+    ]
+    assert statuses == [200, 200, 200]
+
+
+def test_forwarded_header_ignored_without_trusted_proxy(monkeypatch):
+    client = _client(monkeypatch, proxy_hops=0)
+    statuses = [
+        client.post("/api/session", json=SESSION,
+                    headers={"X-Forwarded-For": f"203.0.113.{i}"}).status_code
+        for i in range(3)
+    ]
+    assert statuses == [200, 200, 429]
+
+
+def test_only_configured_api_keys_get_their_own_bucket(monkeypatch):
+    client = _client(monkeypatch, proxy_hops=0, api_keys=frozenset({"partner"}))
+    unknown = [
+        client.post("/api/session", json=SESSION, headers={"X-API-Key": f"made-up-{i}"}).status_code
+        for i in range(3)
+    ]
+    assert unknown == [200, 200, 429]
+    assert client.post("/api/session", json=SESSION, headers={"X-API-Key": "partner"}).status_code == 200
+
+
+def test_sqlite_store_shares_state_between_workers(tmp_path):
+    path = str(tmp_path / "admission.db")
+    workers = [admission.SQLiteAdmissionStore(path) for _ in range(2)]
+
+    async def scenario():
+        waits = [await workers[i % 2].take("ip:203.0.113.7", 30, 1 / 6, 60) for i in range(3)]
+        slots = [await workers[i % 2].acquire("/api/session", 2) for i in range(3)]
+        await workers[0].release("/api/session")
+        return waits, slots, await workers[1].acquire("/api/session", 2)
+
+    waits, slots, after_release = asyncio.run(scenario())
+    assert waits[:2] == [0.0, 0.0] and waits[2] > 0
+    assert slots == [True, True, False]
+    assert after_release
+
+
+def test_sqlite_store_reclaims_slots_of_dead_workers(tmp_path):
+    path = str(tmp_path / "admission.db")
+    backend_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    # A worker that takes a slot and dies without releasing it
+    subprocess.run([sys.executable, "-c", (
+        "import asyncio, admission\n"
+        f"store = admission.SQLiteAdmissionStore({path!r})\n"
+        "assert asyncio.run(store.acquire('/api/session', 1))\n"
+    )], cwd=backend_dir, check=True)
+
+    store = admission.SQLiteAdmissionStore(path)
+    assert asyncio.run(store.acquire("/api/session", 1))
@@ -0,0 +1,148 @@
+"""Client disconnects must stop every stage of a request — nothing keeps running."""
+
+import os
+import sys
+import time
+import stat
+import asyncio
+import threading
+
+from pydub import AudioSegment
+
+import encode_service
+from audio_timeline import Timeline
+from cancellation import OperationCancelled, check_cancelled, run_cancellable, cancel_on_disconnect
+
+
+class FakeRequest:
+    """ASGI request whose receive channel reports http.disconnect once `disconnect()` is called."""
+
+    def __init__(self):
+        self._gone = asyncio.Event()
+        self.receive_calls = 0
+
+    def disconnect(self) -> None:
+        self._gone.set()
+
+    async def receive(self) -> dict:
+        self.receive_calls += 1
+        await self._gone.wait()
+        return {"type": "http.disconnect"}
+
+
+def _blocking_worker(started: threading.Event, stopped: threading.Event, cancelled=None):
+    started.set()
+    try:
+        while True:
+            check_cancelled(cancelled)
+            time.sleep(0.005)
+    except OperationCancelled:
+        stopped.set()
+        raise
+
+
+def test_run_cancellable_sets_event_and_stops_thread():
+    started, stopped = threading.Event(), threading.Event()
+
+    async def scenario():
+        task = asyncio.create_task(run_cancellable(_blocking_worker, started, stopped))
+        await asyncio.to_thread(started.wait, 1)
+        task.cancel()
+        try:
+            await task
+        except asyncio.CancelledError:
+            return task
+        raise AssertionError("cancellation was swallowed")
+
+    task = asyncio.run(scenario())
+    assert task.cancelled()
+    assert stopped.wait(1), "worker thread kept running after cancellation"
+
+
+def test_disconnect_cancels_task_and_worker():
+    started, stopped = threading.Event(), threading.Event()
+    seen = {}
+
+    async def work():
+        seen["task"] = asyncio.current_task()
+        return await run_cancellable(_blocking_worker, started, stopped)
+
+    async def scenario():
+        request = FakeRequest()
+        pending = asyncio.create_task(cancel_on_disconnect(request, work()))
+        await asyncio.to_thread(started.wait, 1)
+        request.disconnect()
+        return await asyncio.wait_for(pending, 1), request
+
+    result, request = asyncio.run(scenario())
+    assert result is None
+    assert seen["task"].cancelled()
+    assert request.receive_calls == 1  # waited on the channel, never polled
+    assert stopped.wait(1), "worker thread kept running after the disconnect"
+
+
+def test_no_disconnect_returns_result_and_stops_watching():
+    async def work():
+        await asyncio.sleep(0.01)
+        return "done"
+
+    async def scenario():
+        result = await cancel_on_disconnect(FakeRequest(), work())
+        await asyncio.sleep(0)
+        others = [t for t in asyncio.all_tasks() if t is not asyncio.current_task()]
+        return result, others
+
+    result, others = asyncio.run(scenario())
+    assert result == "done"
+    assert others == []
+
+
+def _fake_ffmpeg(tmp_path) -> str:
+    """An "encoder" that copies stdin slowly into the output file (its last argument)."""
+    script = tmp_path / "ffmpeg"
+    script.write_text(
+        f"#!{sys.executable}\n"
+        "import os, sys, time\n"
+        f"open({str(tmp_path / 'ffmpeg.pid')!r}, 'w').write(str(os.getpid()))\n"
+        "with open(sys.argv[-1], 'wb') as out:\n"
+        "    while chunk := sys.stdin.buffer.read(4096):\n"
+        "        out.write(chunk)\n"
+        "        out.flush()\n"
+        "        time.sleep(0.01)\n"
+    )
+    script.chmod(script.stat().st_mode | stat.S_IEXEC)
+    return str(script)
+
+
+def test_disconnect_during_encode_leaves_no_partial_output(tmp_path, monkeypatch):
+    out_dir = tmp_path / "audio"
+    out_dir.mkdir()
+    monkeypatch.setattr(AudioSegment, "converter", _fake_ffmpeg(tmp_path))
+    monkeypatch.setattr(encode_service, "AUDIO_OUTPUT_DIR", str(out_dir))
+
+    timeline = Timeline(24000)
+    timeline.add_gap(60_000)
+    partial = out_dir / "meditation_test.mp3.part"
+
+    async def scenario():
+        request = FakeRequest()
+        pending = asyncio.create_task(cancel_on_disconnect(
+            request, encode_service.encode_audio(timeline, "meditation_test"),
+        ))
+        for _ in range(200):
+            if partial.exists():
+                break
+            await asyncio.sleep(0.01)
+        assert partial.exists(), "encoder never started writing"
+        request.disconnect()
+        return await asyncio.wait_for(pending, 5)
+
+    assert asyncio.run(scenario()) is None
+    assert os.listdir(out_dir) == []
+    pid = int((tmp_path / "ffmpeg.pid").read_text())
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        pass
+    else:
+        raise AssertionError("encoder process outlived the request")
@@ -0,0 +1,46 @@
+"""Concurrent writes and pruning of the caption cache."""
+
+import os
+import time
+import threading
+
+import caption_cache
+
+
+def test_concurrent_writers_of_one_key(tmp_path, monkeypatch):
+    monkeypatch.setattr(caption_cache, "CAPTIONS_CACHE_DIR", str(tmp_path))
+    errors = []
+
+    def writer(n):
+        for i in range(300):
+            try:
+                caption_cache.put_cached_captions("dQw4w9WgXcQ", "he", {"writer": n, "i": i})
+            except OSError as e:
+                errors.append(e)
+
+    threads = [threading.Thread(target=writer, args=(n,)) for n in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert errors == []
+    assert caption_cache.get_cached_captions("dQw4w9WgXcQ", "he")["i"] == 299
+    assert [name for name in os.listdir(tmp_path) if name.endswith(".tmp")] == []
+
+
+def test_prune_drops_expired_and_least_recently_used(tmp_path, monkeypatch):
+    monkeypatch.setattr(caption_cache, "CAPTIONS_CACHE_DIR", str(tmp_path))
+    monkeypatch.setattr(caption_cache, "CAPTIONS_CACHE_MAX_ENTRIES", 2)
+    now = time.time()
+    for n, age_days in enumerate([40, 3, 2, 1]):
+        caption_cache.put_cached_captions(f"video{n}", "he", {"n": n})
+        path = caption_cache._path("captions", f"video{n}:he")
+        os.utime(path, (now - age_days * 86400,) * 2)
+    # A hit makes video1 the most recently used
+    assert caption_cache.get_cached_captions("video1", "he") == {"n": 1}
+
+    caption_cache.prune()
+
+    kept = {n for n in range(4) if caption_cache.get_cached_captions(f"video{n}", "he")}
+    assert kept == {1, 3}
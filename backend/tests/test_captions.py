@@ -0,0 +1,67 @@
+"""Merging caption fragments into units and spreading translations back over them."""
+
+import asyncio
+from types import SimpleNamespace
+
+import captions_service
+from captions_service import distribute, merge_fragments, translate_captions
+
+
+def _fragments(*items):
+    """(start, duration, text) triples -> caption segments."""
+    return [{"start": start, "duration": duration, "text": text} for start, duration, text in items]
+
+
+def test_merge_fragments_splits_on_sentence_end_and_gaps():
+    segments = _fragments(
+        (0.0, 2.0, "take a deep"), (2.0, 2.0, "breath in."),
+        (4.0, 2.0, "and slowly"), (6.0, 2.0, "let it go"),
+        (10.0, 2.0, "now relax"),  # 2 s of silence before this one
+    )
+    assert merge_fragments(segments) == [[0, 1], [2, 3], [4]]
+
+
+def test_merge_fragments_caps_unit_size():
+    segments = _fragments(*[(i * 2.0, 2.0, "word") for i in range(10)])
+    assert merge_fragments(segments) == [list(range(8)), [8, 9]]
+
+    long_text = "x" * 200
+    segments = _fragments((0.0, 2.0, long_text), (2.0, 2.0, long_text))
+    assert merge_fragments(segments) == [[0], [1]]
+
+
+def test_distribute_follows_weights():
+    assert distribute("one two three four", [1, 1]) == ["one two", "three four"]
+    assert distribute("one two three four", [3, 1]) == ["one two three", "four"]
+    assert distribute("anything at all", [5]) == ["anything at all"]
+
+
+def test_distribute_gives_every_part_a_word_when_it_can():
+    assert distribute("a b c d e f", [1, 100]) == ["a", "b c d e f"]
+    assert distribute("a b c d e f", [100, 1]) == ["a b c d e", "f"]
+    assert distribute("a b c", [1, 1, 50]) == ["a", "b", "c"]
+    parts = distribute("a b c d e f g h", [5, 1, 1, 20])
+    assert all(parts) and " ".join(parts) == "a b c d e f g h"
+
+
+def test_distribute_leaves_only_trailing_parts_empty_when_short_of_words():
+    assert distribute("שלום", [10, 10, 10]) == ["שלום", "", ""]
+    assert distribute("a b", [1, 1, 1, 1]) == ["a", "b", "", ""]
+
+
+def test_short_translation_folds_empty_fragments_into_previous_cue(monkeypatch):
+    async def fake_generate(prompt):
+        return SimpleNamespace(text="1. שלום\n2. נשימה עמוקה פנימה")
+
+    monkeypatch.setattr(captions_service.gateway, "generate", fake_generate)
+    segments = _fragments(
+        (0.0, 1.0, "hello there"), (1.0, 1.0, "my good"), (2.0, 1.0, "friend."),
+        (3.0, 2.0, "breathe deeply in."),
+    )
+
+    result = asyncio.run(translate_captions(segments, "he"))
+
+    assert [seg["text"] for seg in result] == ["שלום", "נשימה עמוקה פנימה"]
+    assert result[0]["start"] == 0.0 and result[0]["duration"] == 3.0
+    assert result[0]["original"] == "hello there my good friend."
+    assert result[1]["start"] == 3.0 and result[1]["duration"] == 2.0
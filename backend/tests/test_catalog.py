@@ -0,0 +1,23 @@
+"""Catalog manifest parsing."""
+
+from catalog import load_catalog
+
+
+def test_malformed_rows_are_reported_and_skipped(tmp_path):
+    manifest = tmp_path / "catalog.jsonl"
+    manifest.write_text(
+        '{"topic": "calm sea", "duration_minutes": 10}\n'
+        '{"topic": "broken", \n'
+        "\n"
+        '["not", "an", "object"]\n'
+        '{"topic": "forest walk", "duration_minutes": 0}\n'
+        '{"topic": "forest walk", "duration_minutes": 15}\n',
+        encoding="utf-8",
+    )
+
+    sessions, errors = load_catalog(str(manifest))
+
+    assert [s.topic for s in sessions] == ["calm sea", "forest walk"]
+    assert [e.split(":")[0] for e in errors] == ["row 2", "row 3", "row 4"]
+    assert "invalid JSON" in errors[0]
+    assert "JSON object" in errors[1]
@@ -0,0 +1,137 @@
+"""Single-flight coalescing, cancellation and retries of the LLM gateway."""
+
+import asyncio
+from types import SimpleNamespace
+
+import pytest
+
+import llm_gateway
+from llm_gateway import LLMGateway
+
+
+class APIError(Exception):
+    def __init__(self, code):
+        super().__init__(f"HTTP {code}")
+        self.code = code
+
+
+class FakeModels:
+    """generate_content stub: echoes the prompt after `delay`, failing with `errors` first."""
+
+    def __init__(self, delay: float = 0.05, errors=()):
+        self.delay = delay
+        self.errors = list(errors)
+        self.calls = []
+        self.cancelled = 0
+
+    async def generate_content(self, model, contents, config=None):
+        self.calls.append(contents)
+        try:
+            await asyncio.sleep(self.delay)
+        except asyncio.CancelledError:
+            self.cancelled += 1
+            raise
+        if self.errors:
+            raise self.errors.pop(0)
+        return SimpleNamespace(text=f"re: {contents}", usage_metadata=None)
+
+
+def _gateway(models: FakeModels, **kwargs) -> LLMGateway:
+    gateway = LLMGateway(**kwargs)
+    gateway._client = SimpleNamespace(aio=SimpleNamespace(models=models))
+    return gateway
+
+
+def test_identical_concurrent_calls_share_one_request():
+    models = FakeModels()
+    gateway = _gateway(models)
+
+    async def scenario():
+        return await asyncio.gather(
+            gateway.generate("breathe"), gateway.generate("breathe"), gateway.generate("relax"),
+        )
+
+    first, second, other = asyncio.run(scenario())
+    assert first is second
+    assert other.text == "re: relax"
+    assert sorted(models.calls) == ["breathe", "relax"]
+    assert gateway.stats["coalesced"] == 1
+    assert gateway.status()["in_flight"] == 0
+
+
+def test_request_is_cancelled_only_with_its_last_waiter():
+    models = FakeModels(delay=0.2)
+    gateway = _gateway(models)
+
+    async def scenario():
+        leaving = asyncio.create_task(gateway.generate("breathe"))
+        staying = asyncio.create_task(gateway.generate("breathe"))
+        await asyncio.sleep(0.05)
+        leaving.cancel()
+        result = await staying
+        assert models.cancelled == 0
+
+        alone = asyncio.create_task(gateway.generate("relax"))
+        await asyncio.sleep(0.05)
+        alone.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await alone
+        await asyncio.sleep(0)
+        return result
+
+    assert asyncio.run(scenario()).text == "re: breathe"
+    assert models.cancelled == 1
+
+
+def test_call_after_last_waiter_left_starts_a_new_request():
+    models = FakeModels(delay=0.05)
+    gateway = _gateway(models)
+
+    async def scenario():
+        first = asyncio.create_task(gateway.generate("breathe"))
+        await asyncio.sleep(0.01)
+        first.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await first
+        # The abandoned request has not wound down yet; this must not join it
+        return await gateway.generate("breathe")
+
+    assert asyncio.run(scenario()).text == "re: breathe"
+    assert models.calls == ["breathe", "breathe"]
+
+
+def test_transient_errors_are_retried_with_backoff(monkeypatch):
+    monkeypatch.setattr(llm_gateway, "_RETRY_BASE_S", 0.01)
+    sleeps = []
+    real_sleep = asyncio.sleep
+
+    async def recording_sleep(delay):
+        sleeps.append(delay)
+        await real_sleep(0)
+
+    models = FakeModels(delay=0, errors=[APIError(503), APIError(429)])
+    gateway = _gateway(models, max_retries=3)
+    monkeypatch.setattr(llm_gateway.asyncio, "sleep", recording_sleep)
+
+    assert asyncio.run(gateway.generate("breathe")).text == "re: breathe"
+    assert gateway.stats["retries"] == 2
+    assert len(models.calls) == 3
+    backoff = [d for d in sleeps if d > 0]
+    assert len(backoff) == 2 and 0.005 <= backoff[0] <= 0.01 and 0.01 <= backoff[1] <= 0.02
+
+
+def test_permanent_errors_and_exhausted_retries_raise(monkeypatch):
+    monkeypatch.setattr(llm_gateway, "_RETRY_BASE_S", 0.001)
+
+    models = FakeModels(delay=0, errors=[APIError(400)])
+    gateway = _gateway(models)
+    with pytest.raises(APIError):
+        asyncio.run(gateway.generate("breathe"))
+    assert len(models.calls) == 1 and gateway.stats["retries"] == 0
+
+    models = FakeModels(delay=0, errors=[APIError(503)] * 3)
+    gateway = _gateway(models, max_retries=2)
+    with pytest.raises(APIError):
+        asyncio.run(gateway.generate("breathe"))
+    assert len(models.calls) == 3
+    assert gateway.stats["errors"] == 1
@@ -0,0 +1,100 @@
+"""Batched nikud inference decodes exactly like Phonikud's per-sentence predict()."""
+
+import numpy as np
+from phonikud_onnx import Phonikud
+from phonikud_onnx.model import OnnxModel
+
+import nikud_service
+
+_CLS, _SEP, _PAD = 1, 2, 0
+
+
+class _Encoding:
+    def __init__(self, text):
+        self.ids = [_CLS] + [ord(c) for c in text] + [_SEP]
+        self.offsets = [(0, 0)] + [(i, i + 1) for i in range(len(text))] + [(0, 0)]
+
+
+class FakeTokenizer:
+    """Character-level, like the dictabert-char tokenizer."""
+
+    def encode(self, text):
+        return _Encoding(text)
+
+    def token_to_id(self, token):
+        return _PAD
+
+
+class FakeSession:
+    """Deterministic per-character "predictions"; counts inference calls."""
+
+    def __init__(self):
+        self.calls = []
+
+    def run(self, output_names, inputs):
+        ids = inputs["input_ids"]
+        self.calls.append(ids.shape)
+        nikud = np.eye(29)[ids % 29]
+        shin = np.eye(2)[ids % 2]
+        additional = np.stack([ids % 3 == 0, ids % 5 == 0, ids % 7 == 0], axis=-1) * 2.0 - 1.0
+        outputs = {"nikud_logits": nikud, "shin_logits": shin, "additional_logits": additional}
+        return [outputs[name] for name in output_names]
+
+
+def _fake_phonikud():
+    onnx = OnnxModel.__new__(OnnxModel)
+    onnx.tokenizer = FakeTokenizer()
+    onnx.session = FakeSession()
+    onnx.output_names = ["nikud_logits", "additional_logits", "shin_logits"]
+    phonikud = Phonikud.__new__(Phonikud)
+    phonikud.model = onnx
+    return phonikud
+
+
+def test_batched_output_matches_per_sentence_predict(monkeypatch):
+    phonikud = _fake_phonikud()
+    monkeypatch.setattr(nikud_service, "_get_model", lambda: phonikud)
+    texts = [
+        "שלום עולם",
+        "נשימה עמוקה, ועוד אחת.",
+        "hello שָׁלוֹם 123",
+        "",
+        "אני רגוע ושקט. " * 200,  # longer than one 2046-character chunk
+    ]
+
+    batched = nikud_service.run_model(texts)
+    calls = len(phonikud.model.session.calls)
+    expected = [phonikud.add_diacritics(text) for text in texts]
+
+    assert batched == expected
+    # Six chunks in all, in far fewer inference calls than one per chunk
+    assert len(phonikud.model.session.calls) - calls == 6
+    assert calls < 6
+
+
+def test_falls_back_to_add_diacritics_without_onnx_internals(monkeypatch):
+    # As if a phonikud-onnx release had renamed the private batching helper
+    monkeypatch.setattr(OnnxModel, "_create_inputs", None)
+    phonikud = _fake_phonikud()
+    monkeypatch.setattr(nikud_service, "_get_model", lambda: phonikud)
+    predicted = []
+    monkeypatch.setattr(phonikud.model, "predict",
+                        lambda chunk, **kw: predicted.append(chunk) or [chunk], raising=False)
+
+    assert nikud_service.run_model(["שלום עולם", "נשימה עמוקה."]) == ["שלום עולם", "נשימה עמוקה."]
+    assert predicted == ["שלום עולם", "נשימה עמוקה."]
+    assert phonikud.model.session.calls == []
+
+
+def test_sidecar_error_falls_back_to_local_model(monkeypatch):
+    monkeypatch.setattr(nikud_service, "NIKUD_SOCKET", "/tmp/nikud-test.sock")
+    monkeypatch.setattr(nikud_service, "_sidecar_down_until", 0.0)
+
+    def failing_sidecar(request):
+        raise RuntimeError("nikud sidecar: model crashed")
+
+    monkeypatch.setattr(nikud_service, "_sidecar_call", failing_sidecar)
+    monkeypatch.setattr(nikud_service, "run_model", lambda texts: [f"local:{t}" for t in texts])
+
+    assert nikud_service._diacritize(["שלום"]) == ["local:שלום"]
+    assert nikud_service._sidecar_down_until > 0
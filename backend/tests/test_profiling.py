@@ -0,0 +1,53 @@
+"""Armed profiling captures are only used up by real session renders."""
+
+import os
+import time
+
+import pytest
+from fastapi.testclient import TestClient
+
+import main
+import profiling
+
+SESSION = {"topic": "calm sea", "duration_minutes": 5}
+
+
+@pytest.fixture
+def client(tmp_path, monkeypatch):
+    monkeypatch.setattr(profiling, "PROFILE_DIR", str(tmp_path))
+    monkeypatch.setitem(profiling._armed, "session", 0)
+    return TestClient(main.app)
+
+
+def test_cached_session_keeps_armed_capture(client, monkeypatch):
+    monkeypatch.setattr(main, "get_cached_session", lambda session: {
+        "script": "Breathe.", "audio_file": "meditation_00000000.mp3",
+    })
+    profiling.arm_profiling("session", 1)
+
+    response = client.post("/api/session", json=SESSION)
+
+    assert "event: complete" in response.text
+    assert profiling.armed_counts()["session"] == 1
+    assert profiling.list_profiles() == []
+
+
+def test_rendered_session_uses_armed_capture(client, monkeypatch):
+    async def failing_plan(session):
+        raise RuntimeError("planner down")
+
+    monkeypatch.setattr(main, "get_cached_session", lambda session: None)
+    monkeypatch.setattr(main, "plan_session", failing_plan)
+    profiling.arm_profiling("session", 1)
+
+    response = client.post("/api/session", json=SESSION)
+
+    assert "planner down" in response.text
+    assert profiling.armed_counts()["session"] == 0
+    for _ in range(100):  # the profile is written by a background thread
+        if profiling.list_profiles():
+            break
+        time.sleep(0.02)
+    [meta] = profiling.list_profiles()
+    assert meta["status"] == "error"
+    assert os.path.exists(os.path.join(profiling.PROFILE_DIR, meta["id"] + ".collapsed"))
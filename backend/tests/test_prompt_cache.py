@@ -0,0 +1,118 @@
+"""Prompt caching against a fake Gemini client that counts prompt tokens."""
+
+import asyncio
+from types import SimpleNamespace
+
+import pytest
+from google.genai import errors
+
+import prompt_cache
+from llm_gateway import LLMGateway
+from prompt_template import build_meditation_instructions
+
+
+def _tokens(text: str) -> int:
+    return len(text) // 4
+
+
+class FakeGenAI:
+    """Just enough of genai.Client.aio: caches.create and models.generate_content."""
+
+    def __init__(self):
+        self.caches_created = []
+        self.calls = []
+        self.fail_next = None  # exception for the next cached call
+        self.aio = SimpleNamespace(
+            caches=SimpleNamespace(create=self._create_cache),
+            models=SimpleNamespace(generate_content=self._generate),
+        )
+
+    async def _create_cache(self, model, config):
+        name = f"cachedContents/{len(self.caches_created)}"
+        self.caches_created.append((name, config.system_instruction))
+        return SimpleNamespace(name=name)
+
+    async def _generate(self, model, contents, config):
+        self.calls.append(config)
+        cached = 0
+        if config.cached_content:
+            if self.fail_next is not None:
+                error, self.fail_next = self.fail_next, None
+                raise error
+            instructions = dict(self.caches_created)[config.cached_content]
+            cached = _tokens(instructions)
+        else:
+            instructions = config.system_instruction or ""
+        usage = SimpleNamespace(
+            prompt_token_count=_tokens(instructions) + _tokens(contents),
+            cached_content_token_count=cached,
+            candidates_token_count=10,
+        )
+        return SimpleNamespace(text="script", usage_metadata=usage)
+
+
+@pytest.fixture
+def fake(monkeypatch):
+    client = FakeGenAI()
+    gateway = LLMGateway(max_retries=0)
+    gateway._client = client
+    monkeypatch.setattr(prompt_cache, "gateway", gateway)
+    monkeypatch.setattr(prompt_cache, "PROMPT_CACHE_ENABLED", True)
+    monkeypatch.setattr(prompt_cache, "_handles", {})
+    monkeypatch.setattr(prompt_cache, "_locks", {})
+    monkeypatch.setattr(prompt_cache, "_disabled_until", 0.0)
+    return client, gateway
+
+
+def _generate(depth: str, topic: str, mode: str = "imagery"):
+    instructions = build_meditation_instructions("en", mode, depth, "adults")
+    return prompt_cache.generate_with_instructions(instructions, f"Topic: {topic}")
+
+
+def test_static_instructions_are_cached_once(fake):
+    client, gateway = fake
+
+    async def scenario():
+        for depth, topic in [("light", "sea"), ("deep", "forest"), ("standard", "rain")]:
+            await _generate(depth, topic)
+
+    asyncio.run(scenario())
+    # Imagery instructions don't depend on depth: one cache serves all three
+    assert len(client.caches_created) == 1
+    assert all(config.cached_content for config in client.calls)
+    uncached = gateway.stats["prompt_tokens"] - gateway.stats["cached_tokens"]
+    assert uncached < gateway.stats["prompt_tokens"] / 10
+
+
+def test_expired_cache_falls_back_uncached(fake):
+    client, gateway = fake
+
+    async def scenario():
+        await _generate("deep", "sea", mode="hypnosis")
+        client.fail_next = errors.ClientError(
+            404, {"error": {"code": 404, "message": "CachedContent not found", "status": "NOT_FOUND"}},
+        )
+        return await _generate("deep", "forest", mode="hypnosis")
+
+    assert asyncio.run(scenario()).text == "script"
+    assert client.calls[-1].system_instruction and not client.calls[-1].cached_content
+    assert prompt_cache.stats["fallbacks"] >= 1
+
+
+@pytest.mark.parametrize("code, message", [
+    (429, "Resource has been exhausted (e.g. check quota)."),
+    (400, "The request was blocked by safety filters."),
+])
+def test_other_errors_are_not_resent(fake, code, message):
+    client, _ = fake
+
+    async def scenario():
+        await _generate("light", "sea")
+        client.fail_next = errors.ClientError(
+            code, {"error": {"code": code, "message": message, "status": "ERROR"}},
+        )
+        await _generate("light", "forest")
+
+    with pytest.raises(errors.ClientError):
+        asyncio.run(scenario())
+    assert len(client.calls) == 2  # the failed cached call was not sent again uncached
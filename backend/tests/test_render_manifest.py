@@ -0,0 +1,33 @@
+"""Retention of stored renders."""
+
+import os
+import time
+
+import render_manifest
+from render_manifest import MANIFEST_VERSION, save_render, load_manifest
+
+
+def _age(tmp_path, name: str, days: float) -> None:
+    stamp = time.time() - days * 86400
+    os.utime(tmp_path / name, (stamp, stamp))
+
+
+def test_prune_keeps_recently_used_renders_within_budget(tmp_path, monkeypatch):
+    monkeypatch.setattr(render_manifest, "RENDER_DIR", str(tmp_path))
+    monkeypatch.setattr(render_manifest, "RENDER_CACHE_MAX_MB", 3)
+    clip = bytes(1000 * 1024)
+    manifest = {"version": MANIFEST_VERSION, "segments": []}
+
+    for n, age_days in enumerate([30, 3, 2, 1]):
+        save_render(f"meditation_{n}", manifest, [clip])
+        _age(tmp_path, f"meditation_{n}.json", age_days)
+    # A PCM file without a manifest is a render still being saved
+    (tmp_path / "meditation_saving.pcm").write_bytes(clip)
+    # Loading marks meditation_1 as the most recently used
+    assert load_manifest("meditation_1") is not None
+
+    save_render("meditation_4", manifest, [clip])
+
+    stems = {name.split(".")[0] for name in os.listdir(tmp_path)}
+    # 0 expired; 2 was the least recently used once 4 pushed past 3 MB
+    assert stems == {"meditation_1", "meditation_3", "meditation_4", "meditation_saving"}
@@ -0,0 +1,40 @@
+"""Concurrent full renders stay within the PCM memory budget (bench render_stress)."""
+
+import os
+import sys
+import json
+import stat
+import subprocess
+
+BACKEND = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def _fake_encoder(tmp_path) -> str:
+    """An "encoder" that drains stdin and writes a stub output file (its last argument)."""
+    script = tmp_path / "ffmpeg"
+    script.write_text(
+        f"#!{sys.executable}\n"
+        "import sys\n"
+        "while sys.stdin.buffer.read(1 << 16):\n"
+        "    pass\n"
+        "open(sys.argv[-1], 'wb').write(b'encoded')\n"
+    )
+    script.chmod(script.stat().st_mode | stat.S_IEXEC)
+    return str(script)
+
+
+def test_concurrent_renders_stay_under_rss_cap(tmp_path):
+    # ~120 MB of speech PCM against an 8 MB budget: the rest has to spill
+    result = subprocess.run(
+        [sys.executable, "-m", "bench", "render_stress",
+         "--sessions", "6", "--minutes", "10", "--budget-mb", "8", "--rss-cap-mb", "136",
+         "--time-scale", "0", "--converter", _fake_encoder(tmp_path)],
+        cwd=BACKEND, capture_output=True, text=True, timeout=300,
+    )
+    # static_ffmpeg may print a download notice on import, before the report
+    report = json.loads(result.stdout[result.stdout.index("{\n"):])
+
+    assert report["budget"]["spilled_bytes_total"] > 100 * 1024 * 1024
+    assert report["budget"]["peak_in_memory_bytes"] <= 8 * 1024 * 1024
+    assert not report["failed"], f"anonymous memory grew {report['rss_anon_growth_mb']} MB"
+    assert result.returncode == 0
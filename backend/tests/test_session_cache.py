@@ -0,0 +1,11 @@
+"""Session cache keys."""
+
+from models import SessionRequest
+from session_cache import session_key
+
+
+def test_key_covers_prebuilt_blocks():
+    with_blocks = SessionRequest(topic="Calm  Sea", duration_minutes=10)
+    without = SessionRequest(topic="calm sea", duration_minutes=10, prebuilt_blocks=False)
+    assert session_key(with_blocks) == session_key(SessionRequest(topic="calm sea", duration_minutes=10))
+    assert session_key(with_blocks) != session_key(without)
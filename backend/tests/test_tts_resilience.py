@@ -0,0 +1,100 @@
+"""Breaker recovery and engine caps of the TTS resilience layer."""
+
+import time
+import asyncio
+from collections import defaultdict
+
+import tts_resilience
+from tts_resilience import CircuitBreaker, ResilientTTS
+from tts_scheduler import TTSScheduler
+
+
+class FakeEngines:
+    """Engine stubs that record how many calls run at once per engine."""
+
+    def __init__(self, delay: float = 0.01):
+        self.delay = delay
+        self.fail = defaultdict(lambda: None)  # engine -> exception to raise
+        self.running = defaultdict(int)
+        self.peak = defaultdict(int)
+
+    def engine(self, name: str):
+        async def synthesize(text, language):
+            self.running[name] += 1
+            self.peak[name] = max(self.peak[name], self.running[name])
+            try:
+                await asyncio.sleep(self.delay)
+                if self.fail[name] is not None:
+                    raise self.fail[name]
+                return f"{name}:{text}"
+            finally:
+                self.running[name] -= 1
+        return synthesize
+
+
+def _resilient(fakes, slots=None, hedged=frozenset()):
+    return ResilientTTS(
+        engines={"edge": fakes.engine("edge"), "elevenlabs": fakes.engine("elevenlabs")},
+        fallbacks={"elevenlabs": "edge"},
+        hedged=set(hedged),
+        slots=slots,
+    )
+
+
+def test_open_breaker_gets_its_half_open_trial(monkeypatch):
+    monkeypatch.setattr(tts_resilience, "_BREAKER_COOLDOWN_S", 0.05)
+    fakes = FakeEngines(delay=0)
+    tts = _resilient(fakes)
+
+    async def scenario():
+        fakes.fail["elevenlabs"] = RuntimeError("quota exceeded")
+        assert await tts.synthesize("a", "en", "elevenlabs") == "edge:a"
+        assert tts.breakers["elevenlabs"].state == CircuitBreaker.OPEN
+        assert tts.route("elevenlabs") == "edge"
+
+        time.sleep(0.1)
+        fakes.fail["elevenlabs"] = None
+        engine = tts.route("elevenlabs")
+        assert engine == "elevenlabs"
+        assert await tts.synthesize("b", "en", engine) == "elevenlabs:b"
+
+    asyncio.run(scenario())
+    assert tts.breakers["elevenlabs"].state == CircuitBreaker.CLOSED
+    assert tts.route("elevenlabs") == "elevenlabs"
+
+
+def test_hedges_and_failovers_stay_within_engine_caps(monkeypatch):
+    monkeypatch.setattr(tts_resilience, "_HEDGE_MIN_DELAY_S", 0.001)
+    limits = {"edge": 4, "elevenlabs": 2}
+    scheduler = TTSScheduler(max_concurrency=8, engine_limits=limits)
+    fakes = FakeEngines(delay=0.02)
+    tts = _resilient(fakes, slots=scheduler, hedged={"edge"})
+    # Fast history so every edge call runs past its p95 and gets hedged
+    for _ in range(50):
+        tts._latency["edge"].record(0.0001, 1)
+    fakes.fail["elevenlabs"] = RuntimeError("engine error")  # every call fails over to edge
+
+    async def run_session(engine, count):
+        async with scheduler.session(engine) as session:
+            futures = [
+                session.submit(1, lambda i=i: tts.synthesize(f"s{i}", "en", engine))
+                for i in range(count)
+            ]
+            return await asyncio.gather(*futures)
+
+    async def scenario():
+        busy = await asyncio.gather(run_session("edge", 6), run_session("elevenlabs", 12))
+        # Hedges only use spare capacity: skipped while edge is saturated, sent when idle
+        assert tts.stats["hedges_skipped"] > 0
+        hedges = tts.stats["hedges"]
+        fakes.delay = 0.2  # well past the p95 seen so far
+        idle = await run_session("edge", 1)
+        assert tts.stats["hedges"] == hedges + 1
+        return busy[0] + busy[1] + idle
+
+    results = asyncio.run(scenario())
+    assert all(result.startswith("edge:") for result in results)
+    assert tts.stats["failovers"] == 12
+    assert fakes.peak["edge"] <= limits["edge"]
+    assert fakes.peak["elevenlabs"] <= limits["elevenlabs"]
+    assert scheduler._running == 0 and not any(scheduler._engine_running.values())
@@ -0,0 +1,50 @@
+"""Segment ordering of the TTS scheduler."""
+
+import asyncio
+
+from tts_scheduler import TTSScheduler
+
+
+def test_submit_many_starts_longest_segments_first():
+    scheduler = TTSScheduler(max_concurrency=8, engine_limits={"edge": 3})
+    started = []
+    lengths = [10, 20, 30, 40, 50, 60, 70, 80, 90, 100]  # script order: short to long
+
+    async def synthesize(cost):
+        started.append(cost)
+        await asyncio.sleep(0.001)
+        return cost
+
+    async def scenario():
+        async with scheduler.session("edge") as session:
+            futures = session.submit_many([(cost, lambda c=cost: synthesize(c)) for cost in lengths])
+            return await asyncio.gather(*futures)
+
+    assert asyncio.run(scenario()) == lengths
+    assert started == sorted(lengths, reverse=True)
+
+
+def test_short_session_overtakes_a_long_one_that_arrived_first():
+    scheduler = TTSScheduler(max_concurrency=1, engine_limits={"edge": 1})
+    started = []
+
+    async def synthesize(name):
+        started.append(name)
+        await asyncio.sleep(0.01)
+
+    async def scenario():
+        async with scheduler.session("edge") as long_session:
+            long_futures = long_session.submit_many(
+                [(10, lambda: synthesize("long")) for _ in range(20)]
+            )
+            await long_futures[0]  # the engine's speed is known from here on
+            async with scheduler.session("edge") as short_session:
+                await asyncio.gather(*short_session.submit_many(
+                    [(10, lambda: synthesize("short")) for _ in range(2)]
+                ))
+            await asyncio.gather(*long_futures)
+
+    asyncio.run(scenario())
+    # Whatever long segment was already running finishes first, then the short session runs
+    assert started.index("short") <= 2
+    assert started.count("long") == 20
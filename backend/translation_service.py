@@ -0,0 +1,144 @@
+"""
+Meditation script translation via Gemini.
+Long scripts are split on paragraph and pause-marker boundaries, the chunks are
+translated concurrently, and the results are reassembled in the original order.
+"""
+
+import asyncio
+import re
+
+from config import TRANSLATE_CHUNK_CHARS, TRANSLATE_CONCURRENCY
+from llm_gateway import gateway
+
+PAUSE_PATTERN = re.compile(r'\[(?:pause|short_pause|long_pause|breath)\]')
+_PARAGRAPH_BREAK = re.compile(r'(\n\s*\n)')
+_SENTENCE_END = re.compile(r'(?<=[\.\!\?…])\s+')
+
+LANG_NAMES = {"he": "Hebrew", "en": "English"}
+
+
+def build_translation_prompt(text: str, source_language: str, target_language: str) -> str:
+    source = LANG_NAMES[source_language]
+    target = LANG_NAMES[target_language]
+
+    return f"""You are a professional translator specializing in meditation and guided imagery scripts.
+
+Translate the following {source} meditation script into {target}.
+
+RULES:
+- Preserve ALL pause markers exactly as they are: [pause], [short_pause], [long_pause], [breath]
+- Keep the same calm, flowing, therapeutic tone
+- Use natural {target} suitable for spoken meditation guidance
+- Do not add or remove content — translate faithfully
+- Output ONLY the translated text, nothing else
+{"- Use warm modern spoken Hebrew (no biblical/formal). No nikud (diacritics)." if target_language == "he" else "- Use warm, flowing English suitable for deep relaxation."}
+
+TEXT TO TRANSLATE:
+{text}"""
+
+
+def _split_oversized(unit: str, max_chars: int) -> list[str]:
+    """Cut a too-long paragraph right after pause markers, else at sentence ends."""
+    cuts = [m.end() for m in PAUSE_PATTERN.finditer(unit)]
+    if not cuts:
+        cuts = [m.end() for m in _SENTENCE_END.finditer(unit)]
+    pieces = []
+    last = 0
+    for cut in cuts:
+        if cut - last >= max_chars // 2:
+            pieces.append(unit[last:cut])
+            last = cut
+    pieces.append(unit[last:])
+    return [p for p in pieces if p]
+
+
+def split_into_chunks(text: str, max_chars: int = TRANSLATE_CHUNK_CHARS) -> list[str]:
+    """
+    Split text into chunks of roughly `max_chars` on paragraph and pause-marker
+    boundaries. Concatenating the chunks reproduces the input exactly.
+    """
+    if len(text) <= max_chars:
+        return [text]
+
+    # Paragraphs, each keeping its trailing blank-line separator
+    parts = _PARAGRAPH_BREAK.split(text)
+    units = []
+    for i in range(0, len(parts), 2):
+        unit = parts[i] + (parts[i + 1] if i + 1 < len(parts) else "")
+        if len(unit) > max_chars:
+            units.extend(_split_oversized(unit, max_chars))
+        elif unit:
+            units.append(unit)
+
+    chunks = []
+    current = ""
+    for unit in units:
+        if current and len(current) + len(unit) > max_chars:
+            chunks.append(current)
+            current = ""
+        current += unit
+    if current:
+        chunks.append(current)
+    return chunks
+
+
+def _rewrap(original: str, translated: str) -> str:
+    """Give `translated` the same leading/trailing whitespace as `original`."""
+    lead = original[:len(original) - len(original.lstrip())]
+    trail = original[len(original.rstrip()):]
+    return lead + translated + trail
+
+
+async def _generate(semaphore: asyncio.Semaphore, prompt: str) -> str:
+    async with semaphore:
+        response = await gateway.generate(prompt)
+    return response.text.strip()
+
+
+async def _translate_chunk(semaphore, chunk: str, source: str, target: str) -> str:
+    body = chunk.strip()
+    if not body:
+        return chunk
+
+    expected = PAUSE_PATTERN.findall(body)
+    for _ in range(2):
+        translated = await _generate(semaphore, build_translation_prompt(body, source, target))
+        if PAUSE_PATTERN.findall(translated) == expected:
+            return _rewrap(chunk, translated)
+
+    # The model keeps dropping or moving markers: translate the text between
+    # markers on its own and put the original markers back verbatim.
+    pieces = PAUSE_PATTERN.split(body)
+
+    async def translate_piece(piece: str) -> str:
+        if not piece.strip():
+            return piece
+        out = await _generate(semaphore, build_translation_prompt(piece.strip(), source, target))
+        return _rewrap(piece, out)
+
+    translated_pieces = await asyncio.gather(*(translate_piece(p) for p in pieces))
+    rebuilt = translated_pieces[0]
+    for marker, piece in zip(expected, translated_pieces[1:]):
+        rebuilt += marker + piece
+    return _rewrap(chunk, rebuilt.strip())
+
+
+async def iter_translated_chunks(chunks: list[str], source: str, target: str):
+    """Translate all chunks concurrently, yielding the results in order."""
+    semaphore = asyncio.Semaphore(TRANSLATE_CONCURRENCY)
+    tasks = [
+        asyncio.create_task(_translate_chunk(semaphore, chunk, source, target))
+        for chunk in chunks
+    ]
+    try:
+        for task in tasks:
+            yield await task
+    finally:
+        for task in tasks:
+            task.cancel()
+
+
+async def translate_text(text: str, source: str, target: str) -> str:
+    chunks = split_into_chunks(text)
+    parts = [part async for part in iter_translated_chunks(chunks, source, target)]
+    return "".join(parts).strip()
@@ -0,0 +1,251 @@
+"""
+Resilience layer around the TTS engines.
+- Timeouts derived from each engine's observed latency percentiles
+- Hedging: a duplicate request is sent once a segment runs past the p95 latency
+- A circuit breaker per engine that opens on a high error rate (or at once on
+  quota/auth errors) and automatically fails over to the fallback engine
+
+Given the TTS scheduler as `slots`, hedges and failovers are counted against
+the engine they actually hit, so they stay within its concurrency cap.
+"""
+
+import time
+import asyncio
+from collections import deque
+
+# Latency model (seconds per character of segment text)
+_LATENCY_WINDOW = 200
+_MIN_SAMPLES = 20
+# Timeout = p99 estimate x factor, clamped; the default applies until we have samples
+_TIMEOUT_FACTOR = 3.0
+_TIMEOUT_MIN_S = 10.0
+_TIMEOUT_MAX_S = 120.0
+_DEFAULT_TIMEOUT_S = 60.0
+# Don't hedge earlier than this, whatever the percentiles say
+_HEDGE_MIN_DELAY_S = 1.0
+
+# Circuit breaker
+_BREAKER_WINDOW = 20
+_BREAKER_MIN_CALLS = 10
+_BREAKER_ERROR_RATE = 0.5
+_BREAKER_COOLDOWN_S = 30.0
+
+
+def _is_quota_error(error: Exception) -> bool:
+    error_msg = str(error).lower()
+    return "quota" in error_msg or "401" in error_msg or "429" in error_msg
+
+
+class LatencyTracker:
+    """Rolling window of successful call latencies, normalized per character."""
+
+    def __init__(self, window: int = _LATENCY_WINDOW):
+        self._rates: deque[float] = deque(maxlen=window)
+
+    def record(self, seconds: float, chars: int) -> None:
+        self._rates.append(seconds / max(chars, 1))
+
+    def estimate(self, chars: int, percentile: float) -> float | None:
+        """Expected latency for a segment of `chars` at `percentile`, or None if unknown."""
+        if len(self._rates) < _MIN_SAMPLES:
+            return None
+        ordered = sorted(self._rates)
+        idx = min(len(ordered) - 1, int(percentile / 100 * len(ordered)))
+        return ordered[idx] * max(chars, 1)
+
+
+class CircuitBreaker:
+    CLOSED, OPEN, HALF_OPEN = "closed", "open", "half_open"
+
+    def __init__(self):
+        self.state = self.CLOSED
+        self._outcomes: deque[bool] = deque(maxlen=_BREAKER_WINDOW)
+        self._opened_at = 0.0
+        self._trial_in_flight = False
+
+    def available(self) -> bool:
+        """Whether allow() would let a call through now (without claiming the trial)."""
+        if self.state == self.OPEN:
+            return time.monotonic() - self._opened_at >= _BREAKER_COOLDOWN_S
+        if self.state == self.HALF_OPEN:
+            return not self._trial_in_flight
+        return True
+
+    def allow(self) -> bool:
+        if self.state == self.OPEN:
+            if time.monotonic() - self._opened_at < _BREAKER_COOLDOWN_S:
+                return False
+            self.state = self.HALF_OPEN
+        if self.state == self.HALF_OPEN:
+            # One trial request at a time decides whether we close again
+            if self._trial_in_flight:
+                return False
+            self._trial_in_flight = True
+        return True
+
+    def record_success(self) -> None:
+        self._trial_in_flight = False
+        self._outcomes.append(True)
+        if self.state == self.HALF_OPEN:
+            self.state = self.CLOSED
+            self._outcomes.clear()
+
+    def record_failure(self) -> None:
+        self._trial_in_flight = False
+        self._outcomes.append(False)
+        if self.state == self.HALF_OPEN or (
+            len(self._outcomes) >= _BREAKER_MIN_CALLS
+            and self.error_rate() >= _BREAKER_ERROR_RATE
+        ):
+            self.trip()
+
+    def abandon(self) -> None:
+        """The call was cancelled by its caller — it says nothing about the engine."""
+        self._trial_in_flight = False
+
+    def trip(self) -> None:
+        self.state = self.OPEN
+        self._opened_at = time.monotonic()
+        self._trial_in_flight = False
+
+    def error_rate(self) -> float:
+        if not self._outcomes:
+            return 0.0
+        return self._outcomes.count(False) / len(self._outcomes)
+
+
+class ResilientTTS:
+    """
+    Dispatches segment synthesis to async engine functions `fn(text, language)`.
+    `fallbacks` maps an engine to the engine to fail over to; engines listed in
+    `hedged` get duplicate requests (only cheap/free engines should be hedged).
+    `slots` (the TTS scheduler) accounts for the engine slots calls run in.
+    """
+
+    def __init__(self, engines: dict, fallbacks: dict, hedged: set, slots=None):
+        self._engines = engines
+        self._fallbacks = fallbacks
+        self._hedged = hedged
+        self._slots = slots
+        self._latency = {name: LatencyTracker() for name in engines}
+        self.breakers = {name: CircuitBreaker() for name in engines}
+        self.stats = {
+            "calls": 0,
+            "timeouts": 0,
+            "hedges": 0,
+            "hedge_wins": 0,
+            "hedges_skipped": 0,
+            "failovers": 0,
+            "short_circuits": 0,
+        }
+
+    def route(self, engine: str) -> str:
+        """
+        The engine new work should go to, given the breaker states. Once an
+        open breaker's cooldown is over, work goes back to its engine for the
+        half-open trial.
+        """
+        if not self.breakers[engine].available():
+            return self._fallbacks.get(engine, engine)
+        return engine
+
+    async def synthesize(self, text: str, language: str, engine: str):
+        candidates = [engine]
+        if self._fallbacks.get(engine) not in (None, engine):
+            candidates.append(self._fallbacks[engine])
+
+        last_error = None
+        for name in candidates:
+            breaker = self.breakers[name]
+            if not breaker.allow():
+                self.stats["short_circuits"] += 1
+                continue
+            try:
+                if self._slots is not None:
+                    await self._slots.move_to(name)
+                audio = await self._call(name, text, language)
+            except asyncio.CancelledError:
+                breaker.abandon()
+                raise
+            except Exception as e:
+                last_error = e
+                if _is_quota_error(e):
+                    breaker.trip()
+                else:
+                    breaker.record_failure()
+                continue
+            breaker.record_success()
+            if name != engine:
+                self.stats["failovers"] += 1
+            return audio
+
+        if last_error is not None:
+            raise last_error
+        raise RuntimeError(f"No TTS engine available (circuit open for {engine})")
+
+    async def _call(self, name: str, text: str, language: str):
+        self.stats["calls"] += 1
+        loop = asyncio.get_running_loop()
+        tracker = self._latency[name]
+
+        p99 = tracker.estimate(len(text), 99)
+        timeout = (
+            min(max(p99 * _TIMEOUT_FACTOR, _TIMEOUT_MIN_S), _TIMEOUT_MAX_S)
+            if p99 is not None else _DEFAULT_TIMEOUT_S
+        )
+        hedge_delay = None
+        if name in self._hedged:
+            p95 = tracker.estimate(len(text), 95)
+            if p95 is not None:
+                hedge_delay = max(p95, _HEDGE_MIN_DELAY_S)
+
+        start = loop.time()
+        deadline = start + timeout
+        attempts = [asyncio.create_task(self._engines[name](text, language))]
+        pending = set(attempts)
+        try:
+            if hedge_delay is not None and hedge_delay < timeout:
+                done, pending = await asyncio.wait(pending, timeout=hedge_delay)
+                if not done and self._slots is not None and not self._slots.try_acquire(name):
+                    self.stats["hedges_skipped"] += 1  # the engine is at its cap
+                elif not done:
+                    self.stats["hedges"] += 1
+                    hedge = asyncio.create_task(self._engines[name](text, language))
+                    if self._slots is not None:
+                        hedge.add_done_callback(lambda _: self._slots.release(name))
+                    attempts.append(hedge)
+                    pending.add(hedge)
+
+            error = None
+            while True:
+                for task in attempts:
+                    if task.done() and not task.cancelled():
+                        if task.exception() is None:
+                            tracker.record(loop.time() - start, len(text))
+                            if task is not attempts[0]:
+                                self.stats["hedge_wins"] += 1
+                            return task.result()
+                        error = task.exception()
+                if not pending:
+                    raise error
+                remaining = deadline - loop.time()
+                if remaining <= 0:
+                    self.stats["timeouts"] += 1
+                    raise TimeoutError(f"{name} TTS timed out after {timeout:.1f}s")
+                _, pending = await asyncio.wait(
+                    pending, timeout=remaining, return_when=asyncio.FIRST_COMPLETED,
+                )
+        finally:
+            for task in attempts:
+                task.cancel()
+
+    def status(self) -> dict:
+        engines = {}
+        for name, breaker in self.breakers.items():
+            p95 = self._latency[name].estimate(100, 95)
+            engines[name] = {
+                "circuit": breaker.state,
+                "error_rate": round(breaker.error_rate(), 3),
+                "p95_latency_per_100_chars_s": None if p95 is None else round(p95, 3),
+            }
+        return {"engines": engines, "stats": dict(self.stats)}
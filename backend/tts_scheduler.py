@@ -0,0 +1,233 @@
+"""
+Process-wide scheduler for TTS segment synthesis.
+Every generate_audio run submits its text segments here instead of
+synthesizing them itself. The scheduler serves sessions by priority, then by
+earliest deadline, runs the longest segment of a session first so no long
+straggler stretches its tail, and enforces global and per-engine concurrency
+caps.
+
+A session's deadline is its arrival plus _DEADLINE_STRETCH times how long it
+would take alone on its engine, from its total cost and the engine's observed
+seconds per unit of cost. A short session overtakes a long one that arrived a
+little earlier, but the long one's deadline does not move, so it is not starved
+by a stream of short ones.
+
+Each running task's slot is counted against one engine. The resilience layer
+moves it when the task fails over to another engine, and takes an extra slot
+for a hedge request, so neither goes past an engine's cap.
+"""
+
+import time
+import heapq
+import asyncio
+import itertools
+from collections import defaultdict, deque
+
+from config import TTS_MAX_CONCURRENCY, TTS_ENGINE_CONCURRENCY
+
+_DEADLINE_STRETCH = 2.0
+# Weight of the newest sample in an engine's seconds-per-cost average
+_COST_RATE_WEIGHT = 0.2
+
+
+class TTSSession:
+    """One generate_audio run's view of the scheduler."""
+
+    def __init__(self, scheduler: "TTSScheduler", engine: str, priority: int):
+        self._scheduler = scheduler
+        self.preferred = engine
+        self.engine = engine  # where new work goes; follows the breakers (see route())
+        self.priority = priority
+        self.pending: list = []  # heap of (-cost, seq, factory, future)
+        self.in_flight: set[asyncio.Task] = set()
+        self.arrived = time.monotonic()
+        self.cost = 0  # of everything submitted so far
+
+    def submit(self, cost: int, factory) -> asyncio.Future:
+        """
+        Queue `factory()` (a coroutine function) with an estimated `cost`
+        (e.g. text length). Returns a future for its result.
+        """
+        return self.submit_many([(cost, factory)])[0]
+
+    def submit_many(self, jobs: list[tuple[int, object]]) -> list[asyncio.Future]:
+        """
+        Queue several (cost, factory) jobs before dispatching any, so the
+        longest of them starts first. Returns their futures, in order.
+        """
+        loop = asyncio.get_running_loop()
+        futures = []
+        for cost, factory in jobs:
+            future = loop.create_future()
+            heapq.heappush(self.pending, (-cost, next(self._scheduler._seq), factory, future))
+            self.cost += cost
+            futures.append(future)
+        self._scheduler._dispatch()
+        return futures
+
+
+class TTSScheduler:
+    def __init__(self, max_concurrency: int = TTS_MAX_CONCURRENCY,
+                 engine_limits: dict = TTS_ENGINE_CONCURRENCY):
+        self._max = max_concurrency
+        self._engine_limits = engine_limits
+        self._sessions: list[TTSSession] = []
+        self._running = 0
+        self._engine_running: dict[str, int] = defaultdict(int)
+        self._task_engine: dict[asyncio.Task, str | None] = {}  # whose slot is on which engine
+        self._movers: dict[str, deque[asyncio.Future]] = defaultdict(deque)
+        self._task_started: dict[asyncio.Task, tuple[float, int]] = {}  # (monotonic start, cost)
+        self._cost_rate: dict[str, float] = {}  # seconds per unit of cost, per engine
+        self._seq = itertools.count()
+
+    def session(self, engine: str, priority: int = 0):
+        """Async context manager; leaving it cancels whatever the session left behind."""
+        return _SessionScope(self, TTSSession(self, engine, priority))
+
+    def _has_room(self, engine: str) -> bool:
+        return self._engine_running[engine] < self._engine_limits.get(engine, self._max)
+
+    def try_acquire(self, engine: str) -> bool:
+        """Take an extra slot on `engine` (a hedge request) if one is free right now."""
+        if self._running >= self._max or not self._has_room(engine):
+            return False
+        self._running += 1
+        self._engine_running[engine] += 1
+        return True
+
+    def release(self, engine: str) -> None:
+        """Give back a slot taken with try_acquire()."""
+        self._running -= 1
+        self._engine_running[engine] -= 1
+        self._dispatch()
+
+    async def move_to(self, engine: str) -> None:
+        """
+        Count the calling task's slot against `engine` from now on (failover or
+        rerouting), waiting until that engine has room. No-op outside tasks
+        started by the scheduler.
+        """
+        task = asyncio.current_task()
+        current = self._task_engine.get(task, engine)
+        if current == engine:
+            return
+        if current is not None:
+            self._engine_running[current] -= 1
+        self._task_engine[task] = None
+        if self._has_room(engine) and not self._movers[engine]:
+            self._engine_running[engine] += 1
+            self._task_engine[task] = engine
+            self._dispatch()
+            return
+
+        waiter = asyncio.get_running_loop().create_future()
+        self._movers[engine].append(waiter)
+        self._dispatch()
+        try:
+            await waiter
+        except asyncio.CancelledError:
+            if waiter.done() and not waiter.cancelled():
+                self._engine_running[engine] -= 1  # granted just as we were cancelled
+                self._dispatch()
+            raise
+        self._task_engine[task] = engine
+
+    def _wake_movers(self) -> None:
+        # Running tasks moving to another engine go before new work
+        for engine, waiters in self._movers.items():
+            while waiters and self._has_room(engine):
+                waiter = waiters.popleft()
+                if not waiter.done():
+                    self._engine_running[engine] += 1
+                    waiter.set_result(None)
+
+    def _deadline(self, session: TTSSession) -> float:
+        # Until an engine has finished a task, every deadline is the arrival (FIFO)
+        rate = self._cost_rate.get(session.engine, 0.0)
+        alone = session.cost * rate / self._engine_limits.get(session.engine, self._max)
+        return session.arrived + _DEADLINE_STRETCH * alone
+
+    def _pick(self) -> TTSSession | None:
+        best, best_key = None, None
+        for session in self._sessions:
+            if not session.pending:
+                continue
+            if not self._has_room(session.engine):
+                continue
+            key = (-session.priority, self._deadline(session))
+            if best_key is None or key < best_key:
+                best, best_key = session, key
+        return best
+
+    def _dispatch(self) -> None:
+        self._wake_movers()
+        while self._running < self._max:
+            session = self._pick()
+            if session is None:
+                return
+            cost, _, factory, future = heapq.heappop(session.pending)
+            if future.cancelled():
+                continue
+
+            engine = session.engine
+            self._running += 1
+            self._engine_running[engine] += 1
+            task = asyncio.create_task(factory())
+            self._task_engine[task] = engine
+            self._task_started[task] = (time.monotonic(), -cost)
+            session.in_flight.add(task)
+            task.add_done_callback(lambda t, s=session, f=future: self._finished(t, s, f))
+
+    def _finished(self, task: asyncio.Task, session: TTSSession, future: asyncio.Future) -> None:
+        self._running -= 1
+        engine = self._task_engine.pop(task)
+        started, cost = self._task_started.pop(task)
+        if engine is not None:
+            self._engine_running[engine] -= 1
+            if not task.cancelled() and task.exception() is None and cost > 0:
+                self._observe(engine, (time.monotonic() - started) / cost)
+        session.in_flight.discard(task)
+        if task.cancelled():
+            if not future.done():
+                future.cancel()
+        else:
+            error = task.exception()
+            if future.done():
+                pass  # caller gave up on this segment
+            elif error is not None:
+                future.set_exception(error)
+            else:
+                future.set_result(task.result())
+        self._dispatch()
+
+    def _observe(self, engine: str, rate: float) -> None:
+        previous = self._cost_rate.get(engine)
+        if previous is None:
+            self._cost_rate[engine] = rate
+        else:
+            self._cost_rate[engine] = previous + _COST_RATE_WEIGHT * (rate - previous)
+
+    def _close(self, session: TTSSession) -> None:
+        if session in self._sessions:
+            self._sessions.remove(session)
+        for _, _, _, future in session.pending:
+            future.cancel()
+        session.pending.clear()
+        for task in list(session.in_flight):
+            task.cancel()
+
+
+class _SessionScope:
+    def __init__(self, scheduler: TTSScheduler, session: TTSSession):
+        self._scheduler = scheduler
+        self._session = session
+
+    async def __aenter__(self) -> TTSSession:
+        self._scheduler._sessions.append(self._session)
+        return self._session
+
+    async def __aexit__(self, *exc) -> None:
+        self._scheduler._close(self._session)
+
+
+scheduler = TTSScheduler()
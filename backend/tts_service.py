@@ -1,8 +1,8 @@
 import re
 import uuid
-import io
 import os
-import tempfile
+import asyncio
+import functools
 
 # Configure ffmpeg + ffprobe paths before importing pydub
 try:
@@ -15,10 +15,20 @@ from pydub import AudioSegment
 import edge_tts
 from config import (
     ELEVEN_API_KEY, ELEVEN_VOICE_ID, TTS_MODEL, TTS_OUTPUT_FORMAT,
-    TTS_VOICE_SETTINGS, PAUSE_DURATIONS, AUDIO_OUTPUT_DIR,
+    TTS_VOICE_SETTINGS, PAUSE_DURATIONS, RENDER_SAMPLE_RATE, RENDER_CHANNELS,
 )
 from nikud_service import add_nikud_to_segment
-from bells_service import generate_bells_track
+from bells_service import generate_bell_events
+from audio_timeline import Timeline
+from render_memory import PCMStore, PCMRef
+from encode_service import encode_audio
+from cancellation import run_cancellable, check_cancelled
+from tts_scheduler import scheduler as tts_scheduler
+from tts_resilience import ResilientTTS
+from render_manifest import (
+    MANIFEST_VERSION, segment_hash, save_render, load_manifest, read_pcm, plan_rerender,
+    delete_render,
+)
 
 PAUSE_PATTERN = re.compile(r'\[(pause|short_pause|long_pause|breath)\]')
 
@@ -54,6 +64,36 @@ def _get_elevenlabs_client():
     return ElevenLabs(api_key=ELEVEN_API_KEY)
 
 
+def _to_render_format(audio: AudioSegment) -> AudioSegment:
+    """Convert to the internal render format (a no-op for engine output)."""
+    return (audio.set_frame_rate(RENDER_SAMPLE_RATE)
+            .set_channels(RENDER_CHANNELS)
+            .set_sample_width(2))
+
+
+async def _decode_to_render_format(data: bytes) -> AudioSegment:
+    """Decode compressed engine output straight into the render format in one ffmpeg pass."""
+    proc = await asyncio.create_subprocess_exec(
+        AudioSegment.converter, "-hide_banner", "-loglevel", "error",
+        "-i", "pipe:0",
+        "-f", "s16le", "-ar", str(RENDER_SAMPLE_RATE), "-ac", str(RENDER_CHANNELS), "pipe:1",
+        stdin=asyncio.subprocess.PIPE,
+        stdout=asyncio.subprocess.PIPE,
+        stderr=asyncio.subprocess.PIPE,
+    )
+    try:
+        pcm, stderr = await proc.communicate(data)
+    except BaseException:
+        if proc.returncode is None:
+            proc.kill()
+        raise
+    if proc.returncode != 0:
+        raise RuntimeError(f"ffmpeg decode failed: {stderr.decode(errors='replace').strip()}")
+    return AudioSegment(
+        pcm, frame_rate=RENDER_SAMPLE_RATE, channels=RENDER_CHANNELS, sample_width=2,
+    )
+
+
 def split_script_on_pauses(script: str) -> list[dict]:
     segments = []
     last_end = 0
@@ -85,7 +125,7 @@ def _detect_language(script: str) -> str:
 async def _tts_edge(text: str, language: str) -> AudioSegment:
     # Pre-process Hebrew: add nikud for correct pronunciation, then prosody hints
     if language == "he":
-        text = add_nikud_to_segment(text)
+        text = await asyncio.to_thread(add_nikud_to_segment, text)
         text = _improve_hebrew_prosody(text)
 
     voice = EDGE_VOICES.get(language, EDGE_VOICES["en"])
@@ -98,19 +138,20 @@ async def _tts_edge(text: str, language: str) -> AudioSegment:
         pitch=prosody["pitch"],
         volume=prosody.get("volume", "+0%"),
     )
-    tmp = tempfile.NamedTemporaryFile(suffix=".mp3", delete=False)
-    tmp.close()
-    try:
-        await communicate.save(tmp.name)
-        audio = AudioSegment.from_mp3(tmp.name)
-        return audio
-    finally:
-        os.unlink(tmp.name)
+    # Stream into memory: a cancelled session closes the websocket at the next
+    # chunk and leaves no temp file behind. Edge only serves MP3 (24 kHz mono).
+    chunks = []
+    async for chunk in communicate.stream():
+        if chunk["type"] == "audio":
+            chunks.append(chunk["data"])
+    return await _decode_to_render_format(b"".join(chunks))
 
 
-def _tts_elevenlabs(text: str, language: str = "he") -> AudioSegment:
+def _tts_elevenlabs(text: str, language: str = "he", cancelled=None) -> AudioSegment:
+    """Blocking — run through run_cancellable so `cancelled` aborts the download."""
     if language == "he":
         text = add_nikud_to_segment(text)
+    check_cancelled(cancelled)
     from elevenlabs import VoiceSettings
     client = _get_elevenlabs_client()
     voice_settings = VoiceSettings(**TTS_VOICE_SETTINGS)
@@ -121,65 +162,296 @@ def _tts_elevenlabs(text: str, language: str = "he") -> AudioSegment:
         output_format=TTS_OUTPUT_FORMAT,
         voice_settings=voice_settings,
     )
-    audio_data = b"".join(chunk for chunk in audio_bytes if chunk)
-    return AudioSegment.from_mp3(io.BytesIO(audio_data))
+    chunks = []
+    try:
+        for chunk in audio_bytes:
+            check_cancelled(cancelled)
+            if chunk:
+                chunks.append(chunk)
+    finally:
+        # Closing the generator closes the underlying HTTP stream
+        close = getattr(audio_bytes, "close", None)
+        if close:
+            close()
+    # Raw 16-bit mono PCM at the render rate (TTS_OUTPUT_FORMAT)
+    pcm = b"".join(chunks)
+    audio = AudioSegment(
+        pcm[:len(pcm) - len(pcm) % 2], frame_rate=RENDER_SAMPLE_RATE, channels=1, sample_width=2,
+    )
+    return audio.set_channels(RENDER_CHANNELS)
 
 
-async def generate_audio(script: str, on_progress=None, bells_volume: int = 50) -> str:
-    engine = TTS_ENGINE
-    language = _detect_language(script)
-    segments = split_script_on_pauses(script)
-    text_segments = [s for s in segments if s["type"] == "text"]
-    total_text = len(text_segments)
-    text_index = 0
+async def _tts_elevenlabs_async(text: str, language: str) -> AudioSegment:
+    return await run_cancellable(_tts_elevenlabs, text, language)
 
+
+# Edge is free, so it is hedged and is the failover target; ElevenLabs only
+# becomes edge's fallback when a key is configured.
+resilient_tts = ResilientTTS(
+    engines={"edge": _tts_edge, "elevenlabs": _tts_elevenlabs_async},
+    fallbacks={"elevenlabs": "edge", **({"edge": "elevenlabs"} if ELEVEN_API_KEY else {})},
+    hedged={"edge"},
+    slots=tts_scheduler,
+)
+
+
+async def _synthesize_segment(tts, text: str, language: str, store: PCMStore | None = None):
+    # Route new work away from an engine whose circuit is open, and back to
+    # the preferred one once its cooldown is over
+    tts.engine = resilient_tts.route(tts.preferred)
+    audio_segment = await resilient_tts.synthesize(text, language, tts.engine)
+    audio_segment = audio_segment.fade_in(50).fade_out(50)
+    if store is None:
+        return audio_segment
+    # Keep only the PCM, in memory or spilled depending on the budget
+    return await asyncio.to_thread(store.put, _to_render_format(audio_segment).raw_data)
+
+
+async def synthesize_segments(
+    texts: list[str], language: str, on_progress=None, priority: int = 0,
+    store: PCMStore | None = None,
+) -> list:
+    """
+    Synthesize text segments concurrently through the shared TTS scheduler and
+    return their audio in input order. Higher `priority` sessions are served first.
+    With a `store`, each segment's PCM goes into it as soon as it is ready and
+    PCMRefs are returned instead of AudioSegments.
+    """
     if on_progress:
         await on_progress("tts_start", 0)
 
-    audio_parts = []
-    for segment in segments:
-        if segment["type"] == "pause":
-            silence = AudioSegment.silent(duration=segment["duration_ms"])
-            audio_parts.append(silence)
-        else:
-            try:
-                if engine == "elevenlabs":
-                    audio_segment = _tts_elevenlabs(segment["content"], language)
-                else:
-                    audio_segment = await _tts_edge(segment["content"], language)
-            except Exception as e:
-                error_msg = str(e).lower()
-                if "quota" in error_msg or "401" in error_msg or "429" in error_msg:
-                    engine = "edge"
-                    audio_segment = await _tts_edge(segment["content"], language)
-                else:
-                    raise
-
-            audio_segment = audio_segment.fade_in(50).fade_out(50)
-            audio_parts.append(audio_segment)
-
-            text_index += 1
+    async with tts_scheduler.session(TTS_ENGINE, priority) as tts:
+        futures = tts.submit_many([
+            (len(text), functools.partial(_synthesize_segment, tts, text, language, store))
+            for text in texts
+        ])
+        done = 0
+        for future in asyncio.as_completed(futures):
+            await future
+            done += 1
             if on_progress:
-                percent = int((text_index / total_text) * 100)
-                await on_progress("tts_progress", percent)
+                await on_progress("tts_progress", int((done / len(texts)) * 100))
+
+    return [future.result() for future in futures]
+
 
+def _script_units(script: str) -> list[dict]:
+    """Render units (text and pause segments) of a script, keyed for the manifest."""
+    units = []
+    for segment in split_script_on_pauses(script):
+        if segment["type"] == "pause":
+            units.append({"type": "pause", "duration_ms": segment["duration_ms"]})
+        else:
+            units.append({
+                "type": "text",
+                "hash": segment_hash(segment["content"]),
+                "content": segment["content"],
+            })
+    return units
+
+
+def _block_unit(block: dict) -> dict:
+    return {"type": "block", "hash": segment_hash(block["script"]), "script": block["script"]}
+
+
+def _assemble(
+    units: list[dict], audios: list, store: PCMStore | None = None,
+) -> tuple[Timeline, list[dict]]:
+    """
+    Lay unit audio out on a symbolic timeline in the render format
+    (None = pause, kept as a gap), returning it with the manifest entries.
+    `audios` holds PCMRefs (already in the render format, added uncopied) or
+    AudioSegments, which get converted — into `store`, if given, so they
+    count against the memory budget too. PCM offsets count clip bytes only —
+    pauses take no space.
+    """
+    timeline = Timeline(RENDER_SAMPLE_RATE, RENDER_CHANNELS)
+
+    entries = []
+    offset = 0
+    for unit, audio in zip(units, audios):
+        if audio is None:
+            frames = timeline.add_gap(unit["duration_ms"])
+            entries.append({
+                "type": "pause", "pcm_offset": offset, "pcm_length": 0,
+                "frames": frames, "duration_ms": unit["duration_ms"],
+            })
+            continue
+        if isinstance(audio, PCMRef):
+            data = audio.view()
+        elif store is not None:
+            data = store.put(_to_render_format(audio).raw_data).view()
+        else:
+            data = _to_render_format(audio).raw_data
+        timeline.add_clip(data)
+        frames = len(data) // timeline.frame_bytes
+        entry = {k: unit[k] for k in ("type", "hash", "script") if k in unit}
+        entry.update(
+            pcm_offset=offset, pcm_length=len(data),
+            frames=frames, duration_ms=round(frames * 1000 / timeline.frame_rate),
+        )
+        entries.append(entry)
+        offset += len(data)
+
+    return timeline, entries
+
+
+async def synthesize_script(script: str, on_progress=None, priority: int = 0) -> AudioSegment:
+    """Synthesize a script (with pause markers) into a single speech track."""
+    language = _detect_language(script)
+    units = _script_units(script)
+    texts = [u["content"] for u in units if u["type"] == "text"]
+    rendered = iter(await synthesize_segments(texts, language, on_progress, priority))
+    audios = [next(rendered) if u["type"] == "text" else None for u in units]
+    timeline, _ = await asyncio.to_thread(_assemble, units, audios)
+    return await asyncio.to_thread(timeline.to_segment)
+
+
+async def _finish_render(
+    units: list[dict], audios: list, language: str, bells_volume: int,
+    output_profile: str = "mp3", on_progress=None, store: PCMStore | None = None,
+) -> str:
+    """
+    Assemble, mix bells, encode, and store the manifest.
+    Returns the audio path relative to AUDIO_OUTPUT_DIR.
+    """
     if on_progress:
         await on_progress("combining", 95)
 
-    combined = AudioSegment.empty()
-    for part in audio_parts:
-        combined += part
+    timeline, entries = await asyncio.to_thread(_assemble, units, audios, store)
 
-    # Mix bells background if volume > 0
+    # Bells are sparse events mixed in while encoding, not a full-length track
+    bells = []
     if bells_volume > 0:
-        bells = generate_bells_track(len(combined), volume_pct=bells_volume)
-        combined = combined.overlay(bells)
-
-    filename = f"meditation_{uuid.uuid4().hex[:8]}.mp3"
-    filepath = f"{AUDIO_OUTPUT_DIR}/{filename}"
-    combined.export(filepath, format="mp3", bitrate="192k")
+        bells = await run_cancellable(
+            generate_bell_events, timeline.duration_ms, bells_volume, timeline.frame_rate,
+        )
+
+    stem = f"meditation_{uuid.uuid4().hex[:8]}"
+    filename = await encode_audio(timeline, stem, output_profile, overlays=bells)
+
+    manifest = {
+        "version": MANIFEST_VERSION,
+        "audio_file": filename,
+        "output_profile": output_profile,
+        "language": language,
+        "frame_rate": timeline.frame_rate,
+        "channels": timeline.channels,
+        "sample_width": timeline.sample_width,
+        "segments": entries,
+    }
+    await asyncio.to_thread(save_render, stem, manifest, timeline.clips())
 
     if on_progress:
         await on_progress("complete", 100)
 
     return filename
+
+
+async def generate_audio(
+    script: str,
+    on_progress=None,
+    bells_volume: int = 50,
+    intro: dict | None = None,
+    outro: dict | None = None,
+    priority: int = 0,
+    output_profile: str = "mp3",
+) -> str:
+    """
+    Render a full session and return its audio path relative to AUDIO_OUTPUT_DIR.
+    `intro`/`outro` are pre-rendered blocks ({"script", "audio"}) spliced around
+    the synthesized script; `output_profile` picks the encoding (config.OUTPUT_PROFILES).
+    """
+    language = _detect_language(script)
+    units = _script_units(script)
+    texts = [u["content"] for u in units if u["type"] == "text"]
+    store = PCMStore()
+    try:
+        rendered = iter(await synthesize_segments(texts, language, on_progress, priority, store))
+        audios = [next(rendered) if u["type"] == "text" else None for u in units]
+
+        if intro is not None:
+            units.insert(0, _block_unit(intro))
+            audios.insert(0, intro["audio"])
+        if outro is not None:
+            units.append(_block_unit(outro))
+            audios.append(outro["audio"])
+
+        return await _finish_render(
+            units, audios, language, bells_volume, output_profile, on_progress, store,
+        )
+    finally:
+        store.close()
+
+
+def _load_reused(store: PCMStore, stem: str, entries: list[dict], manifest: dict) -> list:
+    """Stored clips as PCMRefs, or as AudioSegments if rendered in another format."""
+    same_format = (
+        (manifest["frame_rate"], manifest["channels"], manifest["sample_width"])
+        == (RENDER_SAMPLE_RATE, RENDER_CHANNELS, 2)
+    )
+    clips = []
+    for data in read_pcm(stem, entries):
+        if same_format:
+            clips.append(store.put(data))
+        else:
+            clips.append(AudioSegment(
+                data,
+                frame_rate=manifest["frame_rate"],
+                channels=manifest["channels"],
+                sample_width=manifest["sample_width"],
+            ))
+    return clips
+
+
+async def rerender_audio(
+    stem: str, script: str, on_progress=None, bells_volume: int = 50, priority: int = 0,
+) -> dict:
+    """
+    Re-render an edited version of a previously rendered session (identified by
+    its file stem), synthesizing only the segments whose text changed and reusing
+    the rest of the stored speech timeline. The output profile is kept.
+    Raises FileNotFoundError if the session has no manifest.
+    """
+    manifest = await asyncio.to_thread(load_manifest, stem)
+    if manifest is None:
+        raise FileNotFoundError(f"No render manifest for {stem}")
+    language = manifest["language"]
+
+    # Pre-rendered blocks stay blocks as long as their text is left untouched
+    body = script.strip()
+    head = tail = None
+    old = manifest["segments"]
+    if old and old[0]["type"] == "block" and body.startswith(old[0]["script"]):
+        head, body = _block_unit(old[0]), body[len(old[0]["script"]):]
+    if old and old[-1]["type"] == "block" and len(old) > 1 and body.endswith(old[-1]["script"]):
+        tail, body = _block_unit(old[-1]), body[:len(body) - len(old[-1]["script"])]
+    units = ([head] if head else []) + _script_units(body) + ([tail] if tail else [])
+
+    plan = plan_rerender(manifest, units)
+    reused = [i for i, entry in enumerate(plan) if entry is not None and units[i]["type"] != "pause"]
+    todo = [i for i, entry in enumerate(plan) if entry is None and units[i]["type"] == "text"]
+
+    store = PCMStore()
+    try:
+        clips = await asyncio.to_thread(
+            _load_reused, store, stem, [plan[i] for i in reused], manifest,
+        )
+        audios = [None] * len(units)
+        for i, clip in zip(reused, clips):
+            audios[i] = clip
+        rendered = await synthesize_segments(
+            [units[i]["content"] for i in todo], language, on_progress, priority, store,
+        )
+        for i, audio in zip(todo, rendered):
+            audios[i] = audio
+
+        new_filename = await _finish_render(
+            units, audios, language, bells_volume,
+            manifest.get("output_profile", "mp3"), on_progress, store,
+        )
+    finally:
+        store.close()
+    # The new render supersedes this one (edits continue from the new stem)
+    await asyncio.to_thread(delete_render, stem)
+    return {"filename": new_filename, "rendered": len(todo), "reused": len(reused)}